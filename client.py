@@ -5,15 +5,22 @@ import sys
 import threading
 import subprocess
 import os
-from gui import GameGUI, calculate_scores_from_grid
+from gui import GameGUI
 from leaderboard import LeaderboardGUI
 from protocol import (
     MSG_TYPE_LEADERBOARD, create_ack_packet, create_packet, parse_packet, HEADER_SIZE,
     MSG_TYPE_JOIN_REQ, MSG_TYPE_JOIN_RESP,
     MSG_TYPE_CLAIM_REQ, MSG_TYPE_BOARD_SNAPSHOT, MSG_TYPE_LEAVE,
     MSG_TYPE_GAME_START, MSG_TYPE_GAME_OVER,
-    unpack_grid_snapshot, MSG_TYPE_ACK, unpack_leaderboard_data
+    decode_grid_snapshot, CODEC_MASK_ALL, MSG_TYPE_ACK, unpack_leaderboard_data,
+    MSG_TYPE_BOARD_DELTA, unpack_grid_delta, apply_grid_delta, CLAIM_FORMAT,
+    MSG_TYPE_FRAGMENT, FragmentReassembler, RECV_BUFFER_SIZE, Outbox, split_datagram,
+    sack_acked, build_sack_bitmap, ACK_DELAY_MS, on_snapshot_channel, snapshot_ack_field,
+    MSG_TYPE_SCORE_UPDATE
 )
+from congestion import CongestionControl, load_arq_config
+from grid import Grid
+from scheduler import Scheduler
 
 def current_time_ms():
     return int(time.time() * 1000)
@@ -23,28 +30,26 @@ class GameClient:
         self.server_ip = server_ip
         self.server_port = server_port
         self.player_id = player_id
+        self.conn_id = 0  # connection id assigned by the server, echoed so it can find us if our port changes
         self.client_socket = None
+        self.outbox = None  # batches ACKs/retransmissions into one datagram per loop iteration
         self.running = False
 
         # SR ARQ - Sender side
-        self.N = 6
+        self.arq_config = load_arq_config()
+        self.cc = CongestionControl(self.arq_config)  # AIMD window + RTO with backoff
         self.base = 0
         self.nextSeqNum = 0
         self.seq_num = 0      
         self.window = {}
-        self.timers = {}
+        self.timers = {}  # seq -> scheduler Timer for that packet's RTO
+        self.scheduler = Scheduler()  # RTO and leaderboard timeouts, fired by _timer_loop
         self.send_timestamp = {}
 
         # SR ARQ - Receiver side
         self.receive_buffer = {}
         self.expected_seq = 0
-
-        # RTT estimation
-        self.estimatedRTT = 100
-        self.devRTT = 50
-        self.alpha = 0.125
-        self.beta = 0.25
-        self.RTO = self.estimatedRTT + 4*self.devRTT
+        self._ack_due = None  # monotonic time the held-back SACK must be sent
 
         # Game state
         self.game_active = False
@@ -55,9 +60,15 @@ class GameClient:
         self.game_duration = 120
         self._game_over_handled = False
         self.final_scores = []
+        self._leaderboard_timer = None
+        self.live_scores = {}        # pid -> (score, id of the SCORE_UPDATE it came from)
+        self.leaderboard_id = None   # newest SCORE_UPDATE applied this game
 
         # Grid
-        self.local_grid = [[0]*20 for _ in range(20)]
+        self.local_grid = Grid()   # resized from the GAME_START payload
+        self.server_grid = Grid()  # Last authoritative state (delta baseline)
+        self.last_snapshot_id = None
+        self.reassembler = FragmentReassembler()  # large snapshots/leaderboards arrive as FRAGMENTs
         self.claimed_cells = set()
         self.active_players = set()
         self.pending_claims = set()  # Track pending claims to revert if rejected
@@ -117,7 +128,9 @@ class GameClient:
             self.gui.log_message("Game hasn't started yet", "warning")
             return
         
-        current_owner = self.local_grid[row][col]
+        if not self.local_grid.in_bounds(row, col):
+            return
+        current_owner = self.local_grid.get(row, col)
         
         # Check stealing setting
         if not self.stealing_enabled:
@@ -136,12 +149,12 @@ class GameClient:
         old_owner = current_owner
         
         # Do optimistic update
-        self.local_grid[row][col] = self.player_id
+        self.local_grid.set(row, col, self.player_id)
         self.claimed_cells.add((row, col))
         self.pending_claims.add((row, col))  # Track pending claim
         
         # Update GUI to show player color immediately
-        self.gui.update_grid(self.local_grid)
+        self.gui.update_grid(self.local_grid.to_rows())
         
         # Send claim request to server
         if self._send_claim_request(row, col):
@@ -152,19 +165,22 @@ class GameClient:
     
     # ==================== SR ARQ SENDER ====================
     def _sr_send(self, msg_type, payload=b''):
-        if self.nextSeqNum < self.base + self.N:
+        if self.cc.can_send(len(self.window), self.nextSeqNum, self.base):
             seq = self.nextSeqNum  # Get the sequence number
-            packet = create_packet(msg_type, seq, payload)
+            ack_num, sack_bits = self._piggyback_ack()
+            packet = create_packet(msg_type, seq, payload, snapshot_ack_field(self.last_snapshot_id),
+                                   ack_num, sack_bits, self.conn_id)
             try:
-                self.client_socket.sendto(packet, (self.server_ip, self.server_port))
+                # Sent right away, together with anything the loops have queued
+                self.outbox.send(packet, (self.server_ip, self.server_port))
+                self.outbox.flush()
             except Exception as e:
                 self.gui.log_message(f"Send error: {e}", "error")
                 self.stats['dropped'] += 1
                 return False
             self.window[seq] = packet
-            now_ms = current_time_ms()
-            self.timers[seq] = now_ms
-            self.send_timestamp[seq] = now_ms
+            self.timers[seq] = self.scheduler.call_later(self.cc.current_rto(), self._retransmit, seq)
+            self.send_timestamp[seq] = current_time_ms()
             self.nextSeqNum += 1
             self.stats['sent'] += 1
             return seq
@@ -172,16 +188,29 @@ class GameClient:
             self.stats['dropped'] += 1
             return False
   
-    def _retransmit(self, seq):
+    def _retransmit(self, seq, timed_out=True):
+        """
+        RTO timer callback: resend seq if it is still unacknowledged and re-arm its timer.
+        A timeout shrinks the window and backs off the RTO; over the retransmit budget
+        the resend waits for the next budget interval. timed_out=False for those
+        deferred resends and for fast retransmits.
+        """
         packet = self.window.get(seq)
         if packet:
+            now = current_time_ms()
+            if timed_out:
+                self.cc.on_timeout(seq, self.nextSeqNum, now)
+            wait = self.cc.retransmit_delay(now)
+            if wait:
+                self.timers[seq] = self.scheduler.call_later(wait, self._retransmit, seq, False)
+                return
             try:
-                self.client_socket.sendto(packet, (self.server_ip, self.server_port))
+                self.outbox.send(packet, (self.server_ip, self.server_port))
             except Exception as e:
                 self.gui.log_message(f"Retransmit error: {e}", "error")
                 return
 
-            self.timers[seq] = current_time_ms()
+            self.timers[seq] = self.scheduler.call_later(self.cc.current_rto(), self._retransmit, seq)
             self.stats['sent'] += 1
             self.stats['retransmissions'] += 1
 
@@ -191,12 +220,11 @@ class GameClient:
             self._retransmitted_seqs.add(seq)
 
     def _timer_loop(self):
+        """Sleep until the next timer is due, run what expired, send any retransmissions."""
         while self.running:
-            now = current_time_ms()
-            for seq in list(self.timers.keys()):
-                if now - self.timers[seq] >= self.RTO:
-                    self._retransmit(seq)
-            time.sleep(0.01)
+            self.scheduler.wait(100)
+            if self.scheduler.run_due():
+                self._flush_outbox()
 
     # ==================== NETWORK ====================
     def connect(self):
@@ -205,12 +233,14 @@ class GameClient:
         try:
             self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             self.client_socket.settimeout(1.0)
+            self.outbox = Outbox(self.client_socket)
             self.running = True
 
             threading.Thread(target=self._timer_loop, daemon=True).start()
             threading.Thread(target=self._receive_loop, daemon=True).start()
 
-            self._sr_send(MSG_TYPE_JOIN_REQ, payload=b'')
+            # Advertise every snapshot codec we can decode
+            self._sr_send(MSG_TYPE_JOIN_REQ, payload=struct.pack("!B", CODEC_MASK_ALL))
 
             self.gui.log_message(f"Connecting to {self.server_ip}:{self.server_port}...", "info")
             self.gui.update_player_info("Connecting...", True)
@@ -235,9 +265,9 @@ class GameClient:
         # Send LEAVE using SR-ARQ (will be retransmitted by _timer_loop)
         leave_seq = self._sr_send(MSG_TYPE_LEAVE, payload=b'')
         if leave_seq is False:
-            # Couldn't send (window full or socket error) — fallback: try raw send once
+            # Couldn't send (window full or socket error) — fallback: try raw send once, at the next seq
             try:
-                packet = create_packet(MSG_TYPE_LEAVE, 0, b'')
+                packet = create_packet(MSG_TYPE_LEAVE, self.nextSeqNum, b'', conn_id=self.conn_id)
                 self.client_socket.sendto(packet, (self.server_ip, self.server_port))
             except Exception:
                 pass
@@ -276,7 +306,10 @@ class GameClient:
 
         # Clear local state
         self.player_id = None
+        self.conn_id = 0
         self.window.clear()
+        self.cc = CongestionControl(self.arq_config)
+        self.scheduler.clear()
         self.timers.clear()
         self.send_timestamp.clear()
         self.active_players.clear()
@@ -289,94 +322,142 @@ class GameClient:
     def _receive_loop(self):
         while self.running:
             try:
-                data, addr = self.client_socket.recvfrom(2048)
+                self.client_socket.settimeout(self._ack_wait())
+                data, addr = self.client_socket.recvfrom(RECV_BUFFER_SIZE)
                 recv_ms = current_time_ms()
                 if len(data) < HEADER_SIZE:
                     continue
-                
-                # Parse and validate checksum
-                header, payload, valid = parse_packet(data)
-                
-                if not header:
-                    continue
-                if not valid:
-                    print(f"[CHECKSUM ERROR] Invalid packet received")
-                    self.stats['dropped'] += 1
-                    continue
-                    
-                seq = header["seq_num"]
-                msg_type = header["msg_type"]
-                # Payload is returned by parse_packet
 
-                if msg_type == MSG_TYPE_ACK:
-                    ack_val = header.get("ack_num", 0)
-                    self._handle_ack(ack_val, recv_ms)
-                    continue
-                #########
-                if msg_type == MSG_TYPE_JOIN_RESP:
-                    ack_val = header.get("ack_num", 0)
-                    self._handle_ack(ack_val, recv_ms)
+                # A datagram is either one GSSP packet or a batch of them
+                packets, batch_valid = split_datagram(data)
+                if not batch_valid:
+                    print(f"[CHECKSUM ERROR] Invalid batch received")
+                    self.stats['dropped'] += 1
+                for packet in packets:
+                    # Parse and validate checksum
+                    header, payload, valid = parse_packet(packet)
                 
- 
-                ack_packet = create_ack_packet(seq)
-                try:
-                    self.client_socket.sendto(ack_packet, addr)
-                except:
-                    pass  # ignore ACK send failure
-                self._handle_data_packet(seq, msg_type, payload, header)
+                    if not header:
+                        continue
+                    if not valid:
+                        print(f"[CHECKSUM ERROR] Invalid packet received")
+                        self.stats['dropped'] += 1
+                        continue
+                    
+                    seq = header.seq_num
+                    msg_type = header.msg_type
+                    # Payload is returned by parse_packet
+                    if header.conn_id:
+                        self.conn_id = header.conn_id
+
+                    # ACK or data with the server's ACK piggybacked
+                    if self.window and (header.ack_num or header.sack_bits):
+                        self._handle_ack(header.ack_num, header.sack_bits, recv_ms)
+                    if msg_type == MSG_TYPE_ACK:
+                        continue
+
+                    if on_snapshot_channel(msg_type, payload):
+                        self._handle_snapshot_packet(msg_type, payload, header)
+                    else:
+                        self._handle_data_packet(seq, msg_type, payload, header)
             except socket.timeout:
-                continue
+                pass
             except Exception as e:
                 if self.running:
                     self.gui.log_message(f"Receive error: {e}", "error")
                     time.sleep(0.1)
+                continue
+
+            # The held-back SACK leaves once due, batched with anything else queued
+            self._send_due_ack()
+            self._flush_outbox()
+
+    def _flush_outbox(self):
+        if not self.outbox:
+            return
+        try:
+            self.outbox.flush()
+        except Exception as e:
+            print(f"[CLIENT {self.player_id}] Outbox flush failed: {e}")
 
     # ==================== PACKET HANDLING ====================
-    def _handle_ack(self, seq, recv_ms):
-        """Handle ACK with cumulative acknowledgment logic"""
-        print(f"[ACK HANDLER] Received ACK for seq={seq}, current base={self.base}")
-        
-        # If ACK is for a packet we have in window
-        if seq in self.window:
-            # Update RTT if not retransmitted
-            if seq in self.send_timestamp:
-                sampleRTT = recv_ms - self.send_timestamp[seq]
-                self.estimatedRTT = (1 - self.alpha) * self.estimatedRTT + self.alpha * sampleRTT
-                self.devRTT = (1 - self.beta) * self.devRTT + self.beta * abs(sampleRTT - self.estimatedRTT)
-                self.RTO = self.estimatedRTT + 4 * self.devRTT
-            
-            # Remove acknowledged packet
+    def _handle_ack(self, ack_num, sack_bitmap, recv_ms):
+        """Handle a cumulative ACK plus SACK bitmap in one pass over the window"""
+        print(f"[ACK HANDLER] Received ACK={ack_num} sack={sack_bitmap:#x}, current base={self.base}")
+
+        acked = sack_acked(ack_num, sack_bitmap, list(self.window))
+        retransmitted = getattr(self, "_retransmitted_seqs", set())
+
+        # Update RTT once per ACK, from the newest seq acked on its first transmission (Karn)
+        fresh = [seq for seq in acked if seq in self.send_timestamp and seq not in retransmitted]
+        if fresh:
+            self.cc.on_rtt_sample(recv_ms - self.send_timestamp[max(fresh)])
+        if acked:
+            self.cc.on_ack(acked)
+
+        # Remove acknowledged packets
+        for seq in acked:
             del self.window[seq]
-            if seq in self.timers:
-                del self.timers[seq]
-            if seq in self.send_timestamp:
-                del self.send_timestamp[seq]
-        
-        # Slide window base forward
-        # In SR ARQ, we can slide base to the smallest unacknowledged packet
-        while self.base in self.window:
-            self.base += 1
-        
-        # Also check if we need to adjust base for packets we don't have anymore
-        while self.base not in self.window and self.base < self.nextSeqNum:
-            self.base += 1
-        
+            timer = self.timers.pop(seq, None)
+            if timer is not None:
+                timer.cancel()
+            self.send_timestamp.pop(seq, None)
+            retransmitted.discard(seq)
+
+        # Slide window base forward to the smallest unacknowledged packet
+        self.base = min(self.window) if self.window else max(self.base, self.nextSeqNum)
+
         print(f"[ACK HANDLER] New base={self.base}, window size={len(self.window)}")
 
-    def _handle_data_packet(self, seq, msg_type, payload, header):
+        # Fast retransmit: holes that DUP_THRESH newer SACKed seqs overtook go out now
+        for seq in self.cc.detect_losses(list(self.window), self.nextSeqNum):
+            timer = self.timers.pop(seq, None)
+            if timer is not None:
+                timer.cancel()
+            self._retransmit(seq, timed_out=False)
+
+    def _schedule_ack(self):
+        """Hold the ACK for ACK_DELAY_MS so one SACK covers every packet of a burst."""
+        if self._ack_due is None:
+            self._ack_due = time.monotonic() + ACK_DELAY_MS / 1000
+
+    def _ack_wait(self):
+        """Receive timeout: until the held-back ACK is due, else the idle poll interval."""
+        if self._ack_due is None:
+            return 1.0
+        return max(0.0005, self._ack_due - time.monotonic())
+
+    def _piggyback_ack(self):
         """
-        Handle data packet from server according to SR ARQ protocol.
+        (cumulative ack, SACK bitmap) to stamp on an outgoing data packet, which
+        replaces the held-back standalone ACK. Called from the GUI thread too, so the
+        deadline is cleared before the fields are read: a packet arriving in between
+        is either covered or schedules a fresh ACK.
         """
-        # Send ACK for this packet immediately (as per protocol)
-        ack_packet = create_ack_packet(seq)
+        self._ack_due = None
+        expected = self.expected_seq
+        return expected, build_sack_bitmap(expected, list(self.receive_buffer))
+
+    def _send_due_ack(self):
+        if self._ack_due is None or time.monotonic() < self._ack_due:
+            return
+        self._ack_due = None
+        bitmap = build_sack_bitmap(self.expected_seq, self.receive_buffer)
         try:
-            self.client_socket.sendto(ack_packet, (self.server_ip, self.server_port))
-            print(f"[CLIENT {self.player_id}] Sent ACK for seq={seq}")
+            self.outbox.send(create_ack_packet(self.expected_seq, snapshot_id=snapshot_ack_field(self.last_snapshot_id),
+                                               sack_bits=bitmap, conn_id=self.conn_id),
+                             (self.server_ip, self.server_port))
+            print(f"[CLIENT {self.player_id}] Sent ACK={self.expected_seq} sack={bitmap:#x}")
         except Exception as e:
             print(f"[CLIENT {self.player_id}] Failed to send ACK: {e}")
-        
-        # Store received ACK number for CLAIM_REQUESTs
-        self.last_ack_num = seq
+
+    def _handle_data_packet(self, seq, msg_type, payload, header):
+        """
+        Handle data packet from server according to SR ARQ protocol.
+        """
+        # ACK (delayed and coalesced); duplicates are re-ACKed too, the last ACK may be lost
+        self._schedule_ack()
+
         print(f"[DEBUG] Incoming Seq: {seq} | Expected: {self.expected_seq}")
         # Process packet based on sequence number
         if seq == self.expected_seq:
@@ -396,10 +477,28 @@ class GameClient:
             # Duplicate packet, ignore but still ACK it
             print(f"[CLIENT {self.player_id}] Received duplicate packet seq={seq}")
 
+    def _handle_snapshot_packet(self, msg_type, payload, header):
+        """
+        Snapshot channel (no seq): apply the board if it is newer than ours,
+        and schedule an ACK, which carries our newest snapshot id in its snapshot_id field.
+        """
+        if not self.game_active:
+            return  # arrived ahead of GAME_START; the resync sweep resends a board until we ACK one
+        self._schedule_ack()
+        self._process_packet(msg_type, payload, header)
+
     def _process_packet(self, msg_type, payload, header):
-        seq = header.get("seq_num", 0)
+        seq = header.seq_num
 
-        if msg_type == MSG_TYPE_JOIN_RESP:
+        if msg_type == MSG_TYPE_FRAGMENT:
+            # Fragments arrive in SR order; the last one completes the original message
+            message = self.reassembler.add(payload)
+            if message:
+                inner_type, inner_payload = message
+                print(f"[CLIENT {self.player_id}] Reassembled msg_type={inner_type} ({len(inner_payload)} bytes)")
+                self._process_packet(inner_type, inner_payload, header)
+
+        elif msg_type == MSG_TYPE_JOIN_RESP:
             self.player_id = struct.unpack("!B", payload)[0]                                                                                                                                                                                                                            
             self.gui.update_player_info(f"Player {self.player_id} (Waiting)", True)
             self.gui.log_message(f"Joined as Player {self.player_id}", "success")
@@ -427,6 +526,20 @@ class GameClient:
             self.game_active = True
             self.waiting_for_game = False
             self.game_start_time = time.time()
+
+            # The server sends a keyframe first; snapshot ids of an earlier game do not apply
+            self.last_snapshot_id = None
+            self.live_scores = {}
+            self.leaderboard_id = None
+
+            # Payload carries the grid size for this game: rows (2 bytes) + cols (2 bytes)
+            if len(payload) >= 4:
+                rows, cols = struct.unpack("!HH", payload[:4])
+                if (rows, cols) != (self.server_grid.rows, self.server_grid.cols):
+                    self.server_grid = Grid(rows, cols)
+                    self.local_grid = Grid(rows, cols)
+                    self.gui.resize_grid(rows, cols)
+                    print(f"[CLIENT {self.player_id}] Grid size {rows}x{cols}")
             
             # Show game mode message
             if self.stealing_enabled:
@@ -446,17 +559,24 @@ class GameClient:
             self.gui.log_message("Game Over! Waiting for final scores...", "info")
             
             # Start a timer to check if leaderboard arrives within timeout
-            if hasattr(self, '_leaderboard_timeout_id'):
-                self.gui.root.after_cancel(self._leaderboard_timeout_id)
-            self._leaderboard_timeout_id = self.gui.root.after(2000, self._handle_leaderboard_timeout)
+            if self._leaderboard_timer is not None:
+                self._leaderboard_timer.cancel()
+            self._leaderboard_timer = self.scheduler.call_later(
+                2000, self.gui.root.after, 0, self._handle_leaderboard_timeout)
         
         elif msg_type == MSG_TYPE_LEADERBOARD:
             # Cancel the timeout timer
-            if hasattr(self, '_leaderboard_timeout_id'):
-                self.gui.root.after_cancel(self._leaderboard_timeout_id)
+            if self._leaderboard_timer is not None:
+                self._leaderboard_timer.cancel()
+                self._leaderboard_timer = None
             
             try:
-                self.final_scores = unpack_leaderboard_data(payload)
+                # A confirmation of the last live update; it carries the top-k for a
+                # client that missed updates (or got none)
+                update_id, top, changes = unpack_leaderboard_data(payload)
+                if self.leaderboard_id is None or self.leaderboard_id < update_id:
+                    self._apply_score_update(update_id, top, changes)
+                self.final_scores = self._live_standings()
                 self.gui.log_message(f"Received final scores from server", "success")
                 
                 # Show leaderboard on GUI thread
@@ -467,68 +587,113 @@ class GameClient:
                 # Fallback to local calculation
                 self.gui.root.after(0, self._handle_game_over)
         
+        elif msg_type == MSG_TYPE_SCORE_UPDATE:
+            try:
+                self._apply_score_update(*unpack_leaderboard_data(payload))
+            except struct.error as e:
+                self.gui.log_message(f"Failed to parse score update: {e}", "error")
+
         elif msg_type == MSG_TYPE_BOARD_SNAPSHOT:
                 try:
                     # Extract snapshot ID
+                    snapshot_id = 0
                     if len(payload) >= 4:
                         snapshot_id = struct.unpack("!I", payload[:4])[0]
                         grid_payload = payload[4:]
                     else:
                         grid_payload = payload
-                        
-                    # Unpack snapshot from server
-                    grid = unpack_grid_snapshot(grid_payload)
-                    
-                    # Clear pending claims when we receive a snapshot (server has processed them)
-                    self.pending_claims.clear()
-                    
-                    # Update local grid with server's authoritative state
-                    self.local_grid = [row[:] for row in grid]
-
-                    # Determine ALL active players from snapshot
-                    players_in_grid = set()
-                    for r in range(20):
-                        for c in range(20):
-                            pid = grid[r][c]
-                            if pid != 0:
-                                players_in_grid.add(pid)
-
-                    # Include ourselves in active players if we're in the game
-                    if self.player_id:
-                        players_in_grid.add(self.player_id)
-                        
-                    self.active_players = players_in_grid
-
-                    # Track claimed cells for this client
-                    self.claimed_cells.clear()
-                    for r in range(20):
-                        for c in range(20):
-                            if grid[r][c] == self.player_id:
-                                self.claimed_cells.add((r, c))
-
-                    # Update GUI with complete grid
-                    self.gui.root.after(0, lambda: self.gui._update_grid_display(grid))
-                    
-                    # Update player list in GUI
-                    self.gui.root.after(0, lambda: self.gui._update_players_display(players_in_grid))
-                    
-                    # Update statistics
-                    self.stats['received'] += 1
-                    self.gui.root.after(0, lambda: self.gui._update_stats_display(self.stats))
-                    
-                    # Log snapshot receipt
-                    if snapshot_id % 10 == 0:
-                        self.gui.log_message(f"Snapshot {snapshot_id} received with {len(players_in_grid)} players", "info")
+                    if self._is_stale_snapshot(snapshot_id):
+                        return
+
+                    # Decode snapshot from server (keyframe replaces our baseline)
+                    rows, cols = self.server_grid.rows, self.server_grid.cols
+                    grid = Grid(rows, cols, decode_grid_snapshot(grid_payload, rows, cols))
+                    self._apply_server_grid(grid, snapshot_id)
 
                 except Exception as e:
                     self.gui.log_message(f"Failed to process snapshot: {e}", "error")
 
-                players_map = {pid: None for pid in sorted(players_in_grid)}
-                self.gui.update_players(players_map)
+        elif msg_type == MSG_TYPE_BOARD_DELTA:
+                try:
+                    snapshot_id, base_id = struct.unpack("!II", payload[:8])
+                    if self._is_stale_snapshot(snapshot_id):
+                        return
+                    if self.last_snapshot_id is None or self.last_snapshot_id < base_id:
+                        return  # not our baseline (cannot happen unless ids were reset); next keyframe fixes it
+                    changes = unpack_grid_delta(payload[8:])
+
+                    # Server only deltas against a snapshot we ACKed and we never go back to an
+                    # older one, so our board is at least base_id; changes are absolute owners.
+                    # server_grid is replaced by the result anyway, so apply in place (O(changes)).
+                    grid = apply_grid_delta(self.server_grid, changes)
+                    self._apply_server_grid(grid, snapshot_id)
+
+                except Exception as e:
+                    self.gui.log_message(f"Failed to process snapshot delta: {e}", "error")
+
+    def _apply_score_update(self, update_id, top, changes):
+        """Live leaderboard: absolute scores, each kept unless we already hold a newer one."""
+        for pid, score in list(changes) + [(pid, score) for pid, score, _ in top]:
+            if update_id >= self.live_scores.get(pid, (0, -1))[1]:
+                self.live_scores[pid] = (score, update_id)
+        if self.leaderboard_id is None or update_id > self.leaderboard_id:
+            self.leaderboard_id = update_id
+            self.gui.update_standings(top)
+
+    def _live_standings(self):
+        """[(pid, score)] from the live updates, highest first (players without cells left out)."""
+        standings = [(pid, score) for pid, (score, _) in self.live_scores.items() if score]
+        return sorted(standings, key=lambda x: x[1], reverse=True)
+
+    def _is_stale_snapshot(self, snapshot_id):
+        """A snapshot no newer than the one we hold: a duplicate or overtaken by a newer board."""
+        return self.last_snapshot_id is not None and snapshot_id <= self.last_snapshot_id
+
+    def _apply_server_grid(self, grid, snapshot_id):
+        """Adopt an authoritative grid from a snapshot or delta and refresh the GUI."""
+        self.server_grid = grid
+        self.last_snapshot_id = snapshot_id
+
+        # Clear pending claims when we receive a snapshot (server has processed them)
+        self.pending_claims.clear()
+        
+        # Update local grid with server's authoritative state
+        self.local_grid = grid.copy()
+
+        # Determine ALL active players from snapshot (ownership index, no board scan)
+        players_in_grid = grid.owners()
+
+        # Include ourselves in active players if we're in the game
+        if self.player_id:
+            players_in_grid.add(self.player_id)
+            
+        self.active_players = players_in_grid
+
+        # Track claimed cells for this client
+        self.claimed_cells = set(grid.owner_cells(self.player_id)) if self.player_id else set()
+
+        # Update GUI with complete grid (scores come from the grid's ownership index)
+        rows = grid.to_rows()
+        scores = grid.scores()
+        self.gui.root.after(0, lambda: self.gui._update_grid_display(rows, scores))
+        
+        # Update player list in GUI
+        self.gui.root.after(0, lambda: self.gui._update_players_display(players_in_grid))
+        
+        # Update statistics
+        self.stats['received'] += 1
+        self.gui.root.after(0, lambda: self.gui._update_stats_display(self.stats))
+        
+        # Log snapshot receipt
+        if snapshot_id % 10 == 0:
+            self.gui.log_message(f"Snapshot {snapshot_id} received with {len(players_in_grid)} players", "info")
+
+        players_map = {pid: None for pid in sorted(players_in_grid)}
+        self.gui.update_players(players_map)
 
     # ==================== GAME ACTIONS ====================
     def _send_claim_request(self, row, col):
-        """Send claim request using SR-ARQ with proper ACK number."""
+        """Send claim request using SR-ARQ (the header piggybacks our ACK)."""
         if not self.client_socket or not self.player_id:
             self.gui.log_message("Not connected to server", "error")
             return False
@@ -537,18 +702,14 @@ class GameClient:
             return False
 
         try:
-            # Include the latest ACK number in the payload or header
-            # Based on protocol: "AckNum acknowledges the latest valid server snapshot"
-            ack_num = getattr(self, 'last_ack_num', 0)
-            
-            # Pack row, col, and ack_num
-            payload = struct.pack("!BBH", row, col, ack_num)  # 2 bytes for ack_num
+            # Pack row, col
+            payload = struct.pack(CLAIM_FORMAT, row, col)  # 2 bytes each
             
             # Send using SR ARQ
             success = self._sr_send(MSG_TYPE_CLAIM_REQ, payload)
             
             if success:
-                print(f"[CLIENT {self.player_id}] Claim request for ({row},{col}) sent with ack={ack_num}")
+                print(f"[CLIENT {self.player_id}] Claim request for ({row},{col}) sent")
                 return True
             else:
                 self.gui.log_message(f"Claim request for ({row},{col}) dropped (window full).", "warning")
@@ -561,10 +722,10 @@ class GameClient:
     def _revert_optimistic_update(self, row, col, old_owner):
         """Revert optimistic update if claim fails"""
         if (row, col) in self.pending_claims:
-            self.local_grid[row][col] = old_owner
+            self.local_grid.set(row, col, old_owner)
             self.claimed_cells.discard((row, col))
             self.pending_claims.discard((row, col))
-            self.gui.update_grid(self.local_grid)
+            self.gui.update_grid(self.local_grid.to_rows())
             self.gui.log_message(f"Claim at ({row},{col}) failed, reverted to previous state", "warning")
     
     def _start_game_timer(self):
@@ -625,8 +786,7 @@ class GameClient:
         self.gui.root.title("Grid Game Client - Game Over")
         
         # Calculate scores from CURRENT grid
-        final_grid = [row[:] for row in self.local_grid]
-        scores = calculate_scores_from_grid(final_grid)
+        scores = self.local_grid.scores()
         
         # Show leaderboard
         self._show_leaderboard(scores)
@@ -676,10 +836,10 @@ class GameClient:
             except Exception as e:
                 print(f"[CLIENT {self.player_id}] Error closing leaderboard: {e}")
         
-        # 2. Send leave message to server (use regular send, not SR ARQ)
+        # 2. Send leave message to server (use regular send, not SR ARQ; at the next seq, so it is not a duplicate)
         if self.client_socket:
             try:
-                leave_packet = create_packet(MSG_TYPE_LEAVE, 0, b'')
+                leave_packet = create_packet(MSG_TYPE_LEAVE, self.nextSeqNum, b'', conn_id=self.conn_id)
                 self.client_socket.sendto(leave_packet, (self.server_ip, self.server_port))
                 print(f"[CLIENT {self.player_id}] Sent LEAVE message to server")
             except Exception as e:
@@ -0,0 +1,162 @@
+import os
+
+from protocol import SACK_BITS
+
+# SR ARQ sender tuning; any key can be overridden by an `arq_<key>=<value>` line in
+# game_settings.txt (e.g. arq_max_cwnd=16), read by both server and client.
+ARQ_DEFAULTS = {
+    'init_cwnd': 4,          # packets in flight before the first ACK
+    'min_cwnd': 2,
+    'max_cwnd': SACK_BITS,   # everything in flight must fit one ack_num + SACK bitmap
+    'init_rto_ms': 1000,     # RFC 6298 initial RTO
+    'min_rto_ms': 200,
+    'max_rto_ms': 5000,
+    'retx_budget': 8,        # retransmissions per (backed-off) RTO, never more than cwnd
+}
+DUP_THRESH = 3  # a seq is lost once this many newer seqs were acked (fast retransmit)
+
+
+def load_arq_config(path="game_settings.txt"):
+    """ARQ_DEFAULTS with any arq_* overrides from the settings file."""
+    config = dict(ARQ_DEFAULTS)
+    try:
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f.read().split():
+                    key, _, value = line.partition("=")
+                    if key.startswith("arq_") and key[4:] in config:
+                        config[key[4:]] = int(value)
+    except (OSError, ValueError) as e:
+        print(f"[ARQ] Error loading settings: {e}")
+    return config
+
+
+class CongestionControl:
+    """
+    Sender state of one SR ARQ connection: an AIMD congestion window and an
+    RFC 6298 retransmission timeout with exponential backoff.
+
+    - window: slow start (+1 per acked packet) up to ssthresh, then +1 per
+      window's worth of ACKs; halved on a loss, at most once per loss episode
+      (the packets in flight when it was cut share the same cut).
+    - fast retransmit: a seq with DUP_THRESH newer seqs SACKed is lost (see
+      detect_losses) and is resent at once instead of waiting for its RTO.
+    - rto: srtt + max(4 * rttvar, min_rto_ms) from Karn-filtered samples, at
+      most max_rto_ms. Each timeout episode doubles current_rto() until
+      a fresh RTT sample arrives.
+    - retransmit budget: at most retx_budget (and at most cwnd) retransmissions
+      per current_rto() interval, so a dead link does not make every packet in
+      flight fire at once; the rest wait for the next interval.
+    """
+
+    def __init__(self, config=None):
+        cfg = dict(ARQ_DEFAULTS)
+        cfg.update(config or {})
+        self.min_cwnd = max(1, cfg['min_cwnd'])
+        self.max_cwnd = max(self.min_cwnd, min(cfg['max_cwnd'], SACK_BITS))
+        self.min_rto = cfg['min_rto_ms']
+        self.max_rto = max(self.min_rto, cfg['max_rto_ms'])
+        self.retx_budget = max(1, cfg['retx_budget'])
+
+        self.cwnd = float(max(self.min_cwnd, min(cfg['init_cwnd'], self.max_cwnd)))
+        self.ssthresh = float(self.max_cwnd)
+        self.srtt = None
+        self.rttvar = None
+        self.rto = self._clamp(cfg['init_rto_ms'])
+        self.backoff = 0
+
+        self._recover = -1          # first seq sent after the last window cut
+        self._highest_acked = -1
+        self._fast_retransmitted = set()
+        self._backoff_until = 0     # timeouts before this time belong to the same episode
+        self._retx_window_start = 0
+        self._retx_used = 0
+
+        self.timeouts = 0
+        self.fast_retransmits = 0
+        self.retransmits = 0
+        self.deferred = 0  # retransmissions pushed to the next budget interval
+
+    def _clamp(self, rto):
+        return max(self.min_rto, min(rto, self.max_rto))
+
+    @property
+    def window(self):
+        """Packets allowed in flight."""
+        return int(self.cwnd)
+
+    def can_send(self, in_flight, next_seq, base):
+        """
+        Pipe rule: fewer than cwnd packets unacknowledged, and next_seq close enough
+        to base (oldest unacked) that the peer can still SACK it. A hole at base does
+        not stop new packets, whose SACKs are what trigger its fast retransmit.
+        """
+        return in_flight < self.window and next_seq <= base + SACK_BITS
+
+    def current_rto(self):
+        """RTO including backoff (ms)."""
+        return min(self.rto * (1 << self.backoff), self.max_rto)
+
+    def on_rtt_sample(self, sample_ms):
+        if self.srtt is None:
+            self.srtt = sample_ms
+            self.rttvar = sample_ms / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - sample_ms)
+            self.srtt = 0.875 * self.srtt + 0.125 * sample_ms
+        # min_rto bounds the variance term (as Linux does), so a steady RTT with
+        # rttvar -> 0 does not leave RTO ~= RTT and fire on ordinary jitter
+        self.rto = self._clamp(self.srtt + max(4 * self.rttvar, self.min_rto))
+        self.backoff = 0  # a fresh sample ends the backoff (RFC 6298 5.7)
+
+    def on_ack(self, acked):
+        """acked: the seqs this ACK newly acknowledged."""
+        for seq in acked:
+            self._fast_retransmitted.discard(seq)
+            if seq > self._highest_acked:
+                self._highest_acked = seq
+        if self.cwnd < self.ssthresh:
+            self.cwnd += len(acked)
+        else:
+            self.cwnd += len(acked) / self.cwnd
+        self.cwnd = min(self.cwnd, float(self.max_cwnd))
+
+    def _cut(self, seq, next_seq):
+        if seq >= self._recover:
+            self.ssthresh = max(float(self.min_cwnd), self.cwnd / 2)
+            self.cwnd = self.ssthresh
+            self._recover = next_seq
+
+    def detect_losses(self, outstanding, next_seq):
+        """
+        Unacked seqs (from `outstanding`) that DUP_THRESH newer seqs overtook and
+        that were not fast-retransmitted yet: resend them now. Cuts the window.
+        """
+        lost = [seq for seq in outstanding
+                if seq + DUP_THRESH <= self._highest_acked and seq not in self._fast_retransmitted]
+        for seq in lost:
+            self._fast_retransmitted.add(seq)
+            self._cut(seq, next_seq)
+        self.fast_retransmits += len(lost)
+        return lost
+
+    def on_timeout(self, seq, next_seq, now_ms):
+        """seq's RTO expired; next_seq is the next seq the sender would use."""
+        self.timeouts += 1
+        self._cut(seq, next_seq)
+        if now_ms >= self._backoff_until and self.current_rto() < self.max_rto:
+            self.backoff += 1
+            self._backoff_until = now_ms + self.current_rto()
+
+    def retransmit_delay(self, now_ms):
+        """0 if a retransmission may go out now (and counts it), else ms until the budget refills."""
+        interval = self.current_rto()
+        if now_ms - self._retx_window_start >= interval:
+            self._retx_window_start = now_ms
+            self._retx_used = 0
+        if self._retx_used < min(self.retx_budget, max(1, self.window)):
+            self._retx_used += 1
+            self.retransmits += 1
+            return 0
+        self.deferred += 1
+        return max(1, self._retx_window_start + interval - now_ms)
@@ -0,0 +1,137 @@
+from array import array
+
+
+class Grid:
+    """
+    Game board stored as a flat row-major bytearray of owner ids (0 = unclaimed).
+
+    Alongside the cells the grid keeps an ownership index (the flat indices each
+    player owns, plus the claimed-cell count), updated by every write. Scores, the
+    claimed count and a player's cells are read from it, so they cost O(players)
+    or O(that player's cells) rather than a board scan. The index is built on the
+    first query (one board pass), so grids that are only written and copied, such
+    as a client's optimistic local board, never pay for it.
+    """
+
+    def __init__(self, rows=20, cols=20, cells=None):
+        self.rows = rows
+        self.cols = cols
+        self._claimed = 0
+        if cells is None:
+            self.cells = bytearray(rows * cols)
+            self._owned = {}  # owner -> set of flat indices
+        else:
+            if len(cells) != rows * cols:
+                raise ValueError(f"Expected {rows * cols} cells, got {len(cells)}")
+            self.cells = bytearray(cells)
+            self._owned = None  # built on the first query
+
+    def _index(self):
+        if self._owned is None:
+            self._owned = {}
+            owners = set(self.cells)
+            owners.discard(0)
+            for owner in owners:
+                self._owned[owner] = set(self._find_all(owner))
+            self._claimed = len(self.cells) - self.cells.count(0)
+        return self._owned
+
+    def _find_all(self, owner):
+        """Flat indices holding `owner`, by C-level search between hits."""
+        indices = []
+        find = self.cells.find
+        i = find(owner)
+        while i != -1:
+            indices.append(i)
+            i = find(owner, i + 1)
+        return indices
+
+    def __len__(self):
+        return len(self.cells)
+
+    def in_bounds(self, r, c):
+        return 0 <= r < self.rows and 0 <= c < self.cols
+
+    def get(self, r, c):
+        return self.cells[r * self.cols + c]
+
+    def set(self, r, c, owner):
+        self.assign(r * self.cols + c, owner)
+
+    def assign(self, index, owner):
+        """Give flat cell `index` to `owner` (0 = unclaimed), keeping the index in step. Returns the old owner."""
+        old = self.cells[index]
+        if old == owner:
+            return old
+        self.cells[index] = owner
+        if self._owned is None:
+            return old
+        if old:
+            owned = self._owned[old]
+            owned.discard(index)
+            if not owned:
+                del self._owned[old]
+        else:
+            self._claimed += 1
+        if owner:
+            self._owned.setdefault(owner, set()).add(index)
+        else:
+            self._claimed -= 1
+        return old
+
+    def copy(self):
+        # The copy's index is rebuilt only if it is ever queried
+        return Grid(self.rows, self.cols, self.cells)
+
+    def reset(self):
+        self.cells = bytearray(self.rows * self.cols)
+        self._owned = {}
+        self._claimed = 0
+
+    def claimed_count(self):
+        self._index()
+        return self._claimed
+
+    def count(self, owner):
+        """Cells owned by `owner`."""
+        owned = self._index().get(owner)
+        return len(owned) if owned else 0
+
+    def owners(self):
+        """Set of player ids that own at least one cell."""
+        return set(self._index())
+
+    def owner_indices(self, owner):
+        """Flat indices of every cell owned by `owner`, ascending."""
+        return sorted(self._index().get(owner, ()))
+
+    def owner_cells(self, owner):
+        cols = self.cols
+        return [divmod(i, cols) for i in self.owner_indices(owner)]
+
+    def clear_owner(self, owner):
+        """Reset all cells owned by `owner` to 0. Returns the cleared flat indices."""
+        owned = self._index().pop(owner, None)
+        if not owned:
+            return []
+        cells = self.cells
+        for i in owned:
+            cells[i] = 0
+        self._claimed -= len(owned)
+        return sorted(owned)
+
+    def scores(self):
+        """[(player_id, cell_count)] sorted by score (highest first)."""
+        # list() snapshots the dict in one C call, so a GUI thread may read while the server writes
+        scores = [(owner, len(owned)) for owner, owned in list(self._index().items())]
+        return sorted(scores, key=lambda x: x[1], reverse=True)
+
+    def to_rows(self):
+        """List-of-rows view for the GUI."""
+        cols = self.cols
+        return [list(self.cells[r * cols:(r + 1) * cols]) for r in range(self.rows)]
+
+
+def new_claim_times(rows, cols):
+    """Per-cell claim timestamps (ms), flat and zeroed."""
+    return array('Q', bytes(8 * rows * cols))
@@ -2,18 +2,20 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext
 import queue
 import time
+from collections import Counter
+from itertools import chain
 from leaderboard import LeaderboardGUI  
 from protocol import MSG_TYPE_JOIN_REQ
+from observer import CoalescingObserver
 
 
 def calculate_scores_from_grid(grid):
-    """Calculate player scores from the grid state"""
-    scores = {}
-    for row in grid:
-        for cell in row:
-            if cell != 0:  # 0 means unclaimed
-                scores[cell] = scores.get(cell, 0) + 1
-    # Convert to list of tuples and sort by score (highest first)
+    """Calculate player scores from the grid state (a grid.Grid or a list of rows)"""
+    if hasattr(grid, "scores"):
+        return grid.scores()  # read from the ownership index
+    scores = Counter(chain.from_iterable(grid))
+    scores.pop(0, None)  # 0 means unclaimed
+    # Sorted by score (highest first)
     return sorted(scores.items(), key=lambda x: x[1], reverse=True)
 
 
@@ -33,6 +35,7 @@ class GameGUI:
         
         # Data from network
         self.grid_state = [[0 for _ in range(cols)] for _ in range(rows)]
+        self.grid_scores = []  # [(player_id, cells)] for grid_state, highest first
         self.players = {}
         self.snapshot_id = 0
         self.packet_stats = {
@@ -264,6 +267,7 @@ class GameGUI:
         # Use a grid layout for better organization
         stats_grid = ttk.Frame(stats_frame)
         stats_grid.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.stats_grid = stats_grid
         
         # Snapshot info
         ttk.Label(stats_grid, text="Snapshot ID:", font=("Arial", 9)).grid(
@@ -316,6 +320,13 @@ class GameGUI:
         self.coverage_var = tk.StringVar(value="0/400 (0%)")
         ttk.Label(stats_grid, textvariable=self.coverage_var, 
                  font=("Arial", 9)).grid(row=9, column=0, columnspan=2, sticky=tk.W)
+
+        # Live leaderboard (top players during play)
+        ttk.Label(stats_grid, text="Standings:", font=("Arial", 9)).grid(
+            row=11, column=0, sticky=tk.W, pady=(10, 3))
+        self.standings_var = tk.StringVar(value="-")
+        ttk.Label(stats_grid, textvariable=self.standings_var, font=("Arial", 9, "bold")).grid(
+            row=11, column=1, sticky=tk.W, pady=(10, 3), padx=(10, 0))
     
     def create_log_panel(self, parent):
         log_frame = ttk.LabelFrame(parent, text="Event Log", padding="10")
@@ -430,7 +441,7 @@ class GameGUI:
         
         # Update coverage info only if progress bar exists
         if hasattr(self, 'progress') and self.progress:
-            claimed_count = sum(1 for row in self.grid_state for cell in row if 1 <= cell <= 4)
+            claimed_count = sum(count for _, count in self.grid_scores)
             total_cells = self.rows * self.cols
             percentage = (claimed_count / total_cells * 100) if total_cells > 0 else 0
             
@@ -491,8 +502,14 @@ class GameGUI:
     def update_player_info(self, player_id, connected=True):
         self.message_queue.put(("player_info", player_id, connected))
     
+    def resize_grid(self, rows, cols):
+        self.message_queue.put(("resize", rows, cols))
+
     def update_snapshot(self, snapshot_id):
         self.message_queue.put(("snapshot", snapshot_id))
+
+    def update_standings(self, top):
+        self.message_queue.put(("standings", top))
     
     def highlight_cell(self, row, col):
         self.message_queue.put(("highlight", row, col))
@@ -527,6 +544,10 @@ class GameGUI:
                 elif msg_type == "snapshot":
                     _, snapshot_id = item
                     self._update_snapshot_display(snapshot_id)
+
+                elif msg_type == "standings":
+                    _, top = item
+                    self._update_standings_display(top)
                 
                 elif msg_type == "highlight":
                     _, row, col = item
@@ -557,9 +578,24 @@ class GameGUI:
         self.log_text.insert(tk.END, f"{message}\n", level)
         self.log_text.see(tk.END)
     
-    def _update_grid_display(self, grid_data):
+    def _update_grid_display(self, grid_data, scores=None):
+        """Show a new board; `scores` ([(player_id, cells)]) saves a recount when the sender has them."""
+        if len(grid_data) != self.rows or (grid_data and len(grid_data[0]) != self.cols):
+            self._resize_grid_display(len(grid_data), len(grid_data[0]) if grid_data else 0, redraw=False)
         self.grid_state = grid_data
+        self.grid_scores = scores if scores is not None else calculate_scores_from_grid(grid_data)
         self.draw_grid()
+
+    def _resize_grid_display(self, rows, cols, redraw=True):
+        """Adopt a new board size, shrinking cells so the canvas keeps roughly the 20x20 footprint."""
+        self.rows = rows
+        self.cols = cols
+        self.cell_size = max(1, min(25, 500 // max(rows, cols, 1)))
+        self.grid_state = [[0] * cols for _ in range(rows)]
+        self.grid_scores = []
+        self.canvas.config(width=cols * self.cell_size + 40, height=rows * self.cell_size + 40)
+        if redraw:
+            self.draw_grid()
     
     def _update_stats_display(self, stats):
         self.packet_stats = stats
@@ -609,6 +645,11 @@ class GameGUI:
                 self.connect_button.config(state=tk.NORMAL)
                 self.disconnect_button.config(state=tk.DISABLED)
     
+    def _update_standings_display(self, top):
+        """top: [(player_id, score, rank)] from the live leaderboard."""
+        if hasattr(self, 'standings_var') and self.standings_var:
+            self.standings_var.set("  ".join(f"{rank}. P{pid} ({score})" for pid, score, rank in top[:4]) or "-")
+
     def _update_snapshot_display(self, snapshot_id):
         self.snapshot_id = snapshot_id
         if hasattr(self, 'snapshot_var') and self.snapshot_var:
@@ -658,7 +699,7 @@ class GameGUI:
                 return False
                 
             total_cells = self.rows * self.cols
-            claimed_cells = sum(1 for row in self.grid_state for cell in row if 1 <= cell <= 4)
+            claimed_cells = sum(count for _, count in self.grid_scores)
             
             # Example condition: game ends when 95% of cells are claimed
             if claimed_cells >= total_cells * 0.95:
@@ -674,7 +715,7 @@ class GameGUI:
             self.game_active = False
             
             # 1. Compute final scores
-            final_scores = calculate_scores_from_grid(self.grid_state)
+            final_scores = list(self.grid_scores)
 
             # 2. Log the final scores
             self.log_message("🎮 Game Over! 🎮", "success")
@@ -702,6 +743,7 @@ class GameGUI:
             
             # Reset grid
             self.grid_state = [[0 for _ in range(self.cols)] for _ in range(self.rows)]
+            self.grid_scores = []
             self.local_grid = [[0 for _ in range(self.cols)] for _ in range(self.rows)]
             self.claimed_cells.clear()
             
@@ -738,6 +780,10 @@ class GameGUI:
                     # Check if game should end after grid update
                     if self.game_active:
                         self.check_game_end_condition()
+
+                elif msg_type == "resize":
+                    _, rows, cols = item
+                    self._resize_grid_display(rows, cols)
                 
                 elif msg_type == "stats":
                     _, stats = item
@@ -754,6 +800,10 @@ class GameGUI:
                 elif msg_type == "snapshot":
                     _, snapshot_id = item
                     self._update_snapshot_display(snapshot_id)
+
+                elif msg_type == "standings":
+                    _, top = item
+                    self._update_standings_display(top)
                 
                 elif msg_type == "highlight":
                     _, row, col = item
@@ -764,6 +814,66 @@ class GameGUI:
         
         self.root.after(100, self.process_queue)
 
+
+class ServerGUI(CoalescingObserver, GameGUI):
+    """
+    Tk front end of the server. Server threads only write the bridge's slots and
+    log ring (CoalescingObserver); the Tk thread drains them every
+    PUBLISH_INTERVAL_MS and draws the latest state once.
+    """
+
+    PUBLISH_INTERVAL_MS = 100
+
+    def __init__(self, title="Grid Game Server", max_log_lines=500):
+        CoalescingObserver.__init__(self, max_log_lines)
+        GameGUI.__init__(self, title=title)
+        ttk.Label(self.stats_grid, text="GUI Queue:", font=("Arial", 9)).grid(
+            row=10, column=0, sticky=tk.W, pady=(10, 3))
+        self.bridge_var = tk.StringVar(value="0")
+        ttk.Label(self.stats_grid, textvariable=self.bridge_var, font=("Arial", 9)).grid(
+            row=10, column=1, sticky=tk.W, pady=(10, 3), padx=(10, 0))
+        self.root.after(self.PUBLISH_INTERVAL_MS, self._publish)
+
+    def attach(self, server):
+        """Wire the Start/Stop buttons to a GameServer."""
+        self.connect_button.config(text="Start Server", command=server.start)
+        self.disconnect_button.config(text="Stop Server", command=server.stop)
+        self.on_connect_click = server.start
+        self.on_disconnect_click = server.stop
+
+    def show_leaderboard(self, scores, play_again_callback=None):
+        # Called from server threads: build the window on the Tk thread
+        self.root.after(0, lambda: LeaderboardGUI(self.root, scores, play_again_callback=play_again_callback))
+
+    def _publish(self):
+        slots, lines = self.drain()
+        try:
+            for message, level in lines:
+                self._add_log_message(message, level)
+            if "grid" in slots:
+                grid = slots["grid"][0]
+                if hasattr(grid, "to_rows"):
+                    self._update_grid_display(grid.to_rows(), grid.scores())
+                else:
+                    self._update_grid_display(grid)
+            if "stats" in slots:
+                self._update_stats_display(dict(slots["stats"][0]))
+            if "players" in slots:
+                self._update_players_display(*slots["players"])
+            if "player_info" in slots:
+                self._update_player_info_display(*slots["player_info"])
+            if "snapshot" in slots:
+                self._update_snapshot_display(*slots["snapshot"])
+            if "standings" in slots:
+                self._update_standings_display(*slots["standings"])
+            metrics = self.bridge_metrics
+            self.bridge_var.set(f"{metrics['depth']} (max {metrics['max_depth']}, "
+                                f"{metrics['coalesced']} coalesced, {metrics['log_dropped']} logs dropped)")
+        except Exception as e:
+            print(f"[ERROR] GUI publish: {e}")
+        self.root.after(self.PUBLISH_INTERVAL_MS, self._publish)
+
+
 if __name__ == "__main__":
     app = GameGUI()
     app.run()
\ No newline at end of file
@@ -0,0 +1,159 @@
+import csv
+import struct
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+CSV_HEADER = ["client_id", "snapshot_id", "seq_num", "server_timestamp_ms", "recv_time_ms",
+              "cpu_percent", "perceived_position_error", "bandwidth_per_client_kbps"]
+
+# One acknowledged packet: client_id, snapshot_id, seq_num, server_timestamp_ms,
+# recv_time_ms, cpu_percent, perceived_position_error, bandwidth_per_client_kbps
+RECORD = struct.Struct("<BIIqqfff")
+
+
+class MetricsRecorder:
+    """
+    Per-ACK metrics off the network thread.
+
+    record() packs a fixed-size RECORD into a preallocated ring; it never touches
+    the disk or psutil. A background writer wakes every flush_interval_s, takes
+    everything recorded since and appends it in one batch to the binary file
+    (raw RECORDs, see read_records) and/or the space-delimited CSV that
+    postprocess.py reads. The same thread samples CPU every cpu_interval_s and
+    record() stamps the latest sample.
+
+    When the writer falls behind and the ring is full, new records are counted
+    in `dropped` instead of blocking the caller.
+    """
+
+    def __init__(self, csv_path=None, bin_path=None, capacity=65536, flush_interval_s=0.5, cpu_interval_s=1.0):
+        self.csv_path = csv_path
+        self.bin_path = bin_path
+        self.capacity = capacity
+        self.flush_interval_s = flush_interval_s
+        self.cpu_interval_s = cpu_interval_s
+        self.cpu_percent = 0.0
+        self.recorded = 0
+        self.dropped = 0
+        self._ring = bytearray(capacity * RECORD.size)
+        self._head = 0   # oldest unwritten record
+        self._count = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._csv_file = None
+        self._csv_writer = None
+        self._bin_file = None
+
+    def start(self):
+        if self.csv_path:
+            self._csv_file = open(self.csv_path, "w", newline="")
+            self._csv_writer = csv.writer(self._csv_file, delimiter=" ")
+            self._csv_writer.writerow(CSV_HEADER)
+            self._csv_file.flush()
+        if self.bin_path:
+            self._bin_file = open(self.bin_path, "wb")
+        if psutil:
+            psutil.cpu_percent()  # first call only sets the baseline
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._thread.start()
+
+    def record(self, client_id, snapshot_id, seq_num, server_ts_ms, recv_ts_ms, error=0.0, bandwidth_kbps=0.0):
+        with self._lock:
+            if self._count == self.capacity:
+                self.dropped += 1
+                return
+            slot = (self._head + self._count) % self.capacity
+            RECORD.pack_into(self._ring, slot * RECORD.size, client_id, snapshot_id, seq_num,
+                             server_ts_ms, recv_ts_ms, self.cpu_percent, error, bandwidth_kbps)
+            self._count += 1
+            self.recorded += 1
+
+    def _take(self):
+        """Copy out and release every pending record (in order)."""
+        with self._lock:
+            count = self._count
+            if not count:
+                return b''
+            start = self._head * RECORD.size
+            end = start + count * RECORD.size
+            if end <= len(self._ring):
+                chunk = bytes(self._ring[start:end])
+            else:
+                chunk = bytes(self._ring[start:]) + bytes(self._ring[:end - len(self._ring)])
+            self._head = (self._head + count) % self.capacity
+            self._count = 0
+        return chunk
+
+    def flush(self):
+        chunk = self._take()
+        if not chunk:
+            return
+        if self._bin_file:
+            self._bin_file.write(chunk)
+            self._bin_file.flush()
+        if self._csv_writer:
+            self._csv_writer.writerows(csv_row(record) for record in RECORD.iter_unpack(chunk))
+            self._csv_file.flush()
+
+    def _writer_loop(self):
+        next_cpu = time.monotonic() + self.cpu_interval_s
+        while not self._stop.wait(self.flush_interval_s):
+            if psutil and time.monotonic() >= next_cpu:
+                self.cpu_percent = psutil.cpu_percent()
+                next_cpu = time.monotonic() + self.cpu_interval_s
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[ERROR] writing metrics: {e}")
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[ERROR] writing metrics: {e}")
+        for f in (self._csv_file, self._bin_file):
+            if f:
+                f.close()
+        self._csv_file = self._csv_writer = self._bin_file = None
+        if self.dropped:
+            print(f"[METRICS] {self.dropped} records dropped (writer fell behind)")
+
+
+def csv_row(record):
+    client_id, snapshot_id, seq_num, server_ts, recv_ts, cpu, error, bandwidth = record
+    return [client_id, snapshot_id, seq_num, server_ts, recv_ts, round(cpu, 1), round(error, 3), round(bandwidth, 3)]
+
+
+def read_records(bin_path):
+    """Yield the RECORD tuples of a binary metrics file."""
+    with open(bin_path, "rb") as f:
+        data = f.read()
+    usable = len(data) - len(data) % RECORD.size
+    yield from RECORD.iter_unpack(data[:usable])
+
+
+def export_csv(bin_path, csv_path):
+    """Convert a binary metrics file into the CSV layout postprocess.py reads."""
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f, delimiter=" ")
+        writer.writerow(CSV_HEADER)
+        writer.writerows(csv_row(record) for record in read_records(bin_path))
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) != 3:
+        print("usage: python metrics.py <metrics.bin> <out.csv>")
+        sys.exit(1)
+    export_csv(sys.argv[1], sys.argv[2])
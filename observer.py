@@ -0,0 +1,107 @@
+import threading
+from collections import deque
+
+
+class ServerObserver:
+    """
+    Everything GameServer reports to a front end. Calls come from the server's
+    engine and worker threads, so implementations must be thread-safe and must not
+    block. This base class ignores everything: it is the headless server, and it
+    keeps tkinter (and a display) off the server's import path.
+
+    CoalescingObserver below is the rate-limited bridge that gui.ServerGUI (the Tk
+    implementation) builds on.
+    """
+
+    def log_message(self, message, level="info"):
+        pass
+
+    def update_stats(self, stats):
+        pass
+
+    def update_grid(self, grid_data):
+        # grid_data is the server's live Grid
+        pass
+
+    def update_players(self, players):
+        pass
+
+    def update_player_info(self, player_id, connected=True):
+        pass
+
+    def update_snapshot(self, snapshot_id):
+        pass
+
+    def update_standings(self, top):
+        # top: [(player_id, score, rank)] of the live leaderboard
+        pass
+
+    def show_leaderboard(self, scores, play_again_callback=None):
+        pass
+
+
+class CoalescingObserver(ServerObserver):
+    """
+    Server-side half of a GUI bridge. Server threads never queue per-event work:
+    stats, grid, players, player info, snapshot id and standings are "latest value wins"
+    slots, and log lines go into a bounded ring (oldest dropped, and counted).
+    The front end calls drain() at its own fixed rate and renders what it got.
+
+    update_grid() takes the live Grid; the front end reads it when drawing, so a
+    claim costs the server a slot write instead of a full copy of the board.
+    """
+
+    def __init__(self, max_log_lines=500):
+        self._bridge_lock = threading.Lock()
+        self._slots = {}  # kind -> latest args
+        self._log_ring = deque(maxlen=max_log_lines)
+        self.bridge_metrics = {
+            'depth': 0,         # slots + log lines waiting for the next drain
+            'max_depth': 0,
+            'coalesced': 0,     # updates overwritten before they were drawn
+            'log_dropped': 0,   # log lines pushed out of the full ring
+            'published': 0,     # drains that had something to draw
+        }
+
+    def _set_slot(self, kind, *args):
+        with self._bridge_lock:
+            if kind in self._slots:
+                self.bridge_metrics['coalesced'] += 1
+            self._slots[kind] = args
+
+    def log_message(self, message, level="info"):
+        with self._bridge_lock:
+            if len(self._log_ring) == self._log_ring.maxlen:
+                self.bridge_metrics['log_dropped'] += 1
+            self._log_ring.append((message, level))
+
+    def update_stats(self, stats):
+        self._set_slot("stats", stats)
+
+    def update_grid(self, grid_data):
+        self._set_slot("grid", grid_data)
+
+    def update_players(self, players):
+        self._set_slot("players", dict(players))
+
+    def update_player_info(self, player_id, connected=True):
+        self._set_slot("player_info", player_id, connected)
+
+    def update_snapshot(self, snapshot_id):
+        self._set_slot("snapshot", snapshot_id)
+
+    def update_standings(self, top):
+        self._set_slot("standings", top)
+
+    def drain(self):
+        """Take everything pending: ({kind: args}, [(message, level), ...])."""
+        with self._bridge_lock:
+            slots, self._slots = self._slots, {}
+            lines = list(self._log_ring)
+            self._log_ring.clear()
+            metrics = self.bridge_metrics
+            metrics['depth'] = len(slots) + len(lines)
+            metrics['max_depth'] = max(metrics['max_depth'], metrics['depth'])
+            if slots or lines:
+                metrics['published'] += 1
+        return slots, lines
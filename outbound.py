@@ -0,0 +1,297 @@
+import math
+from collections import deque
+
+from protocol import (
+    MSG_TYPE_SCORE_UPDATE, MSG_TYPE_BOARD_SNAPSHOT, MSG_TYPE_BOARD_DELTA, MSG_TYPE_FRAGMENT, HEADER_SIZE,
+    FRAGMENT_HEADER_STRUCT, BATCH_HEADER_STRUCT, BATCH_LENGTH_STRUCT, MAX_DATAGRAM_SIZE, Outbox,
+    merge_leaderboard_data
+)
+from scheduler import monotonic_ms
+
+# QoS classes of outgoing messages (lower goes first)
+QOS_CONTROL = 0  # ACKs, state transitions and replies: JOIN_RESP, GAME_START, GAME_OVER, LEADERBOARD
+QOS_STATE = 1    # latest-wins state (live scores): a newer one replaces what is still queued
+QOS_BULK = 2     # boards: every one carries all changes since the client's last ACK
+QOS_NAMES = ("control", "state", "bulk")
+MESSAGE_QOS = {
+    MSG_TYPE_SCORE_UPDATE: QOS_STATE,
+    MSG_TYPE_BOARD_SNAPSHOT: QOS_BULK,
+    MSG_TYPE_BOARD_DELTA: QOS_BULK,
+}
+
+# msg_type -> merge(older payload, newer payload) for latest-wins messages whose payload
+# carries incremental parts (SCORE_UPDATE lists only the scores changed since the last one)
+COLLAPSE = {MSG_TYPE_SCORE_UPDATE: merge_leaderboard_data}
+
+_MSG_TYPE_OFFSET = 5  # in the header: protocol id (4) + version (1)
+_FRAGMENT_TYPE_OFFSET = HEADER_SIZE + FRAGMENT_HEADER_STRUCT.size - 1  # inner msg_type of a FRAGMENT
+
+
+def packet_qos(parts):
+    """QoS class of a built packet (a tuple of byte chunks, header first), from its msg_type."""
+    msg_type = parts[0][_MSG_TYPE_OFFSET]
+    if msg_type == MSG_TYPE_FRAGMENT:
+        if len(parts) > 1:
+            msg_type = parts[1][_FRAGMENT_TYPE_OFFSET - HEADER_SIZE]
+        else:
+            msg_type = parts[0][_FRAGMENT_TYPE_OFFSET]
+    return MESSAGE_QOS.get(msg_type, QOS_CONTROL)
+
+
+class OutboundMessage:
+    """
+    One SR ARQ message for a client. `sent` lists the seqs of the packets transmitted so
+    far (a fragmented message goes out as the window allows); `seqs` is set to it once
+    the whole message is out.
+    """
+
+    __slots__ = ("msg_type", "payload", "prepared", "qos", "queued_ms", "sent", "seqs")
+
+    def __init__(self, msg_type, payload, prepared=None, queued_ms=None):
+        self.msg_type = msg_type
+        self.payload = payload
+        self.prepared = prepared  # BroadcastPacket shared by all recipients, if any
+        self.qos = MESSAGE_QOS.get(msg_type, QOS_CONTROL)
+        self.queued_ms = queued_ms
+        self.sent = []
+        self.seqs = None
+
+
+class SendBacklog:
+    """
+    Messages for one client that found its SR window full, in QoS classes.
+
+    pop() returns control messages before latest-wins ones, and those before boards (only
+    boards too big for one datagram use SR ARQ), FIFO within a class. A latest-wins
+    message collapses into a queued one of the same type, so at most one of each waits.
+    The backlog holds at most `limit` messages; when full, a queued latest-wins message
+    makes room for a control message, otherwise the new message is refused.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.queues = tuple(deque() for _ in QOS_NAMES)
+
+    def __len__(self):
+        return sum(len(queue) for queue in self.queues)
+
+    def push(self, message):
+        """
+        Queue a message: returns (status, entry) where status is "queued", "collapsed"
+        (merged into the queued `entry`), "evicted" (queued after dropping an older
+        latest-wins message) or "dropped" (refused, backlog full).
+        """
+        latest = self.queues[QOS_STATE]
+        if message.qos == QOS_STATE:
+            for queued in latest:
+                if queued.msg_type == message.msg_type:
+                    merge = COLLAPSE.get(message.msg_type)
+                    queued.payload = merge(queued.payload, message.payload) if merge else message.payload
+                    queued.prepared = message.prepared if not merge else None
+                    return "collapsed", queued
+        status = "queued"
+        if len(self) >= self.limit:
+            if message.qos != QOS_CONTROL or not latest:
+                return "dropped", None
+            latest.popleft()
+            status = "evicted"
+        self.queues[message.qos].append(message)
+        return status, message
+
+    def peek(self):
+        for queue in self.queues:
+            if queue:
+                return queue[0]
+        return None
+
+    def pop(self):
+        for queue in self.queues:
+            if queue:
+                return queue.popleft()
+        return None
+
+
+class _Flow:
+    """Datagrams waiting for one client, one queue per QoS class, with its DRR state."""
+
+    __slots__ = ("queues", "deficit", "granted", "weight")
+
+    def __init__(self, weight):
+        self.queues = tuple(deque() for _ in QOS_NAMES)
+        self.deficit = [0] * len(QOS_NAMES)    # bytes it may still send this round, per class
+        self.granted = [False] * len(QOS_NAMES)  # quantum added for the current turn
+        self.weight = weight
+
+
+class OutboundScheduler(Outbox):
+    """
+    Server outbox that decides which client's datagram goes next when the socket send
+    buffer is full or the egress rate (`rate` bytes/sec, 0 = unlimited) is spent.
+
+    Packets are batched per client as in Outbox; each datagram takes the QoS class of
+    the most urgent packet in it (packet_qos). Classes are served in strict priority:
+    no board goes out while an ACK or control message is waiting. Within a class,
+    clients share the link by deficit round robin in bytes (quantum = weight x
+    MAX_DATAGRAM_SIZE per turn, weight 1 unless set_weight), so a client with a deep
+    queue (a slow or lossy one resynced with keyframes) gets its share and no more.
+    When more than `max_queued` datagrams wait, the oldest one of the lowest class goes,
+    taken from the client with the longest queue in that class. Control datagrams are
+    never dropped: with nothing else queued they go past the cap.
+
+    fair=False serves every datagram in one FIFO (the plain Outbox order, dropping the
+    oldest when full), for comparison.
+    """
+
+    def __init__(self, sock, rate=0, fair=True, max_size=MAX_DATAGRAM_SIZE, max_queued=1024):
+        super().__init__(sock, max_size=max_size, max_blocked=max_queued)
+        self.rate = rate
+        self.fair = fair
+        self.quantum = max_size
+        self.burst = max(2 * max_size, rate // 100)  # 10 ms of egress
+        self.tokens = self.burst
+        self.refilled_ms = monotonic_ms()
+        self.flows = {}  # addr (None when not fair) -> _Flow
+        self.rings = tuple(deque() for _ in QOS_NAMES)  # per class: flows with datagrams queued, in DRR order
+        self.weights = {}
+        self.queued = 0
+        self.waiting_for = None  # "socket" or "rate" while datagrams are held back
+        self.stats = {
+            'sent': [0] * len(QOS_NAMES),
+            'bytes': [0] * len(QOS_NAMES),
+            'wait_ms_total': [0.0] * len(QOS_NAMES),
+            'wait_ms_max': [0.0] * len(QOS_NAMES),
+            'dropped': 0,
+            'max_queued': 0,
+        }
+
+    def set_weight(self, addr, weight):
+        """Give a client `weight` (> 0) times the default share of the link within each class."""
+        if not weight > 0:
+            raise ValueError(f"Outbound weight must be > 0, got {weight!r}")
+        with self.lock:
+            self.weights[addr] = weight
+            if addr in self.flows:
+                self.flows[addr].weight = weight
+
+    def clear_weight(self, addr):
+        """Back to the default share (the client left or moved to another address)."""
+        with self.lock:
+            self.weights.pop(addr, None)
+            if addr in self.flows:
+                self.flows[addr].weight = 1
+
+    def send(self, packet, addr):
+        parts = packet if isinstance(packet, tuple) else (packet,)
+        size = BATCH_LENGTH_STRUCT.size + sum(len(part) for part in parts)
+        qos = packet_qos(parts) if self.fair else QOS_CONTROL
+        with self.lock:
+            entry = self.pending.get(addr)
+            if entry is not None and entry[0] + size > self.max_size:
+                self._flush_addr(addr)
+                entry = None
+            if entry is None:
+                entry = self.pending[addr] = [BATCH_HEADER_STRUCT.size, [], qos]
+            entry[0] += size
+            entry[1].append(parts)
+            if qos < entry[2]:
+                entry[2] = qos
+
+    def flush(self):
+        """Send what the socket and the egress rate allow. Returns False if datagrams still wait."""
+        with self.lock:
+            for addr in list(self.pending):
+                self._flush_addr(addr)
+            self._serve()
+            return not self.queued
+
+    def pace_delay_ms(self):
+        """ms until the egress rate allows the next datagram, or None if not rate-limited."""
+        if self.waiting_for != "rate":
+            return None
+        return max(1, math.ceil((self.max_size - self.tokens) * 1000 / self.rate))
+
+    def _flush_addr(self, addr):
+        _, packets, qos = self.pending.pop(addr)
+        datagram = self._build_datagram(packets)
+        key = addr if self.fair else None
+        flow = self.flows.get(key)
+        if flow is None:
+            flow = self.flows[key] = _Flow(self.weights.get(key, 1))
+        queue = flow.queues[qos]
+        if not queue:
+            self.rings[qos].append(key)
+        queue.append((datagram, addr, len(packets), sum(len(part) for part in datagram), monotonic_ms()))
+        self.queued += 1
+        if self.queued > self.max_blocked:
+            self._drop_one()
+        if self.queued > self.stats['max_queued']:
+            self.stats['max_queued'] = self.queued
+
+    def _drop_one(self):
+        """Queue full: the oldest datagram of the lowest class, from the client queueing the most."""
+        lowest = QOS_STATE if self.fair else QOS_CONTROL  # not fair: one FIFO, all in class 0
+        for qos in reversed(range(lowest, len(self.rings))):
+            ring = self.rings[qos]
+            if ring:
+                key = max(ring, key=lambda k: len(self.flows[k].queues[qos]))
+                self.flows[key].queues[qos].popleft()
+                self._dequeued(key, qos)
+                self.datagrams_dropped += 1
+                self.stats['dropped'] += 1
+                return
+
+    def _dequeued(self, key, qos):
+        self.queued -= 1
+        flow = self.flows[key]
+        if not flow.queues[qos]:
+            self.rings[qos].remove(key)
+            flow.deficit[qos] = 0
+            flow.granted[qos] = False
+            if not any(flow.queues):
+                del self.flows[key]
+
+    def _serve(self):
+        self.waiting_for = None
+        if self.rate:
+            now = monotonic_ms()
+            self.tokens = min(self.burst, self.tokens + (now - self.refilled_ms) * self.rate / 1000)
+            self.refilled_ms = now
+        stats = self.stats
+        for qos, ring in enumerate(self.rings):
+            while ring:
+                key = ring[0]
+                flow = self.flows[key]
+                datagram, addr, count, size, queued_ms = flow.queues[qos][0]
+                if flow.deficit[qos] < size:
+                    if flow.granted[qos]:
+                        # Turn used up: next client
+                        flow.granted[qos] = False
+                        ring.rotate(-1)
+                    else:
+                        flow.deficit[qos] += self.quantum * flow.weight
+                        flow.granted[qos] = True
+                    continue
+                if self.rate and self.tokens < size:
+                    self.waiting_for = "rate"
+                    return
+                try:
+                    if not self._transmit(datagram, addr, count):
+                        self.waiting_for = "socket"
+                        return
+                except OSError:
+                    flow.queues[qos].popleft()
+                    self._dequeued(key, qos)
+                    self.datagrams_dropped += 1
+                    stats['dropped'] += 1
+                    raise
+                if self.rate:
+                    self.tokens -= size
+                flow.deficit[qos] -= size
+                flow.queues[qos].popleft()
+                wait = monotonic_ms() - queued_ms
+                stats['sent'][qos] += 1
+                stats['bytes'][qos] += size
+                stats['wait_ms_total'][qos] += wait
+                if wait > stats['wait_ms_max'][qos]:
+                    stats['wait_ms_max'][qos] = wait
+                self._dequeued(key, qos)
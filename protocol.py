@@ -1,8 +1,15 @@
+import itertools
+import operator
 import struct
+import threading
 import time
+import zlib
+from collections import OrderedDict, deque, namedtuple
+from functools import lru_cache
+from math import gcd
 
 PROTOCOL_ID = b'GSSP'
-VERSION = 1
+VERSION = 3  # 2: SACK bitmap in the header, 3: connection id
 
 # message types
 MSG_TYPE_JOIN_REQ = 0
@@ -15,167 +22,787 @@ MSG_TYPE_GAME_START = 6
 MSG_TYPE_WAITING_ROOM = 7
 MSG_TYPE_ACK=8
 MSG_TYPE_LEADERBOARD = 9
+MSG_TYPE_BOARD_DELTA = 10
+MSG_TYPE_FRAGMENT = 11
+MSG_TYPE_SCORE_UPDATE = 12  # live leaderboard during play
 
-HEADER_FORMAT = "!4s B B H H I I Q H"  # Added Checksum(2) at end
-HEADER_SIZE = 28
+HEADER_FORMAT = "!4s B B H H I I I I Q H"  # Added Checksum(2) at end
+HEADER_STRUCT = struct.Struct(HEADER_FORMAT)
+HEADER_SIZE = HEADER_STRUCT.size  # 36
+CHECKSUM_OFFSET = HEADER_SIZE - 2
+_CHECKSUM_STRUCT = struct.Struct("!H")
 
-def compute_checksum(data):
+# Datagrams stay under common path MTUs (1280 for IPv6, 1500 Ethernet), so IP never fragments
+MAX_DATAGRAM_SIZE = 1200
+RECV_BUFFER_SIZE = 65535  # recvfrom size; never truncates a datagram
+
+# FRAGMENT payload: message_id (4) + fragment index (2) + fragment count (2) + inner msg_type (1) + data
+FRAGMENT_HEADER_STRUCT = struct.Struct("!IHHB")
+MAX_FRAGMENT_DATA = MAX_DATAGRAM_SIZE - HEADER_SIZE - FRAGMENT_HEADER_STRUCT.size
+
+# Batch datagram: several GSSP packets in one UDP datagram.
+# Header: BATCH_ID (4) + packet count (2) + checksum over the whole datagram (2),
+# then per packet: length (2) + the complete GSSP packet (header + payload).
+BATCH_ID = b'GSSB'
+BATCH_HEADER_STRUCT = struct.Struct("!4sHH")
+BATCH_LENGTH_STRUCT = struct.Struct("!H")
+BATCH_CHECKSUM_OFFSET = 6
+
+# Selective ACK, carried in every header: ack_num is cumulative (every seq below it was
+# received) and sack_bits is a bitmap whose bit i means seq ack_num + 1 + i was received too.
+# Data packets piggyback both; a standalone ACK only goes out if no data is sent first.
+# conn_id (QUIC-style connection id) is assigned by the server in JOIN_RESPONSE and echoed
+# by the client, so the server finds the session even if the client's address changes.
+# 0 means none (e.g. before the JOIN_RESPONSE).
+SACK_BITS = 32
+ACK_DELAY_MS = 5  # receivers hold an ACK this long so one SACK covers a burst
+
+# Snapshot channel: BOARD_SNAPSHOT / BOARD_DELTA that fit one datagram are sent
+# unreliably, outside SR ARQ (seq_num 0, no window slot, ack fields piggybacked as usual).
+# Each board is a delta from the client's last acknowledged snapshot, so a lost one is
+# never retransmitted. A board that needs fragments goes over SR ARQ like any other large
+# message. The client acknowledges snapshots in the snapshot_id field of everything it
+# sends: newest applied id + 1, mod 2**16 (0 = none yet).
+SNAPSHOT_CHANNEL_TYPES = (MSG_TYPE_BOARD_SNAPSHOT, MSG_TYPE_BOARD_DELTA)
+
+CLAIM_FORMAT = "!HH"  # row, col
+DELTA_ENTRY_STRUCT = struct.Struct("!HHB")  # row, col, owner
+
+# Parsed header; fields in wire order
+PacketHeader = namedtuple("PacketHeader", [
+    "protocol_id", "version", "msg_type", "length", "snapshot_id",
+    "seq_num", "ack_num", "sack_bits", "conn_id", "timestamp", "received_checksum"
+])
+
+def ones_complement_sum(data):
     """
-    Compute 16-bit Internet Checksum (RFC 1071).
-    Sum of 16-bit words (1's complement).
+    Folded 16-bit 1's complement sum of data (odd length is zero-padded).
+    Partial sums of even-length pieces can be added and re-folded (RFC 1071),
+    which is what lets a shared payload be summed only once.
+
+    Since 2^16 == 1 (mod 0xffff), the word sum is congruent to the whole buffer
+    read as one big-endian integer, so int.from_bytes does the summing in C.
+    Accepts bytes, bytearray or memoryview without slicing or copying.
     """
+    n = int.from_bytes(data, "big")
     if len(data) % 2 == 1:
-        data += b'\x00'
-    
-    s = sum(struct.unpack('!%dH' % (len(data) // 2), data))
-    
-    # Fold carry bits
+        n <<= 8  # zero pad byte
+    if n == 0:
+        return 0
+    return n % 0xffff or 0xffff
+
+def ones_complement_sum_parts(parts):
+    """
+    ones_complement_sum of the concatenation of `parts`, without concatenating.
+    A part followed by an odd number of bytes sits at an odd byte offset, so its
+    sum is scaled by 256 (2^16 == 1 mod 0xffff makes every other offset free).
+    """
+    n = 0
+    nonzero = False
+    trailing = 0
+    for part in reversed(parts):
+        value = int.from_bytes(part, "big")
+        if value:
+            nonzero = True
+            value %= 0xffff
+            n += value << 8 if trailing % 2 else value
+        trailing += len(part)
+    if not nonzero:
+        return 0
+    if trailing % 2 == 1:
+        n <<= 8  # zero pad byte
+    return n % 0xffff or 0xffff
+
+def fold_checksum(s):
+    """Fold carry bits of a 1's complement sum back into 16 bits."""
     s = (s >> 16) + (s & 0xffff)
     s += s >> 16
-    
-    return ~s & 0xffff
+    return s & 0xffff
+
+def compute_checksum(data):
+    """
+    Compute 16-bit Internet Checksum (RFC 1071).
+    Sum of 16-bit words (1's complement).
+    """
+    return ~ones_complement_sum(data) & 0xffff
 
-def create_packet(msg_type, seq_num, payload, snapshot_id=0, ack_num=0):
+def create_packet(msg_type, seq_num, payload, snapshot_id=0, ack_num=0, sack_bits=0, conn_id=0):
     """Creates a full packet with 16-bit Internet Checksum."""
     length = len(payload)
     timestamp = int(time.time() * 1000)
-    
-    # 1. Pack with 0 checksum
-    header_no_checksum = struct.pack(
-        HEADER_FORMAT, 
-        PROTOCOL_ID, 
-        VERSION, 
-        msg_type, 
-        length, 
-        snapshot_id, 
-        seq_num, 
-        ack_num,  
-        timestamp,
-        0 # Checksum placeholder
-    )
-    
-    # 2. Calculate checksum of (Header + Payload)
-    full_data = header_no_checksum + payload
-    checksum = compute_checksum(full_data)
-    
-    # 3. Repack header with correct checksum
-    header_final = struct.pack(
-        HEADER_FORMAT, 
-        PROTOCOL_ID, 
-        VERSION, 
-        msg_type, 
-        length, 
-        snapshot_id, 
-        seq_num, 
-        ack_num,  
-        timestamp,
-        checksum
+
+    # Checksum of (Header with 0 checksum + Payload), summed piecewise without concatenating
+    header_sum = ones_complement_sum(HEADER_STRUCT.pack(
+        PROTOCOL_ID, VERSION, msg_type, length, snapshot_id, seq_num, ack_num, sack_bits, conn_id, timestamp, 0
+    ))
+    checksum = ~fold_checksum(header_sum + ones_complement_sum(payload)) & 0xffff
+
+    header_final = HEADER_STRUCT.pack(
+        PROTOCOL_ID, VERSION, msg_type, length, snapshot_id, seq_num, ack_num, sack_bits, conn_id, timestamp, checksum
     )
-    
     return header_final + payload
 
+class BroadcastPacket:
+    """
+    A payload encoded and checksummed once, stamped with a per-recipient header.
+
+    The header is summed with seq_num/ack_num/sack_bits/conn_id set to 0, and the payload
+    sum is added to that once. For each recipient only those per-recipient words are added
+    (incremental checksum update, RFC 1624), so per-client cost is header work only.
+
+    A payload too big for one datagram is only ever sent as fragments(): no header is
+    built for the whole message (its length may not even fit the 16-bit field).
+    """
+
+    def __init__(self, msg_type, payload, snapshot_id=0):
+        self.msg_type = msg_type
+        self.payload = payload
+        self.snapshot_id = snapshot_id
+        self.timestamp = int(time.time() * 1000)
+        self._fragments = None
+        self.base_sum = None
+        if needs_fragmentation(payload):
+            return
+
+        base_header = HEADER_STRUCT.pack(
+            PROTOCOL_ID,
+            VERSION,
+            msg_type,
+            len(payload),
+            snapshot_id,
+            0,  # seq_num (per recipient)
+            0,  # ack_num (per recipient)
+            0,  # sack_bits (per recipient)
+            0,  # conn_id (per recipient)
+            self.timestamp,
+            0   # Checksum placeholder
+        )
+        # Header is an even number of bytes, so header and payload sums combine directly
+        self.base_sum = fold_checksum(ones_complement_sum(base_header) + ones_complement_sum(payload))
+
+    def header_for(self, seq_num, ack_num=0, sack_bits=0, conn_id=0):
+        """Build the header for one recipient (seq/ack/sack/conn_id are word aligned in the header)."""
+        if self.base_sum is None:
+            raise ValueError(f"{len(self.payload)}-byte payload is sent as fragments()")
+        s = (self.base_sum + (seq_num >> 16) + (seq_num & 0xffff) + (ack_num >> 16) + (ack_num & 0xffff)
+             + (sack_bits >> 16) + (sack_bits & 0xffff) + (conn_id >> 16) + (conn_id & 0xffff))
+        checksum = ~fold_checksum(s) & 0xffff
+
+        return HEADER_STRUCT.pack(
+            PROTOCOL_ID,
+            VERSION,
+            self.msg_type,
+            len(self.payload),
+            self.snapshot_id,
+            seq_num,
+            ack_num,
+            sack_bits,
+            conn_id,
+            self.timestamp,
+            checksum
+        )
+
+    def packet_for(self, seq_num, ack_num=0, sack_bits=0, conn_id=0):
+        return self.header_for(seq_num, ack_num, sack_bits, conn_id) + self.payload
+
+    def fragments(self):
+        """
+        FRAGMENT BroadcastPackets carrying this payload, built once and shared by
+        every recipient (one message_id per payload).
+        """
+        if self._fragments is None:
+            self._fragments = [
+                BroadcastPacket(MSG_TYPE_FRAGMENT, fragment, self.snapshot_id)
+                for fragment in fragment_payload(self.msg_type, self.payload)
+            ]
+        return self._fragments
+
+# ==================== Batching ====================
+class Outbox:
+    """
+    Outbound packet queue that packs everything bound for the same address into
+    batch datagrams. Packets are queued with send() and go out on flush() (called
+    once per event-loop iteration), or earlier when a batch would exceed max_size.
+    A lone packet is sent as a plain GSSP datagram.
+
+    On a non-blocking socket whose send buffer is full, built datagrams wait in
+    `blocked` (in order, at most max_blocked) and flush() returns False; the owner
+    calls flush() again once the socket is writable.
+    """
+
+    def __init__(self, sock, max_size=MAX_DATAGRAM_SIZE, max_blocked=1024):
+        self.sock = sock
+        self.max_size = max_size
+        self.max_blocked = max_blocked
+        self.pending = {}  # addr -> [batch size, [packet parts, ...]]
+        self.blocked = deque()  # (datagram parts, addr, packet count) waiting for buffer space
+        self.lock = threading.Lock()
+        self.datagrams_sent = 0
+        self.packets_sent = 0
+        self.datagrams_dropped = 0
+
+    def send(self, packet, addr):
+        """Queue a packet (bytes or a tuple of byte chunks, e.g. header + shared payload)."""
+        parts = packet if isinstance(packet, tuple) else (packet,)
+        size = BATCH_LENGTH_STRUCT.size + sum(len(part) for part in parts)
+        with self.lock:
+            entry = self.pending.get(addr)
+            if entry is not None and entry[0] + size > self.max_size:
+                self._flush_addr(addr)
+                entry = None
+            if entry is None:
+                entry = self.pending[addr] = [BATCH_HEADER_STRUCT.size, []]
+            entry[0] += size
+            entry[1].append(parts)
+
+    def flush(self):
+        """Send everything queued. Returns False if datagrams are still blocked."""
+        with self.lock:
+            while self.blocked:
+                datagram, addr, count = self.blocked[0]
+                if not self._transmit(datagram, addr, count):
+                    break
+                self.blocked.popleft()
+            for addr in list(self.pending):
+                self._flush_addr(addr)
+            return not self.blocked
+
+    def _flush_addr(self, addr):
+        _, packets = self.pending.pop(addr)
+        datagram = self._build_datagram(packets)
+
+        # Keep order: nothing overtakes datagrams already waiting for buffer space
+        if self.blocked or not self._transmit(datagram, addr, len(packets)):
+            if len(self.blocked) >= self.max_blocked:
+                self.blocked.popleft()  # oldest goes; SR ARQ retransmits it
+                self.datagrams_dropped += 1
+            self.blocked.append((datagram, addr, len(packets)))
+
+    @staticmethod
+    def _build_datagram(packets):
+        """Datagram parts for the queued packets: a lone packet as is, else a batch."""
+        if len(packets) == 1:
+            return list(packets[0])
+        # Header packed once into its own buffer; the checksum is patched in place
+        header = bytearray(BATCH_HEADER_STRUCT.size)
+        BATCH_HEADER_STRUCT.pack_into(header, 0, BATCH_ID, len(packets), 0)
+        datagram = [header]
+        for parts in packets:
+            datagram.append(BATCH_LENGTH_STRUCT.pack(sum(len(part) for part in parts)))
+            datagram.extend(parts)
+        _CHECKSUM_STRUCT.pack_into(header, BATCH_CHECKSUM_OFFSET, ~ones_complement_sum_parts(datagram) & 0xffff)
+        return datagram
+
+    def _transmit(self, datagram, addr, count):
+        try:
+            if len(datagram) == 1:
+                self.sock.sendto(datagram[0], addr)
+            elif hasattr(self.sock, "sendmsg"):
+                # Scatter-gather: shared payloads are never copied into the batch
+                self.sock.sendmsg(datagram, [], 0, addr)
+            else:
+                self.sock.sendto(b''.join(datagram), addr)
+        except (BlockingIOError, InterruptedError):
+            return False
+        self.datagrams_sent += 1
+        self.packets_sent += count
+        return True
+
+
+def split_datagram(data):
+    """
+    Split a received datagram into its GSSP packets.
+    Returns (list of packet memoryviews, valid); a batch whose checksum fails
+    (or whose framing is truncated) returns ([], False).
+    """
+    view = memoryview(data)
+    if bytes(view[:4]) != BATCH_ID:
+        return [view], True
+    if len(view) < BATCH_HEADER_STRUCT.size or ones_complement_sum(view) != 0xffff:
+        return [], False
+
+    _, count, _ = BATCH_HEADER_STRUCT.unpack_from(view)
+    packets = []
+    offset = BATCH_HEADER_STRUCT.size
+    for _ in range(count):
+        if offset + BATCH_LENGTH_STRUCT.size > len(view):
+            return [], False
+        (length,) = BATCH_LENGTH_STRUCT.unpack_from(view, offset)
+        offset += BATCH_LENGTH_STRUCT.size
+        if offset + length > len(view):
+            return [], False
+        packets.append(view[offset:offset + length])
+        offset += length
+    return packets, True
+
+# ==================== Fragmentation ====================
+_fragment_message_ids = itertools.count(1)
+
+
+def needs_fragmentation(payload):
+    return HEADER_SIZE + len(payload) > MAX_DATAGRAM_SIZE
+
+
+def fragment_payload(msg_type, payload, message_id=None, max_data=MAX_FRAGMENT_DATA):
+    """
+    Split a payload into FRAGMENT payloads of at most max_data bytes each.
+    Every fragment is sent as its own packet (and SR seq), so a loss only
+    retransmits that fragment.
+    """
+    if message_id is None:
+        message_id = next(_fragment_message_ids) & 0xFFFFFFFF
+    view = memoryview(payload)
+    count = max(1, (len(view) + max_data - 1) // max_data)
+    if count > 0xFFFF:
+        raise ValueError(f"Payload of {len(view)} bytes needs too many fragments ({count})")
+    return [
+        FRAGMENT_HEADER_STRUCT.pack(message_id, index, count, msg_type) + view[index * max_data:(index + 1) * max_data]
+        for index in range(count)
+    ]
+
+
+class FragmentReassembler:
+    """
+    Rebuilds messages from FRAGMENT payloads.
+
+    Memory is bounded: at most `max_messages` partial messages are kept (the
+    oldest is evicted first), messages larger than `max_message_size` are
+    refused, and partial messages older than `timeout_ms` are dropped.
+    """
+
+    def __init__(self, max_messages=8, max_message_size=4 * 1024 * 1024, timeout_ms=10000):
+        self.max_messages = max_messages
+        self.max_message_size = max_message_size
+        self.timeout_ms = timeout_ms
+        self.partial = OrderedDict()  # message_id -> [msg_type, count, {index: bytes}, first_seen_ms]
+        self.dropped = 0  # partial messages discarded (evicted, expired or oversized)
+
+    def add(self, payload, now_ms=None):
+        """
+        Add one FRAGMENT payload. Returns (msg_type, payload bytes) once the
+        message is complete, otherwise None.
+        """
+        if now_ms is None:
+            now_ms = int(time.time() * 1000)
+        self.expire(now_ms)
+
+        if len(payload) < FRAGMENT_HEADER_STRUCT.size:
+            return None
+        message_id, index, count, msg_type = FRAGMENT_HEADER_STRUCT.unpack_from(payload)
+        if count == 0 or index >= count:
+            return None
+        data = bytes(payload[FRAGMENT_HEADER_STRUCT.size:])
+
+        if count == 1:
+            return msg_type, data
+        if (count - 1) * MAX_FRAGMENT_DATA >= self.max_message_size:
+            self.dropped += 1
+            return None
+
+        entry = self.partial.get(message_id)
+        if entry is None:
+            while len(self.partial) >= self.max_messages:
+                self.partial.popitem(last=False)
+                self.dropped += 1
+            entry = self.partial[message_id] = [msg_type, count, {}, now_ms]
+        entry[2][index] = data
+
+        if len(entry[2]) < entry[1]:
+            return None
+        del self.partial[message_id]
+        fragments = entry[2]
+        return entry[0], b''.join(fragments[i] for i in range(entry[1]))
+
+    def expire(self, now_ms):
+        """Drop partial messages whose first fragment arrived more than timeout_ms ago."""
+        while self.partial:
+            message_id, entry = next(iter(self.partial.items()))
+            if now_ms - entry[3] < self.timeout_ms:
+                break
+            del self.partial[message_id]
+            self.dropped += 1
+
 def parse_packet(data):
     """
     Parses a packet, validates 16-bit checksum.
-    Returns: (header_dict, payload, valid_checksum)
+    Returns: (PacketHeader, payload memoryview, valid_checksum)
     """
     if len(data) < HEADER_SIZE:
         return None, None, False
 
-    # 1. Unpack header
-    protocol_id, version, msg_type, length, snapshot_id, seq_num, ack_num, timestamp, received_checksum = struct.unpack(
-        HEADER_FORMAT, data[:HEADER_SIZE]
-    )
-    
-    # 2. Validate Checksum
-    # Summing the entire packet with correct checksum should result in 0 (in 1's complement logic with inverse)
-    # OR: Recompute checksum with 0 field and match.
-    # We will recompute for clarity.
-    
-    header_no_checksum = struct.pack(
-        HEADER_FORMAT, 
-        protocol_id, 
-        version, 
-        msg_type, 
-        length, 
-        snapshot_id, 
-        seq_num, 
-        ack_num, 
-        timestamp, 
-        0
-    )
-    
-    payload = data[HEADER_SIZE:]
-    calculated_checksum = compute_checksum(header_no_checksum + payload)
-    
-    valid = (received_checksum == calculated_checksum)
-    
-    header = {
-        'protocol_id': protocol_id.decode(),
-        'version': version,
-        'msg_type': msg_type,
-        'length': length,
-        'snapshot_id': snapshot_id,
-        'seq_num': seq_num,
-        'ack_num': ack_num,  
-        'timestamp': timestamp,
-        'received_checksum': received_checksum
-    }
-    
-    return header, payload, valid
-
-def pack_grid_snapshot(grid):
-    packed = bytearray()
-    rows = len(grid)
-    cols = len(grid[0])
-
-    for r in range(rows):
-        for c in range(0, cols, 2):  
-            cell1 = grid[r][c] & 0x0F  
-            cell2 = grid[r][c+1] & 0x0F 
-            packed_byte = (cell1 << 4) | cell2
-            packed.append(packed_byte)
-
-    return bytes(packed) 
+    header = PacketHeader._make(HEADER_STRUCT.unpack_from(data))
+
+    # Summing the entire packet including a correct checksum gives 0xffff,
+    # so no header repack or payload copy is needed to verify it.
+    view = memoryview(data)
+    valid = ones_complement_sum(view) == 0xffff
+
+    return header, view[HEADER_SIZE:], valid
+
+# ==================== Grid packing ====================
+# Grids travel as flat row-major cell bytes (see grid.Grid). Packing is vectorized:
+# per (cell slot, byte) translate tables move each cell's bits into place, and the
+# slices are merged with big-int ORs and strided slice assignment, all in C.
+
+@lru_cache(maxsize=None)
+def _bit_table(bits, slot, byte_index, unpack):
+    """Translate table moving cell `slot` of a packed group to/from byte `byte_index`."""
+    group_bytes = bits // gcd(8, bits)
+    total_bits = group_bytes * 8
+    shift = total_bits - bits * (slot + 1) - 8 * (group_bytes - 1 - byte_index)
+    cell_mask = (1 << bits) - 1
+    if unpack:
+        return bytes(((v >> shift) if shift >= 0 else (v << -shift)) & cell_mask for v in range(256))
+    return bytes(((v & cell_mask) << shift if shift >= 0 else (v & cell_mask) >> -shift) & 0xFF
+                 for v in range(256))
+
+
+def _or_bytes(parts, length):
+    acc = 0
+    for part in parts:
+        acc |= int.from_bytes(part, "big")
+    return acc.to_bytes(length, "big")
+
+
+def pack_bits(cells, bits):
+    """Pack cell values `bits` wide (1-8), MSB-first, zero padded to a whole byte."""
+    group = 8 // gcd(8, bits)              # cells per packed group
+    group_bytes = bits * group // 8        # bytes per packed group
+    count = len(cells)
+    padded = bytes(cells) + bytes(-count % group)
+    groups = len(padded) // group
+
+    out = bytearray(groups * group_bytes)
+    for b in range(group_bytes):
+        parts = []
+        for k in range(group):
+            table = _bit_table(bits, k, b, False)
+            if any(table):
+                parts.append(padded[k::group].translate(table))
+        out[b::group_bytes] = _or_bytes(parts, groups)
+    return bytes(out[:(count * bits + 7) // 8])
+
+
+def unpack_bits(data, bits, count):
+    """Inverse of pack_bits: returns a bytearray of `count` cell values."""
+    group = 8 // gcd(8, bits)
+    group_bytes = bits * group // 8
+    groups = (count + group - 1) // group
+    padded = bytes(data[:groups * group_bytes]).ljust(groups * group_bytes, b"\x00")
+
+    cells = bytearray(groups * group)
+    for k in range(group):
+        parts = []
+        for b in range(group_bytes):
+            table = _bit_table(bits, k, b, True)
+            if any(table):
+                parts.append(padded[b::group_bytes].translate(table))
+        cells[k::group] = _or_bytes(parts, groups)
+    return cells[:count]
+
+
+def pack_grid_snapshot(cells):
+    """Pack flat grid cells at 4 bits per cell (two cells per byte)."""
+    return pack_bits(cells, 4)
 
 
 def unpack_grid_snapshot(payload, rows=20, cols=20):
-    grid = [[0 for _ in range(cols)] for _ in range(rows)]
-    i = 0  # index in payload
+    """Unpack 4-bit cells into a flat bytearray of rows * cols owners."""
+    return unpack_bits(payload, 4, rows * cols)
+
+# ==================== Snapshot codecs ====================
+# BOARD_SNAPSHOT payload: snapshot_id (4 bytes) + codec id (1 byte) + encoded grid.
+# Clients advertise the codecs they can decode as a bitmask (1 << codec id) in JOIN_REQ;
+# the server sends each client the smallest encoding it supports.
+CODEC_NIBBLE = 0   # 4 bits per cell (original format)
+CODEC_BITPACK = 1  # 1-8 bits per cell, width chosen from the highest owner id
+CODEC_RLE = 2      # (run length, owner) byte pairs over the row-major grid
+CODEC_ZLIB = 3     # zlib over the nibble-packed grid
+
+CODEC_MASK_DEFAULT = 1 << CODEC_NIBBLE  # what a client that advertises nothing can decode
+
+_SINGLE_BYTES = tuple(bytes((value,)) for value in range(256))
+
+
+def _encode_bitpack(cells):
+    # Format: bits per cell (1 byte) + cells packed MSB-first, zero padded to a byte
+    # Width is the fewest bits that hold the highest owner id (2 bits for up to 3 players)
+    bits = max(1, max(cells, default=0).bit_length())
+    return struct.pack("!B", bits) + pack_bits(cells, bits)
+
+
+def _decode_bitpack(data, count):
+    return unpack_bits(data[1:], data[0], count)
+
+
+def _run_starts(data):
+    """
+    Marker bytes for run-length coding: non-zero where a cell differs from the one before
+    it (the first cell always starts a run). One big-int XOR of the grid against itself
+    shifted by a cell, so it costs a few C-level passes whatever the board looks like.
+    """
+    diff = (int.from_bytes(data[1:], "big") ^ int.from_bytes(data[:-1], "big")).to_bytes(len(data) - 1, "big")
+    return b"\x01" + diff
+
+
+def _rle_min_size(cells):
+    # At least one (length, owner) pair per run
+    data = bytes(cells)
+    return 2 * (len(data) - _run_starts(data).count(0)) if data else 0
+
+
+def _encode_rle(cells):
+    # Format: pairs of (run length - 1, owner); runs are capped at 256 cells.
+    # Runs come from C-level compress/map over the run markers, not a loop per run.
+    data = bytes(cells)
+    count = len(data)
+    if not count:
+        return b""
+    marker = _run_starts(data)
+    starts = list(itertools.compress(range(count), marker))
+    if bytes(256) in marker:
+        # Split runs longer than 256 cells into 256-cell pieces (at most count / 256 of them)
+        lengths = list(map(operator.sub, starts[1:] + [count], starts))
+        long_runs = itertools.compress(zip(starts, lengths), map(operator.gt, lengths, itertools.repeat(256)))
+        for start, length in list(long_runs):
+            starts.extend(range(start + 256, start + length, 256))
+        starts.sort()
+    run_ends = starts[1:]
+    run_ends.append(count)
+    packed = bytearray(2 * len(starts))
+    packed[0::2] = bytes(map(operator.sub, map(operator.sub, run_ends, starts), itertools.repeat(1)))
+    packed[1::2] = bytes(map(data.__getitem__, starts))
+    return bytes(packed)
+
+
+def _decode_rle(data, count):
+    pairs = len(data) // 2
+    run_lengths = map(operator.add, bytes(data[0:2 * pairs:2]), itertools.repeat(1))
+    owners = map(_SINGLE_BYTES.__getitem__, bytes(data[1:2 * pairs:2]))
+    return bytearray(b"".join(map(operator.mul, owners, run_lengths)))[:count]
+
+
+def _encode_nibble(cells):
+    return pack_grid_snapshot(cells)
+
+
+def _decode_nibble(data, count):
+    return unpack_bits(data, 4, count)
+
+
+def _encode_zlib(cells):
+    return zlib.compress(_encode_nibble(cells))
+
+
+def _decode_zlib(data, count):
+    return _decode_nibble(zlib.decompress(bytes(data)), count)
+
+
+# codec id -> (name, encode(cells) -> bytes, decode(data, cell_count) -> cells)
+SNAPSHOT_CODECS = {
+    CODEC_NIBBLE: ("nibble", _encode_nibble, _decode_nibble),
+    CODEC_BITPACK: ("bitpack", _encode_bitpack, _decode_bitpack),
+    CODEC_RLE: ("rle", _encode_rle, _decode_rle),
+    CODEC_ZLIB: ("zlib", _encode_zlib, _decode_zlib),
+}
 
-    for r in range(rows):
-        for c in range(0, cols, 2):
-            byte = payload[i]
-            grid[r][c] = (byte >> 4) & 0x0F  
-            grid[r][c+1] = byte & 0x0F       
-            i += 1
+CODEC_MASK_ALL = 0
+for _codec_id in SNAPSHOT_CODECS:
+    CODEC_MASK_ALL |= 1 << _codec_id
 
+# Highest owner id a codec can carry (others take any byte). A joining player gets the
+# lowest id not in use (waiting room included), so ids only pass 15 while 16 or more
+# players are connected; 4-bit cells would silently truncate those owners.
+CODEC_MAX_OWNER = {CODEC_NIBBLE: 15, CODEC_ZLIB: 15}
+
+# codec id -> cheap lower bound of its output size; the codec is skipped when an encoding
+# already made is no bigger (RLE on a busy board: 2 bytes per run, never below nibbles)
+CODEC_MIN_SIZE = {CODEC_RLE: _rle_min_size}
+_NIBBLE_OWNERS = bytes(range(16))
+
+
+def encode_grid_snapshot(cells, codec_mask=CODEC_MASK_DEFAULT, cache=None):
+    """
+    Encode flat grid cells with the smallest codec allowed by codec_mask that can carry
+    every owner id on the board. Returns codec id (1 byte) + encoded grid. `cache` (dict)
+    lets a caller encode each codec only once per snapshot when several clients advertise
+    different masks. A client that only decodes nibbles still gets nibbles (ids mod 16).
+    """
+    if bytes(cells).translate(None, _NIBBLE_OWNERS):  # an owner id above 15
+        wide_mask = codec_mask
+        for codec_id in CODEC_MAX_OWNER:
+            wide_mask &= ~(1 << codec_id)
+        if wide_mask:
+            codec_mask = wide_mask
+    best = None
+    for codec_id, (_, encode, _) in SNAPSHOT_CODECS.items():
+        if not codec_mask & (1 << codec_id):
+            continue
+        if cache is not None and codec_id in cache:
+            encoded = cache[codec_id]
+        else:
+            min_size = CODEC_MIN_SIZE.get(codec_id)
+            if best is not None and min_size is not None and min_size(cells) >= len(best[1]):
+                continue
+            encoded = encode(cells)
+            if cache is not None:
+                cache[codec_id] = encoded
+        if best is None or len(encoded) < len(best[1]):
+            best = (codec_id, encoded)
+
+    if best is None:
+        return encode_grid_snapshot(cells, CODEC_MASK_DEFAULT, cache)
+    return struct.pack("!B", best[0]) + best[1]
+
+
+def decode_grid_snapshot(payload, rows=20, cols=20):
+    """Decode codec id (1 byte) + encoded grid into a flat bytearray of rows * cols owners."""
+    codec_id = payload[0]
+    if codec_id not in SNAPSHOT_CODECS:
+        raise ValueError(f"Unknown snapshot codec {codec_id}")
+    cells = SNAPSHOT_CODECS[codec_id][2](payload[1:], rows * cols)
+    if len(cells) != rows * cols:
+        raise ValueError(f"Snapshot has {len(cells)} cells, expected {rows * cols}")
+    return cells
+
+
+def pack_grid_delta(changes):
+    """
+    Pack a list of (row, col, owner) cell changes.
+    Format: count (4 bytes) + for each change: row (2 bytes), col (2 bytes), owner (1 byte)
+    """
+    data = bytearray(struct.pack("!I", len(changes)))
+    for r, c, owner in changes:
+        data += DELTA_ENTRY_STRUCT.pack(r, c, owner)
+    return bytes(data)
+
+
+def unpack_grid_delta(payload):
+    if len(payload) < 4:
+        return []
+
+    count = struct.unpack("!I", payload[0:4])[0]
+    count = min(count, (len(payload) - 4) // DELTA_ENTRY_STRUCT.size)
+    return list(DELTA_ENTRY_STRUCT.iter_unpack(payload[4:4 + count * DELTA_ENTRY_STRUCT.size]))
+
+
+def apply_grid_delta(grid, changes):
+    """Apply (row, col, owner) changes to a grid.Grid in place."""
+    for r, c, owner in changes:
+        if grid.in_bounds(r, c):
+            grid.set(r, c, owner)
     return grid
 
-def create_ack_packet(ack_num, seq_num=0, snapshot_id=0):
-    return create_packet(MSG_TYPE_ACK, seq_num, b'', snapshot_id, ack_num)
+def on_snapshot_channel(msg_type, payload):
+    """True for packets of the (unreliable) snapshot channel: boards sent whole (FRAGMENTs use SR ARQ)."""
+    return msg_type in SNAPSHOT_CHANNEL_TYPES
+
+def snapshot_ack_field(snapshot_id):
+    """snapshot_id header field acknowledging `snapshot_id` (None: nothing received yet)."""
+    return 0 if snapshot_id is None else (snapshot_id + 1) & 0xFFFF
 
-def pack_leaderboard_data(leaderboard):
+def unwrap_snapshot_ack(field, next_id):
+    """Snapshot id acknowledged by a snapshot_id header field; next_id is the sender's next id."""
+    if not field:
+        return None
+    return next_id - 1 - ((next_id - field) & 0xFFFF)
+
+def create_ack_packet(ack_num, seq_num=0, snapshot_id=0, sack_bits=0, conn_id=0):
+    """Standalone ACK: cumulative ack_num (next seq expected) and SACK bitmap, no payload."""
+    return create_packet(MSG_TYPE_ACK, seq_num, b'', snapshot_id, ack_num, sack_bits, conn_id)
+
+def build_sack_bitmap(ack_num, received):
+    """Bitmap of seqs ack_num+1 .. ack_num+SACK_BITS found in `received` (set or dict)."""
+    bitmap = 0
+    for seq in received:
+        offset = seq - ack_num - 1
+        if 0 <= offset < SACK_BITS:
+            bitmap |= 1 << offset
+    return bitmap
+
+def sack_acked(ack_num, bitmap, outstanding):
+    """Seqs in `outstanding` covered by a cumulative ack_num plus SACK bitmap."""
+    return [seq for seq in outstanding
+            if seq < ack_num or (seq > ack_num and seq - ack_num - 1 < SACK_BITS
+                                 and bitmap >> (seq - ack_num - 1) & 1)]
+
+class SackReceiver:
+    """
+    Receiver-side record of the seqs seen from one peer, kept as a cumulative
+    ack plus the out-of-order seqs above it, with a delayed-ACK deadline.
+    `next_expected` is the first seq of the peer's stream (0 for a new sender).
+    """
+
+    def __init__(self, next_expected=0):
+        self.next_expected = next_expected
+        self.above = set()
+        self.ack_due_ms = None  # time the pending ACK must go out, or None
+
+    def record(self, seq, now_ms):
+        """Note a received seq and schedule an ACK. Returns False for a duplicate."""
+        if self.ack_due_ms is None:
+            self.ack_due_ms = now_ms + ACK_DELAY_MS
+        if seq < self.next_expected or seq in self.above:
+            return False
+        if seq == self.next_expected:
+            self.next_expected += 1
+            while self.next_expected in self.above:
+                self.above.discard(self.next_expected)
+                self.next_expected += 1
+        else:
+            self.above.add(seq)
+        return True
+
+    def ack_fields(self):
+        """(cumulative ack, SACK bitmap) describing everything received."""
+        return self.next_expected, build_sack_bitmap(self.next_expected, self.above)
+
+    def piggyback(self):
+        """
+        ack_fields() for stamping on an outgoing data packet. That packet carries
+        the ACK, so the pending standalone ACK is cancelled.
+        """
+        self.ack_due_ms = None
+        return self.ack_fields()
+
+# SCORE_UPDATE / LEADERBOARD payload: update_id (4) + top count (1) + changed count (1),
+# then the top-k as (player_id, score, rank) and every player whose score changed since
+# the previous update as (player_id, score); score 0 means the player holds no cells.
+# Scores are absolute, so an update is idempotent; receivers ignore entries older than
+# the update they already applied for that player. The final LEADERBOARD repeats the
+# id of the last live update (and the top-k) with no changes: a confirmation.
+LEADERBOARD_HEADER_STRUCT = struct.Struct("!IBB")
+LEADERBOARD_TOP_STRUCT = struct.Struct("!BIB")     # player_id, score, rank
+LEADERBOARD_CHANGE_STRUCT = struct.Struct("!BI")   # player_id, score
+
+
+def pack_leaderboard_data(update_id, top, changes=()):
+    data = [LEADERBOARD_HEADER_STRUCT.pack(update_id, len(top), len(changes))]
+    data += [LEADERBOARD_TOP_STRUCT.pack(pid, score, rank) for pid, score, rank in top]
+    data += [LEADERBOARD_CHANGE_STRUCT.pack(pid, score) for pid, score in changes]
+    return b''.join(data)
 
-    # Format: count (1 byte) + for each entry: player_id (1 byte), score (2 bytes), rank (1 byte)
-    count = len(leaderboard)
-    data = struct.pack("!B", count)
-    for pid, score, rank in leaderboard:
-        data += struct.pack("!BHB", pid, score, rank)
-    return data
 
 def unpack_leaderboard_data(payload):
-    if len(payload) < 1:
-        return []
-    
-    count = struct.unpack("!B", payload[0:1])[0]
-    offset = 1
-    leaderboard = []
-    
-    for _ in range(count):
-        if len(payload) >= offset + 4:  # 1 + 2 + 1 = 4 bytes per entry
-            pid, score, rank = struct.unpack("!BHB", payload[offset:offset+4])
-            leaderboard.append((pid, score, rank))
-            offset += 4
-    
-    return leaderboard
\ No newline at end of file
+    """(update_id, [(player_id, score, rank)], [(player_id, score)]); raises struct.error if truncated."""
+    update_id, top_count, change_count = LEADERBOARD_HEADER_STRUCT.unpack_from(payload)
+    offset = LEADERBOARD_HEADER_STRUCT.size
+    top = list(LEADERBOARD_TOP_STRUCT.iter_unpack(payload[offset:offset + top_count * LEADERBOARD_TOP_STRUCT.size]))
+    offset += top_count * LEADERBOARD_TOP_STRUCT.size
+    changes = list(LEADERBOARD_CHANGE_STRUCT.iter_unpack(
+        payload[offset:offset + change_count * LEADERBOARD_CHANGE_STRUCT.size]))
+    if len(top) != top_count or len(changes) != change_count:
+        raise struct.error("truncated leaderboard")
+    return update_id, top, changes
+
+
+def merge_leaderboard_data(older, newer):
+    """
+    One SCORE_UPDATE payload standing in for two unsent ones: the newer id and top-k,
+    and the changes of both (the newer score wins for a player in both).
+    """
+    _, _, old_changes = unpack_leaderboard_data(older)
+    update_id, top, new_changes = unpack_leaderboard_data(newer)
+    changes = dict(old_changes)
+    changes.update(new_changes)
+    return pack_leaderboard_data(update_id, top, list(changes.items()))
\ No newline at end of file
@@ -0,0 +1,121 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+def monotonic_ms():
+    return time.monotonic() * 1000
+
+
+class Timer:
+    """Handle for one scheduled callback; cancel() stops it from running."""
+
+    __slots__ = ("deadline", "callback", "args", "cancelled", "_scheduler")
+
+    def __init__(self, scheduler, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self._scheduler = scheduler
+
+    def cancel(self):
+        if not self.cancelled:
+            self.cancelled = True
+            if self._scheduler is not None:
+                self._scheduler._cancelled += 1
+
+
+class Scheduler:
+    """
+    Min-heap of deadlines (monotonic ms) shared by server and client for RTO expiries,
+    player inactivity, game deadlines and leaderboard timeouts.
+
+    A tick pops only the timers that expired, so it costs O(expired * log n) however
+    many are outstanding. Cancelled timers stay in the heap until they surface (or
+    the heap is compacted once they are the majority).
+
+    Timers may be added from any thread. The owner drives the scheduler either by
+    calling wait() + run_due() in a loop (client timer thread), or by re-arming its
+    own event-loop timer from `on_earlier`, called whenever a new timer becomes the
+    earliest (server asyncio engine).
+    """
+
+    def __init__(self, on_earlier=None):
+        self.on_earlier = on_earlier
+        self._heap = []  # (deadline, tie-breaker, Timer)
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._cancelled = 0
+
+    def __len__(self):
+        return len(self._heap) - self._cancelled
+
+    def call_at(self, deadline_ms, callback, *args):
+        timer = Timer(self, deadline_ms, callback, args)
+        with self._cond:
+            heapq.heappush(self._heap, (deadline_ms, next(self._counter), timer))
+            earlier = self._heap[0][2] is timer
+            if earlier:
+                self._cond.notify()
+        if earlier and self.on_earlier is not None:
+            self.on_earlier()
+        return timer
+
+    def call_later(self, delay_ms, callback, *args):
+        return self.call_at(monotonic_ms() + delay_ms, callback, *args)
+
+    def _drop_cancelled(self):
+        # Caller holds the lock
+        heap = self._heap
+        if self._cancelled > 64 and self._cancelled * 2 > len(heap):
+            self._heap = heap = [entry for entry in heap if not entry[2].cancelled]
+            heapq.heapify(heap)
+            self._cancelled = 0
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+            self._cancelled -= 1
+
+    def next_deadline(self):
+        """Earliest pending deadline (monotonic ms), or None."""
+        with self._cond:
+            self._drop_cancelled()
+            return self._heap[0][0] if self._heap else None
+
+    def run_due(self, now_ms=None):
+        """Run every timer whose deadline has passed. Returns how many ran."""
+        if now_ms is None:
+            now_ms = monotonic_ms()
+        ran = 0
+        while True:
+            with self._cond:
+                self._drop_cancelled()
+                if not self._heap or self._heap[0][0] > now_ms:
+                    break
+                timer = heapq.heappop(self._heap)[2]
+                timer._scheduler = None  # fired: a late cancel() has nothing to discount
+            # Outside the lock: callbacks usually schedule their next timer
+            try:
+                timer.callback(*timer.args)
+            except Exception as e:
+                print(f"[ERROR] timer callback {getattr(timer.callback, '__name__', timer.callback)}: {e}")
+            ran += 1
+        return ran
+
+    def wait(self, max_ms):
+        """Block until the earliest deadline (at most max_ms), or until an earlier timer is added."""
+        with self._cond:
+            self._drop_cancelled()
+            timeout = max_ms
+            if self._heap:
+                timeout = min(max_ms, self._heap[0][0] - monotonic_ms())
+            if timeout > 0:
+                self._cond.wait(timeout / 1000)
+
+    def clear(self):
+        with self._cond:
+            for entry in self._heap:
+                entry[2].cancelled = True
+            self._heap = []
+            self._cancelled = 0
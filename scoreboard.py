@@ -0,0 +1,128 @@
+class ScoreBoard:
+    """
+    Live scores of one game, kept ordered (highest first) as claims happen.
+
+    A claim moves one cell from one player to another, so a score only ever
+    changes by one. Players with the same score form a band of consecutive
+    slots in `order`; a +1 swaps the player with the first player of its band
+    and a -1 with the last, so the order stays sorted in O(1) per claim instead
+    of re-sorting every player. Ranks are competition ranks (equal scores share
+    a rank): the band's first slot + 1.
+
+    Players appear with their first cell; remove() takes a leaving player out in
+    O(their cells). take_changes() returns the players whose score differs from
+    the last call, for score-delta messages.
+    """
+
+    def __init__(self):
+        self.order = []         # player ids, highest score first
+        self._pos = {}          # pid -> slot in order
+        self._score = {}        # pid -> score
+        self._band_start = {}   # score -> first slot holding that score
+        self._band_size = {}    # score -> players holding that score
+        self._reported = {}     # pid -> score at the last take_changes() (players changed since)
+
+    def __len__(self):
+        return len(self.order)
+
+    def score(self, pid):
+        return self._score.get(pid, 0)
+
+    def rank(self, pid):
+        return self._band_start[self._score[pid]] + 1 if pid in self._score else None
+
+    def move_cell(self, old_owner, new_owner):
+        """One cell changed hands (0 = unclaimed)."""
+        if old_owner:
+            self._decrement(old_owner)
+        if new_owner:
+            self._increment(new_owner)
+
+    def remove(self, pid):
+        """Take a player (and whatever score is left) off the board."""
+        if pid not in self._score:
+            return
+        while self._score[pid]:
+            self._decrement(pid)
+        # Score 0 is the last band: swap into the last slot and drop it
+        self._note(pid)
+        self._swap(self._pos[pid], len(self.order) - 1)
+        self.order.pop()
+        del self._pos[pid], self._score[pid]
+        self._shrink_band(0, at_start=False)
+
+    def clear(self):
+        self.__init__()
+
+    def top(self, k):
+        """[(pid, score, rank)] of the k best players with a non-zero score."""
+        entries = []
+        for pid in self.order[:k]:
+            score = self._score[pid]
+            if not score:
+                break
+            entries.append((pid, score, self._band_start[score] + 1))
+        return entries
+
+    def standings(self):
+        """[(pid, score)] of every player with a non-zero score, highest first."""
+        return [(pid, self._score[pid]) for pid, _, _ in self.top(len(self.order))]
+
+    def take_changes(self):
+        """[(pid, score)] for players whose score changed since the last call (0 = gone)."""
+        changes = [(pid, self._score.get(pid, 0)) for pid, old in self._reported.items()
+                   if self._score.get(pid, 0) != old]
+        self._reported = {}
+        return changes
+
+    def _note(self, pid):
+        if pid not in self._reported:
+            self._reported[pid] = self._score.get(pid, 0)
+
+    def _swap(self, i, j):
+        order = self.order
+        if i != j:
+            order[i], order[j] = order[j], order[i]
+            self._pos[order[i]] = i
+            self._pos[order[j]] = j
+
+    def _shrink_band(self, score, at_start):
+        size = self._band_size[score] - 1
+        if size:
+            self._band_size[score] = size
+            if at_start:
+                self._band_start[score] += 1
+        else:
+            del self._band_size[score], self._band_start[score]
+
+    def _grow_band(self, score, slot):
+        if score in self._band_size:
+            self._band_size[score] += 1
+            self._band_start[score] = min(self._band_start[score], slot)
+        else:
+            self._band_size[score] = 1
+            self._band_start[score] = slot
+
+    def _increment(self, pid):
+        self._note(pid)
+        if pid not in self._score:
+            # New players join the score-0 band, which is always last
+            self._score[pid] = 0
+            self._pos[pid] = len(self.order)
+            self.order.append(pid)
+            self._grow_band(0, self._pos[pid])
+        score = self._score[pid]
+        first = self._band_start[score]
+        self._swap(self._pos[pid], first)
+        self._shrink_band(score, at_start=True)
+        self._score[pid] = score + 1
+        self._grow_band(score + 1, first)
+
+    def _decrement(self, pid):
+        self._note(pid)
+        score = self._score[pid]
+        last = self._band_start[score] + self._band_size[score] - 1
+        self._swap(self._pos[pid], last)
+        self._shrink_band(score, at_start=False)
+        self._score[pid] = score - 1
+        self._grow_band(score - 1, last)
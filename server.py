@@ -1,49 +1,106 @@
+import asyncio
+import random
 import socket
 import struct
 import time
-import select
 import os
 import threading
-import csv
-try:
-    import psutil
-except ImportError:
-    psutil = None
 
-from gui import GameGUI
+from congestion import CongestionControl, load_arq_config
+from metrics import MetricsRecorder
+from observer import ServerObserver
 from protocol import (
-    MSG_TYPE_LEADERBOARD, create_ack_packet, create_packet, pack_grid_snapshot, pack_leaderboard_data, parse_packet,
-    MSG_TYPE_JOIN_REQ, MSG_TYPE_JOIN_RESP,
-    MSG_TYPE_CLAIM_REQ, MSG_TYPE_LEAVE, MSG_TYPE_BOARD_SNAPSHOT,
-    MSG_TYPE_ACK, MSG_TYPE_GAME_START, MSG_TYPE_GAME_OVER, HEADER_SIZE
+    MSG_TYPE_LEADERBOARD, create_packet, pack_leaderboard_data, parse_packet, CLAIM_FORMAT, split_datagram,
+    create_ack_packet, sack_acked, SackReceiver, ACK_DELAY_MS, unwrap_snapshot_ack,
+    pack_grid_delta, encode_grid_snapshot, CODEC_MASK_DEFAULT, BroadcastPacket, MSG_TYPE_JOIN_REQ, MSG_TYPE_JOIN_RESP,
+    MSG_TYPE_CLAIM_REQ, MSG_TYPE_LEAVE, MSG_TYPE_BOARD_SNAPSHOT, MSG_TYPE_BOARD_DELTA,
+    MSG_TYPE_ACK, MSG_TYPE_GAME_START, MSG_TYPE_GAME_OVER, HEADER_SIZE, RECV_BUFFER_SIZE, needs_fragmentation,
+    MSG_TYPE_SCORE_UPDATE
 )
+from grid import Grid, new_claim_times
+from scheduler import Scheduler, monotonic_ms
+from scoreboard import ScoreBoard
+from outbound import OutboundMessage, OutboundScheduler, SendBacklog, QOS_NAMES
+
+CLAIM_SIZE = struct.calcsize(CLAIM_FORMAT)
+RECV_DRAIN_LIMIT = 256  # default datagrams read per wakeup before timers get a turn
+SOCKET_BUFFER_SIZE = 1 << 20  # default SO_RCVBUF / SO_SNDBUF requested (the kernel may cap it)
+PLAYER_TIMEOUT_S = 10    # active players with no traffic for this long are removed
+MAX_SNAPSHOT_LATENCY_MS = 50  # tick mode: a change is broadcast at most this long after it was applied
+SNAPSHOT_HISTORY = 64  # snapshots a delta baseline may lag behind before the client gets a keyframe
+LEADERBOARD_INTERVAL_MS = 250  # live leaderboard: at most one SCORE_UPDATE per interval, only on change
+LEADERBOARD_TOP_K = 8  # players listed in each live update (every changed score is sent regardless)
+END_ACK_TIMEOUT_MS = 1500  # end of game: longest wait for a client's ACK of GAME_OVER / LEADERBOARD
+POST_GAME_RESET_MS = 5000  # final scores stay up this long after the leaderboard is confirmed
+SEND_BACKLOG_LIMIT = 64  # SR ARQ messages a client may have waiting for window space
 
 
 def current_time_ms():
     return int(time.time() * 1000)
 
-def calculate_scores_from_grid(grid):
-    scores = {}
-    for row in grid:
-        for cell in row:
-            if cell != 0:  # 0 means unclaimed
-                scores[cell] = scores.get(cell, 0) + 1
-    # Convert to list of tuples and sort by score (highest first)
-    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
-
 
 class GameServer:
-    def __init__(self, ip="127.0.0.1", port=5005, metrics_file_path="server_metrics.csv"):
+    def __init__(self, ip="127.0.0.1", port=5005, metrics_file_path="server_metrics.csv", rows=20, cols=20,
+                 rcvbuf=SOCKET_BUFFER_SIZE, sndbuf=SOCKET_BUFFER_SIZE, recv_budget=RECV_DRAIN_LIMIT, observer=None,
+                 metrics_bin_path=None, tick_hz=0, max_latency_ms=MAX_SNAPSHOT_LATENCY_MS, egress_kbps=0,
+                 outbound_policy="fair", client_weights=None):
         self.ip = ip
         self.port = port
-        self.metrics_file_path = metrics_file_path
+        self.rcvbuf = rcvbuf  # socket buffer sizes requested at start(); 0 keeps the OS default
+        self.sndbuf = sndbuf
+        self.recv_budget = recv_budget  # datagrams drained per wakeup
+        self.egress_rate = egress_kbps * 1000 // 8  # bytes/sec all clients share (0 = unlimited)
+        self.outbound_policy = outbound_policy  # "fair" (QoS classes + per-client DRR) or "fifo"
+        self.client_weights = {}  # pid -> share of the outbound link (default 1), see set_client_weight
+        for player_id, weight in (client_weights or {}).items():
+            self.set_client_weight(player_id, weight)
+        self.metrics_file_path = metrics_file_path  # CSV for postprocess.py (None to skip)
+        self.metrics_bin_path = metrics_bin_path    # optional binary records (metrics.read_records)
+        self.default_rows = rows  # grid size unless game_settings.txt overrides it
+        self.default_cols = cols
+
+        # Snapshot pacing. tick_hz=0: one snapshot per loop iteration that changed the
+        # grid (every claim drained in that batch). Otherwise at most one per tick,
+        # and never later than max_latency_ms after the first change it carries.
+        self.tick_ms = 1000.0 / tick_hz if tick_hz else 0
+        self.max_latency_ms = max_latency_ms
+        self._tick_timer = None
+        self._last_tick_ms = 0
+        self._dirty_since = None  # monotonic ms of the oldest change not broadcast yet
+        self.snapshot_stats = {'claims': 0, 'snapshots': 0, 'wait_ms_total': 0, 'wait_ms_max': 0,
+                               'redundant': 0, 'resyncs': 0}
 
         # Sockets & networking
         self.server_socket = None
+        self.outbox = None  # OutboundScheduler: batches per client, flushed every loop iteration
+        self._pace_timer = None  # egress rate spent: flush again when it refills
+        self.peer_acks = {}  # addr -> SackReceiver (seqs received from that peer, delayed ACK)
+        self._acks_pending = False
+
+        # asyncio engine: receive and timers all run on one loop thread
+        self.loop = None
+        self._loop_thread = None
+        self._loop_thread_id = None
+        self._service_scheduled = False
+        self._writer_armed = False  # waiting for the socket to drain blocked datagrams
+
+        # Timers (RTO, delayed ACK, player inactivity, game deadline, post-game reset),
+        # fired on the engine loop by a single loop timer armed at the earliest deadline
+        self.scheduler = Scheduler(on_earlier=self._wake_scheduler)
+        self._scheduler_handle = None
+        self._ack_timer = None          # Timer for the earliest delayed ACK
+        self._rto_handles = {}          # (player_id, seq) -> Timer for that packet's RTO
+        self._inactivity_timers = {}    # player_id -> Timer checking PLAYER_TIMEOUT_S
+        self._game_timers = []          # deadline + 10s warning of the running game
 
         # Players
         self.clients = {}  # player_id -> (addr, last_seen)
         self.waiting_room_players = {}  # player_id -> addr
+
+        # Connection table: O(1) demux by source address or by header conn_id
+        self.addr_to_pid = {}      # addr -> player_id
+        self.conn_to_pid = {}      # conn_id -> player_id
+        self.client_conn_ids = {}  # player_id -> conn_id (stamped on everything we send it)
         self.client_base = {}   # player_id -> base of SR window
 
         # Sequence & snapshots
@@ -51,8 +108,8 @@ class GameServer:
         self.snapshot_id = 0  # incremental snapshot ID
 
         # Game state
-        self.grid_state = [[0] * 20 for _ in range(20)]
-        self.grid_claim_time = [[0] * 20 for _ in range(20)]
+        self.grid_state = Grid(rows, cols)
+        self.grid_claim_time = new_claim_times(rows, cols)  # flat, same indexing as grid_state.cells
         self.game_active = False
         self.min_players = 2
         self.running = False
@@ -61,16 +118,21 @@ class GameServer:
         self.game_duration = 120 # 120 seconds game duration for stealing mode
         self.game_start_time = None
         self.stealing_enabled = False  # Will be loaded when game starts
-        self.total_cells = 20 * 20
-        self.claimed_cells_count = 0  # Track claimed cells for non-stealing mode
+        self.total_cells = rows * cols
 
         # leaderboard data storage
         self.final_scores = []
-
-        # Start game timer thread
-        threading.Thread(target=self._game_timer_thread, daemon=True).start()
-        # Start player timeout checker thread
-        threading.Thread(target=self._player_timeout_thread, daemon=True).start()
+        self.scoreboard = ScoreBoard()   # live scores, ordered incrementally as cells change hands
+        self.leaderboard_id = 0          # id of the last SCORE_UPDATE sent
+        self._leaderboard_top = []       # top-k in that update (ranking changes trigger a new one)
+        self._leaderboard_timer = None
+        self._leaderboard_sent_ms = None
+
+        # End-of-game sequence, advanced by client ACKs and one timer on the engine loop
+        self.end_phase = None          # None, "delivering" (GAME_OVER / LEADERBOARD) or "scores_shown"
+        self._end_pending = {}         # pid -> (msg_type, its OutboundMessage or None if not accepted, deadline ms)
+        self._end_leaderboard = None   # BroadcastPacket of the final LEADERBOARD
+        self._end_timer = None
 
         # Statistics
         self.stats = {'sent': 0, 'received': 0, 'dropped': 0, 'client_count': 0}
@@ -79,35 +141,53 @@ class GameServer:
         self.client_bytes_sent = {} # pid -> total_bytes
         self.client_join_time = {}  # pid -> start_time
         
-        # Metrics Logging
-        self.metrics_file = None
-        self.metrics_writer = None
+        # Metrics Logging: per-ACK records go to a ring, written out by a background thread
+        self.metrics = None
 
 
         # For late joiners (snapshot history)
-        self.recent_snapshots = []
-        self.max_snapshot_history = 10
+        self.recent_snapshots = []  # [(snapshot_id, cells changed by this snapshot)]
+        self.max_snapshot_history = SNAPSHOT_HISTORY
+
+        # Delta snapshots
+        self.dirty_cells = set()          # (r, c) changed since the last recorded snapshot
+        self.client_snapshot_ack = {}     # pid -> latest snapshot_id the client has ACKed
+        self.client_codecs = {}           # pid -> bitmask of snapshot codecs the client decodes (JOIN_REQ)
+
+        # Unreliable delta channel: every board is a delta from the client's last ACK to now
+        self.client_snapshot_sent = {}  # pid -> (newest snapshot_id sent, monotonic ms it was sent)
+        self.client_snapshot_reliable = {}  # pid -> id of a board too big for one datagram, in flight over SR ARQ
+        self._resync_timer = None       # sweep resending to clients left behind by a lost board
+        self._resync_due = None         # monotonic ms the sweep is armed for
+        self._snapshot_ack_floor = 0    # ACKs of ids below this predate the current history
+        self.snapshot_sent_ms = {}      # snapshot_id -> wall ms it went out (metrics; ids still in history)
 
         # SR ARQ per client
-        self.N = 6  # window size
-        self.client_windows = {}  # player_id -> {seq_num: packet}
+        self.arq_config = load_arq_config()  # cwnd / RTO bounds (arq_* in game_settings.txt)
+        self.client_windows = {}  # player_id -> {seq_num: (header, payload) parts}
         self.client_timers = {}   # player_id -> {seq_num: timestamp}
         self.client_next_seq = {} # player_id -> next seq num to use
         self.client_base = {}   # player_id -> base of SR window
         
-        # RTT / Congestion Control (EWMA)
-        self.client_rtt = {}        # pid -> {'est': 100, 'dev': 50, 'rto': 1000}
+        # RTT / Congestion Control
+        self.client_cc = {}         # pid -> CongestionControl (AIMD window, RTO with backoff)
         self.client_send_ts = {}    # pid -> {seq: timestamp} (Original send time)
         self.client_retrans = {}    # pid -> set(seq) (Retransmitted packets)
 
-        # GUI
-        self.gui = GameGUI(title="Grid Game Server")
-        self._setup_gui_callbacks()
+        # Messages waiting for window space (instead of being dropped on a full window)
+        self.client_backlog = {}    # pid -> SendBacklog
+        self.backlog_limit = SEND_BACKLOG_LIMIT
+        self.backlog_depth = 0      # messages waiting, all clients
+        self.backlog_stats = {'queued': 0, 'sent': 0, 'collapsed': 0, 'dropped': 0, 'max_depth': 0,
+                              'wait_ms_total': 0, 'wait_ms_max': 0}
+
+        # Front end (GUI or nothing); the server never imports tkinter itself
+        self.observer = observer if observer is not None else ServerObserver()
         # reflect initial stats in GUI
         try:
-            self.gui.update_stats(self.stats)
-            self.gui.update_player_info("Server", False)
-            self.gui.update_players(self.clients)
+            self.observer.update_stats(self.stats)
+            self.observer.update_player_info("Server", False)
+            self.observer.update_players(self.clients)
         except Exception:
             # GUI may not implement some functions exactly; safe-guard
             pass
@@ -117,63 +197,96 @@ class GameServer:
         try:
             self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            # Optionally increase buffer for safety
-            try:
-                self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)
-            except Exception:
-                pass
+            # Large kernel buffers absorb bursts between wakeups instead of dropping them
+            for option, size in ((socket.SO_RCVBUF, self.rcvbuf), (socket.SO_SNDBUF, self.sndbuf)):
+                if size:
+                    try:
+                        self.server_socket.setsockopt(socket.SOL_SOCKET, option, size)
+                    except OSError as e:
+                        print(f"[WARNING] could not set socket buffer to {size}: {e}")
+            print(f"[INFO] Socket buffers: rcvbuf={self.server_socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)} "
+                  f"sndbuf={self.server_socket.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)}")
             self.server_socket.setblocking(0)
             self.server_socket.bind((self.ip, self.port))
+            self.outbox = OutboundScheduler(self.server_socket, rate=self.egress_rate,
+                                            fair=self.outbound_policy == "fair")
             self.running = True
 
-            # Start server loop thread
-            threading.Thread(target=self._server_loop, daemon=True).start()
+            # Start the engine loop thread (game timer and player timeouts run as its tasks)
+            self.loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(target=self._run_loop, daemon=True)
+            self._loop_thread.start()
 
-            # Open metrics file
-            try:
-                self.metrics_file = open(self.metrics_file_path, "w", newline="")
-                self.metrics_writer = csv.writer(self.metrics_file, delimiter=" ")
-                # Write header compatible with postprocess.py
-                self.metrics_writer.writerow(["client_id", "snapshot_id", "seq_num", "server_timestamp_ms", "recv_time_ms", "cpu_percent", "perceived_position_error", "bandwidth_per_client_kbps"])
-                self.metrics_file.flush()
-                print(f"[INFO] Logging metrics to {self.metrics_file_path}")
-            except Exception as e:
-                print(f"[ERROR] Failed to open metrics file: {e}")
+            # Open metrics files
+            if self.metrics_file_path or self.metrics_bin_path:
+                try:
+                    self.metrics = MetricsRecorder(self.metrics_file_path, self.metrics_bin_path)
+                    self.metrics.start()
+                    print(f"[INFO] Logging metrics to {self.metrics_file_path or ''} {self.metrics_bin_path or ''}")
+                except Exception as e:
+                    self.metrics = None
+                    print(f"[ERROR] Failed to open metrics file: {e}")
 
             print(f"[INFO] Server started at {self.ip}:{self.port}")
 
-            self.gui.log_message(f"Server started on {self.ip}:{self.port}", "success")
-            self.gui.update_player_info("Server", True)
+            self.observer.log_message(f"Server started on {self.ip}:{self.port}", "success")
+            self.observer.update_player_info("Server", True)
             self.stats['client_count'] = len(self.clients) + len(self.waiting_room_players)
-            self.gui.update_stats(self.stats)
+            self.observer.update_stats(self.stats)
             return True
 
         except Exception as e:
-            self.gui.log_message(f"Server start error: {e}", "error")
+            self.observer.log_message(f"Server start error: {e}", "error")
             return False
 
     def stop(self):
         self.running = False
         self._should_send_snapshots = False  #Stop all snapshots
+        if self.loop is not None:
+            try:
+                self.loop.call_soon_threadsafe(self.loop.stop)
+            except RuntimeError:
+                pass  # loop already closed
+            if self._loop_thread is not threading.current_thread():
+                self._loop_thread.join(timeout=2)
+            self.loop = None
         if self.server_socket:
             try:
+                self._flush_outbox()
                 self.server_socket.close()
             except Exception:
                 pass
             self.server_socket = None
 
-        if self.metrics_file:
-            try:
-                self.metrics_file.close()
-            except:
-                pass
-            self.metrics_file = None
-            self.metrics_writer = None
+        if self.metrics:
+            self.metrics.close()
+            self.metrics = None
+
+        snap = self.snapshot_stats
+        if snap['snapshots']:
+            print(f"[SNAPSHOT] {snap['claims']} claims -> {snap['snapshots']} snapshots, "
+                  f"wait avg={snap['wait_ms_total'] / snap['snapshots']:.1f}ms max={snap['wait_ms_max']:.1f}ms, "
+                  f"redundant={snap['redundant']} resyncs={snap['resyncs']}")
+        backlog = self.backlog_stats
+        if backlog['queued']:
+            print(f"[BACKLOG] {backlog['queued']} queued, {backlog['collapsed']} collapsed, "
+                  f"{backlog['dropped']} dropped, max depth={backlog['max_depth']}, "
+                  f"wait avg={backlog['wait_ms_total'] / max(1, backlog['sent']):.1f}ms "
+                  f"max={backlog['wait_ms_max']:.1f}ms")
+        if self.outbox is not None:
+            out = self.outbox.stats
+            classes = ", ".join(
+                f"{name} {out['sent'][qos]} ({out['bytes'][qos]}B, wait avg="
+                f"{out['wait_ms_total'][qos] / max(1, out['sent'][qos]):.1f}ms max={out['wait_ms_max'][qos]:.1f}ms)"
+                for qos, name in enumerate(QOS_NAMES))
+            print(f"[OUTBOUND] {self.outbound_policy}: {classes}; dropped={out['dropped']} "
+                  f"max queued={out['max_queued']}")
 
 
         # Clear state
         self.clients.clear()
         self.waiting_room_players.clear()
+        self._clear_connections()
         self.client_windows.clear()
         self.client_timers.clear()
         self.client_next_seq.clear()
@@ -181,23 +294,101 @@ class GameServer:
 
 
         print("[INFO] Server stopped.")
-        self.gui.log_message("Server stopped", "info")
-        self.gui.update_player_info("Server", False)
-        self.gui.update_players(self.clients)
+        self.observer.log_message("Server stopped", "info")
+        self.observer.update_player_info("Server", False)
+        self.observer.update_players(self.clients)
         self.stats['client_count'] = 0
-        self.gui.update_stats(self.stats)
+        self.observer.update_stats(self.stats)
 
     # ==================== SR ARQ Sender ====================
-    def _sr_send(self, player_id, msg_type, payload=b''):
+    def _send_due_acks(self, force_addr=None):
+        """
+        Queue a standalone SACK (cumulative ack + bitmap) per peer whose delayed-ACK
+        deadline passed without any data to piggyback it on. `force_addr` is ACKed now.
+        Returns the earliest deadline still being held back (ms), or None.
+        """
+        now = current_time_ms()
+        pending = None
+        for addr, receiver in self.peer_acks.items():
+            if receiver.ack_due_ms is None:
+                continue
+            if now < receiver.ack_due_ms and addr != force_addr:
+                if pending is None or receiver.ack_due_ms < pending:
+                    pending = receiver.ack_due_ms
+                continue
+            receiver.ack_due_ms = None
+            ack_num, bitmap = receiver.ack_fields()
+            conn_id = self.client_conn_ids.get(self.addr_to_pid.get(addr), 0)
+            try:
+                self.outbox.send(create_ack_packet(ack_num, sack_bits=bitmap, conn_id=conn_id), addr)
+                print(f"[SEND ACK] ack={ack_num} sack={bitmap:#x}, to={addr}")
+            except Exception as e:
+                print(f"[ERROR] sending ACK to {addr}: {e}")
+        return pending
+
+    def _send_datagram(self, parts, addr):
+        """Queue a packet given as a tuple of byte chunks (header, payload, ...) for the next flush."""
+        self.outbox.send(parts, addr)
+        self._schedule_service()
+
+    def _flush_outbox(self):
+        """
+        Send everything queued this loop iteration, one batch datagram per client. The
+        OutboundScheduler sends control before live scores before boards, and shares the
+        link fairly between clients when it cannot send everything at once.
+        """
+        try:
+            if not self.outbox.flush():
+                # Send buffer full or egress rate spent: finish the flush when the socket
+                # becomes writable / the rate refills
+                self._call_in_loop(self._await_outbox)
+        except Exception as e:
+            print(f"[ERROR] flushing outbox: {e}")
+
+    def _await_outbox(self):
+        delay = self.outbox.pace_delay_ms()
+        if delay is None:
+            self._arm_writer()
+        elif self._pace_timer is None:
+            self._pace_timer = self.scheduler.call_later(delay, self._on_pace_timer)
+
+    def _on_pace_timer(self):
+        self._pace_timer = None
+        self._flush_outbox()
+
+    def _arm_writer(self):
+        if not self._writer_armed and self.server_socket is not None:
+            self._writer_armed = True
+            self.loop.add_writer(self.server_socket.fileno(), self._on_writable)
+
+    def _on_writable(self):
+        try:
+            drained = self.outbox.flush()
+        except Exception as e:
+            print(f"[ERROR] flushing outbox: {e}")
+            drained = True
+        if drained or self.outbox.waiting_for == "rate":
+            self._writer_armed = False
+            self.loop.remove_writer(self.server_socket.fileno())
+            if not drained:
+                self._await_outbox()
+
+    def _sr_send(self, player_id, msg_type, payload=b'', prepared=None):
+        """
+        Send a message over SR ARQ. `prepared` is an optional BroadcastPacket whose
+        payload/checksum were encoded once for all recipients. Boards only come through
+        here when they need fragments; the rest use the unreliable snapshot channel
+        (_send_latest_snapshot).
+
+        If the congestion window is full (or messages are already waiting) the message
+        joins the client's bounded backlog and goes out as ACKs open the window, control
+        messages first (_drain_backlog). Returns the OutboundMessage, whose seqs are set
+        once it is transmitted, or None if it was not accepted.
+        """
        # Check if player exists before sending
         if player_id not in self.clients and player_id not in self.waiting_room_players:
             print(f"[ERROR] Player {player_id} not found, not sending")
-            return False
-
-        # Don't send to clients if game is over and it's a snapshot
-        if msg_type == MSG_TYPE_BOARD_SNAPSHOT and not self._should_send_snapshots:
-            print(f"[INFO] Skipping snapshot for player {player_id}, snapshots disabled")
-            return False
+            return None
 
         # Initialize structures if needed
         if player_id not in self.client_next_seq:
@@ -206,62 +397,133 @@ class GameServer:
             self.client_windows[player_id] = {}      # seq → packet
             self.client_timers[player_id] = {}       # seq → timestamp
             
-            # Init RTT stats (RFC 6298 defaults: RTO=1s initially)
-            self.client_rtt[player_id] = {'est': 100, 'dev': 50, 'rto': 1000}
+            # Congestion window and RTT stats (RFC 6298 defaults: RTO=1s initially)
+            self.client_cc[player_id] = CongestionControl(self.arq_config)
             self.client_send_ts[player_id] = {}
             self.client_retrans[player_id] = set()
+            self.client_backlog[player_id] = SendBacklog(self.backlog_limit)
 
             # Init bandwidth tracking
             self.client_bytes_sent[player_id] = 0
             self.client_join_time[player_id] = time.time()
 
 
-        next_seq = self.client_next_seq[player_id]
-        base = self.client_base[player_id]
-        window = self.client_windows[player_id]
-
-        window_size = len(window)
-    
-        print(f"[SEND DEBUG] Player {player_id}: base={base}, next_seq={next_seq}, window_size={window_size}, N={self.N}")
-        
-        # Protocol rule: "The sender may send packets while nextSeqNum < base + N"
-        if next_seq >= base + self.N:
-            # Window is full according to protocol
-            print(f"[WINDOW FULL] Player {player_id}: nextSeqNum={next_seq} >= base+N={base}+{self.N}")
-            
-            # Check if we can slide window (force slide if stuck)
-            if window_size == self.N:
-                # All packets in window, check oldest timer
-                oldest_seq = min(window.keys()) if window else base
-                oldest_time = self.client_timers.get(player_id, {}).get(oldest_seq, 0)
-                
-                # FORCE SLIDE with dynamic RTO logic? 
-                # Use current RTO for this client
-                current_rto = self.client_rtt[player_id]['rto']
-                if current_time_ms() - oldest_time > 3 * current_rto:
-                    # Force slide window (packet likely lost)
-                    print(f"[FORCE SLIDE] Player {player_id}: Force sliding window past seq={oldest_seq}")
-                    self.client_base[player_id] = oldest_seq + 1
-                    # Remove from window
-                    if oldest_seq in window:
-                        del window[oldest_seq]
-                    if player_id in self.client_timers and oldest_seq in self.client_timers[player_id]:
-                        del self.client_timers[player_id][oldest_seq]
-                    
-                    # Try sending again
-                    return self._sr_send(player_id, msg_type, payload)
-            
+        message = OutboundMessage(msg_type, payload, prepared)
+        backlog = self.client_backlog[player_id]
+        if not backlog and self._window_open(player_id):
+            if not self._transmit_message(player_id, message):
+                return None
+            if message.seqs is not None:
+                return message
+            # The window closed partway through a fragmented message: the rest waits
+
+        # Window is full: wait in the backlog instead of being dropped
+        message.queued_ms = monotonic_ms()
+        status, message = backlog.push(message)
+        stats = self.backlog_stats
+        if status == "dropped":
+            stats['dropped'] += 1
             self.stats['dropped'] += 1
-            self.gui.update_stats(self.stats)
-            return False
-    
+            self.observer.update_stats(self.stats)
+            print(f"[BACKLOG FULL] Player {player_id}: dropped msg_type={msg_type}")
+            return None
+        if status == "collapsed":
+            stats['collapsed'] += 1
+        else:
+            stats['queued'] += 1
+            if status == "evicted":
+                stats['dropped'] += 1
+            else:
+                self.backlog_depth += 1
+            stats['max_depth'] = max(stats['max_depth'], len(backlog))
+            self.stats['backlog'] = self.backlog_depth
+        print(f"[BACKLOG] Player {player_id}: msg_type={msg_type} {status}, depth={len(backlog)}")
+        self._drain_backlog(player_id)
+        return message
+
+    def _window_open(self, player_id):
+        """Congestion window rule: fewer than N packets in flight, and nextSeqNum within SACK reach of base."""
+        return self.client_cc[player_id].can_send(
+            len(self.client_windows[player_id]), self.client_next_seq[player_id], self.client_base[player_id])
+
+    def _drain_backlog(self, player_id):
+        """Transmit waiting messages while the window has room (after ACKs, or a new message)."""
+        backlog = self.client_backlog.get(player_id)
+        if not backlog:
+            return
+        stats = self.backlog_stats
+        while backlog and self._window_open(player_id):
+            message = backlog.peek()
+            if not message.sent:
+                wait = monotonic_ms() - message.queued_ms
+                stats['sent'] += 1
+                stats['wait_ms_total'] += wait
+                stats['wait_ms_max'] = max(stats['wait_ms_max'], wait)
+            if self._transmit_message(player_id, message) and message.seqs is None:
+                continue  # window closed partway through a fragmented message: it stays first
+            backlog.pop()
+            self.backlog_depth -= 1
+        self.stats['backlog'] = self.backlog_depth
+
+    def _transmit_message(self, player_id, message):
+        """
+        Put a message on the wire at the next seq(s) (the window has a free slot). Its
+        seqs are set once all of it is out; False if a send failed.
+        """
+        msg_type, payload, prepared = message.msg_type, message.payload, message.prepared
+        if needs_fragmentation(prepared.payload if prepared is not None else payload):
+            if prepared is None:
+                prepared = message.prepared = BroadcastPacket(msg_type, payload)
+            fragments = prepared.fragments()
+            if not self._transmit_fragments(player_id, message, fragments):
+                return False
+            if len(message.sent) < len(fragments):
+                return True
+        else:
+            first = self.client_next_seq[player_id]
+            if not self._transmit_parts(player_id, msg_type, payload, prepared):
+                return False
+            message.sent.append(first)
+        message.seqs = message.sent
+        return True
 
-        # Build packet (Header + Payload)
+    def _transmit_fragments(self, player_id, message, fragments):
+        """
+        Send the message's next FRAGMENT packets while the window stays open, each with its
+        own seq so SR retransmits only the missing ones; a large board is paced by the
+        congestion window like everything else. Returns False if a send failed.
+        """
+        if not message.sent:
+            print(f"[FRAGMENT] PID={player_id} msg_type={message.msg_type} "
+                  f"{len(message.prepared.payload)}B -> {len(fragments)} fragments")
+        while len(message.sent) < len(fragments):
+            if message.sent and not self._window_open(player_id):
+                return True
+            fragment = fragments[len(message.sent)]
+            first = self.client_next_seq[player_id]
+            if not self._sr_transmit(player_id, lambda seq, ack, sack, conn: (fragment.header_for(seq, ack, sack, conn), fragment.payload)):
+                return False
+            message.sent.append(first)
+        return True
+
+    def _transmit_parts(self, player_id, msg_type, payload, prepared):
+        # Build packet (Header + Payload), for a payload that fits one datagram
         # Note: create_packet now returns the FULL packet with checksum
-        if msg_type == MSG_TYPE_BOARD_SNAPSHOT:
-            packet = create_packet(msg_type, next_seq, payload, self.snapshot_id)
+        if prepared is not None:
+            build = lambda seq, ack, sack, conn: (prepared.header_for(seq, ack, sack, conn), prepared.payload)
         else:
-            packet = create_packet(msg_type, next_seq, payload)
+            build = lambda seq, ack, sack, conn: (create_packet(msg_type, seq, payload, 0, ack, sack, conn),)
+        return self._sr_transmit(player_id, build)
+
+    def _sr_transmit(self, player_id, build):
+        """
+        Send one packet at the next seq and store it in the SR window for retransmission.
+        `build(seq, ack_num, sack_bits, conn_id)` returns the packet parts; the ACK for this
+        peer is piggybacked on it, replacing any pending standalone ACK.
+        """
+        next_seq = self.client_next_seq[player_id]
+        base = self.client_base[player_id]
+        window = self.client_windows[player_id]
 
         # Resolve address
         if player_id in self.clients:
@@ -269,142 +531,289 @@ class GameServer:
         else:
             addr = self.waiting_room_players[player_id]
 
+        receiver = self.peer_acks.get(addr)
+        ack_num, sack_bits = receiver.piggyback() if receiver is not None else (0, 0)
+        packet = build(next_seq, ack_num, sack_bits, self.client_conn_ids.get(player_id, 0))
+
         # Send
         try:
-            self.server_socket.sendto(packet, addr)
+            self._send_datagram(packet, addr)
 
             # Track bandwidth
             if player_id in self.client_bytes_sent:
-                self.client_bytes_sent[player_id] += len(packet)
+                self.client_bytes_sent[player_id] += sum(len(part) for part in packet)
 
             # Store packet in window
             window[next_seq] = packet
             now = current_time_ms()
             self.client_timers[player_id][next_seq] = now
             self.client_send_ts[player_id][next_seq] = now # Track original send time
+            self._arm_rto(player_id, next_seq, self.client_cc[player_id].current_rto())
 
             # Advance nextSeq
             self.client_next_seq[player_id] += 1
 
             self.stats['sent'] += 1
-            self.gui.update_stats(self.stats)
+            self.observer.update_stats(self.stats)
             print(f"[SEND] PID={player_id} seq={next_seq} base={base} window={list(window.keys())}")
             return True
 
         except Exception as e:
             self.stats['dropped'] += 1
-            self.gui.update_stats(self.stats)
+            self.observer.update_stats(self.stats)
             print(f"[ERROR] sendto failed for PID={player_id}: {e}")
             return False
 
-    def _retransmit(self):
-        now = current_time_ms()
-        for pid in list(self.client_timers.keys()):
-            # NEW: Skip if player no longer exists
-            if pid not in self.clients and pid not in self.waiting_room_players:
-                # Clean up orphaned timer entries
-                if pid in self.client_timers:
-                    del self.client_timers[pid]
-                if pid in self.client_windows:
-                    del self.client_windows[pid]
-                continue
+    def _arm_rto(self, player_id, seq, delay_ms):
+        """Schedule the retransmission check for one packet."""
+        self._rto_handles[(player_id, seq)] = self.scheduler.call_later(delay_ms, self._retransmit, player_id, seq)
 
-            timers = self.client_timers.get(pid, {})
-            window = self.client_windows.get(pid, {})
+    def _cancel_rto_timers(self, player_id=None):
+        """Cancel pending RTO timers for one player (or everyone)."""
+        for key in list(self._rto_handles):
+            if player_id is None or key[0] == player_id:
+                self._rto_handles.pop(key).cancel()
 
-            if pid in self.clients:
-                addr = self.clients[pid][0]
-            elif pid in self.waiting_room_players:
-                addr = self.waiting_room_players[pid]
-            else:
-                continue
+    def _retransmit(self, pid, seq, timed_out=True):
+        """
+        RTO timer callback: resend seq if it is still unacknowledged, then re-arm.
+        A timeout shrinks the congestion window and backs off the RTO; if the
+        retransmit budget is spent, the resend is deferred. timed_out=False for
+        deferred resends and fast retransmits, which are not new timeouts.
+        """
+        self._rto_handles.pop((pid, seq), None)
+        # Skip if player no longer exists
+        if pid not in self.clients and pid not in self.waiting_room_players:
+            # Clean up orphaned timer entries
+            self.client_timers.pop(pid, None)
+            self.client_windows.pop(pid, None)
+            return
 
-            for seq, ts in list(timers.items()):
-                # Get dynamic RTO for this client
-                rto = self.client_rtt.get(pid, {'rto': 1000})['rto']
-                
-                if now - ts >= rto:
-                    # retransmit
-                    try:
-                        self.server_socket.sendto(window[seq], addr)
-                        timers[seq] = now
-                        # Mark as retransmitted (Karn's Algorithm: don't use for RTT update)
-                        if pid in self.client_retrans:
-                            self.client_retrans[pid].add(seq)
-                            
-                        self.stats['sent'] += 1
-                        self.gui.update_stats(self.stats)
-                        print(f"[RETRANSMIT] to player {pid} seq={seq} (RTO={rto}ms)")
-                    except Exception as e:
-                        self.stats['dropped'] += 1
-                        self.gui.update_stats(self.stats)
-                        print(f"[ERROR] retransmit to player {pid} seq={seq} failed: {e}")
+        timers = self.client_timers.get(pid, {})
+        window = self.client_windows.get(pid, {})
+        if seq not in window or seq not in timers:
+            return  # ACKed since the timer was armed
+
+        if pid in self.clients:
+            addr = self.clients[pid][0]
+        else:
+            addr = self.waiting_room_players[pid]
+
+        cc = self.client_cc.get(pid)
+        if cc is None:
+            return
+        rto = cc.current_rto()
+        now = current_time_ms()
+        if timed_out:
+            if now - timers[seq] < rto:
+                # Sent again since this timer was armed (e.g. seq reused after a reset)
+                self._arm_rto(pid, seq, rto - (now - timers[seq]))
+                return
+            cc.on_timeout(seq, self.client_next_seq.get(pid, 0), now)
+        wait = cc.retransmit_delay(now)
+        if wait:
+            self._rto_handles[(pid, seq)] = self.scheduler.call_later(wait, self._retransmit, pid, seq, False)
+            return
+        rto = cc.current_rto()
+
+        try:
+            self._send_datagram(window[seq], addr)
+            timers[seq] = now
+            # Mark as retransmitted (Karn's Algorithm: don't use for RTT update)
+            if pid in self.client_retrans:
+                self.client_retrans[pid].add(seq)
+
+            self.stats['sent'] += 1
+            self.observer.update_stats(self.stats)
+            print(f"[RETRANSMIT] to player {pid} seq={seq} (RTO={rto}ms, cwnd={cc.cwnd:.1f})")
+        except Exception as e:
+            self.stats['dropped'] += 1
+            self.observer.update_stats(self.stats)
+            print(f"[ERROR] retransmit to player {pid} seq={seq} failed: {e}")
+        self._arm_rto(pid, seq, rto)
 
     # ==================== Server Loop ====================
-    def _server_loop(self):
-        last_timeout_check = time.time()
-        
-        while self.running:
+    def _run_loop(self):
+        """
+        Engine thread: an asyncio loop that reads the socket when it is readable
+        and fires the scheduler's timers.
+        """
+        loop = self.loop
+        asyncio.set_event_loop(loop)
+        self._loop_thread_id = threading.get_ident()
+        loop.add_reader(self.server_socket.fileno(), self._on_readable)
+        self._arm_scheduler()
+        try:
+            loop.run_forever()
+        finally:
+            self.scheduler.clear()
+            self._rto_handles.clear()
+            self._resync_timer = None
+            self._resync_due = None
+            self._inactivity_timers.clear()
+            self._game_timers = []
+            self._ack_timer = None
+            self._tick_timer = None
+            self._pace_timer = None
+            self._scheduler_handle = None
+            loop.remove_reader(self.server_socket.fileno())
+            if self._writer_armed:
+                loop.remove_writer(self.server_socket.fileno())
+                self._writer_armed = False
+            loop.close()
+            self._loop_thread_id = None
+
+    def _wake_scheduler(self):
+        """A new earliest timer was added (from any thread): re-arm the loop timer."""
+        self._call_in_loop(self._arm_scheduler)
+
+    def _arm_scheduler(self):
+        deadline = self.scheduler.next_deadline()
+        if self._scheduler_handle is not None:
+            self._scheduler_handle.cancel()
+            self._scheduler_handle = None
+        if deadline is not None:
+            delay = max(0, deadline - monotonic_ms()) / 1000
+            self._scheduler_handle = self.loop.call_later(delay, self._run_timers)
+
+    def _run_timers(self):
+        self._scheduler_handle = None
+        self.scheduler.run_due()
+        self._arm_scheduler()
+        self._schedule_service()
+
+    def _call_in_loop(self, callback, *args):
+        """Run callback on the engine loop: now if already on it, else queued thread-safely."""
+        if self.loop is None:
+            return
+        if threading.get_ident() == self._loop_thread_id:
+            callback(*args)
+        else:
             try:
-                ready, _, _ = select.select([self.server_socket], [], [], 0.01)
-                if ready:
-                    try:
-                        data, addr = self.server_socket.recvfrom(4096)
-                        if len(data) < HEADER_SIZE:
-                            continue
-                        self._handle_message(data, addr)
-                    except BlockingIOError:
-                        pass
-                    except Exception as e:
-                        print(f"[ERROR] recvfrom error: {e}")
-                        self.gui.log_message(f"Receive error: {e}", "error")
-
-                # EVENT-DRIVEN SNAPSHOT: send only when grid changed and we have active clients
-                if self.grid_changed and self.clients:
-                    self._send_snapshot()
-                    self.grid_changed = False
-
-                # Handle retransmissions
-                self._retransmit()
-
-                # small sleep to prevent busy loop
-                time.sleep(0.001)
+                self.loop.call_soon_threadsafe(callback, *args)
+            except RuntimeError:
+                pass  # loop closed by stop()
 
-            except Exception as e:
-                # keep running unless fatal
-                print(f"[ERROR] in server loop: {e}")
-                self.gui.log_message(f"Server loop error: {e}", "error")
-                time.sleep(0.01)
-
-    # ==================== Player Timeout Thread ====================
-    def _player_timeout_thread(self):
-        """Background thread to check for inactive players"""
-        while self.running:
+    def _schedule_service(self):
+        """Run _service once, after everything else ready in this loop iteration."""
+        if self._service_scheduled or self.loop is None:
+            return
+        self._service_scheduled = True
+        if threading.get_ident() == self._loop_thread_id:
+            self.loop.call_soon(self._service)
+        else:
+            self._call_in_loop(self._service)
+
+    def _service(self):
+        """Per-iteration work: event-driven snapshot, delayed-ACK timer, then one flush per client."""
+        self._service_scheduled = False
+        try:
+            # EVENT-DRIVEN SNAPSHOT: send only when grid changed and we have active clients.
+            # In tick mode the tick timer sends it, unless it is overdue (loop was busy)
+            if self.grid_changed and self.clients:
+                if not self.tick_ms or monotonic_ms() - self._dirty_since >= self.max_latency_ms:
+                    self._broadcast_changes()
+
+            # Wake up in time to send any ACK being held back
+            if self._acks_pending and self._ack_timer is None:
+                self._acks_pending = False
+                self._ack_timer = self.scheduler.call_later(ACK_DELAY_MS, self._on_ack_timer)
+
+            # Everything queued this iteration goes out as one datagram per client
+            self._flush_outbox()
+        except Exception as e:
+            print(f"[ERROR] in server loop: {e}")
+            self.observer.log_message(f"Server loop error: {e}", "error")
+
+    def _mark_grid_changed(self):
+        """The grid changed: broadcast it this iteration, or at the next tick in tick mode."""
+        now = monotonic_ms()
+        self.grid_changed = True
+        if self._dirty_since is None:
+            self._dirty_since = now
+        if self.tick_ms and self._tick_timer is None:
+            delay = min(max(0, self._last_tick_ms + self.tick_ms - now), self.max_latency_ms)
+            self._tick_timer = self.scheduler.call_later(delay, self._on_tick)
+
+    def _on_tick(self):
+        self._tick_timer = None
+        if self.grid_changed and self.clients:
+            self._broadcast_changes()
+
+    def _broadcast_changes(self):
+        """One snapshot (or delta) per client covering every change since the last one."""
+        if self._tick_timer is not None:
+            self._tick_timer.cancel()
+            self._tick_timer = None
+        now = monotonic_ms()
+        if self._dirty_since is not None:
+            wait = now - self._dirty_since
+            self.snapshot_stats['wait_ms_total'] += wait
+            self.snapshot_stats['wait_ms_max'] = max(self.snapshot_stats['wait_ms_max'], wait)
+        self.snapshot_stats['snapshots'] += 1
+        self._dirty_since = None
+        self._last_tick_ms = now
+        self.grid_changed = False
+        self._send_snapshot()
+
+    def _on_ack_timer(self):
+        self._ack_timer = None
+        next_due = self._send_due_acks()
+        if next_due is not None:
+            self._ack_timer = self.scheduler.call_later(max(0, next_due - current_time_ms()), self._on_ack_timer)
+
+    def _on_readable(self):
+        """
+        Drain the socket until it would block, at most recv_budget datagrams (the
+        reader fires again next iteration if more are queued, after timers got a turn).
+        """
+        for _ in range(self.recv_budget):
             try:
-                self._check_player_timeouts()
-                time.sleep(5)  # Check every 5 seconds
+                data, addr = self.server_socket.recvfrom(RECV_BUFFER_SIZE)
+            except (BlockingIOError, InterruptedError):
+                break
             except Exception as e:
-                print(f"[ERROR] in player timeout thread: {e}")
-                time.sleep(5)
+                print(f"[ERROR] recvfrom error: {e}")
+                self.observer.log_message(f"Receive error: {e}", "error")
+                continue
+            if len(data) < HEADER_SIZE:
+                continue
+            # A datagram is either one GSSP packet or a batch of them
+            packets, valid = split_datagram(data)
+            if not valid:
+                print(f"[CHECKSUM ERROR] batch from {addr}")
+                self.stats['dropped'] += 1
+            for packet in packets:
+                self._handle_message(packet, addr)
+        self._schedule_service()
+
+    # ==================== Player Timeouts ====================
+    def _watch_player(self, player_id):
+        """Start the inactivity timer of a player that just became active."""
+        old = self._inactivity_timers.pop(player_id, None)
+        if old is not None:
+            old.cancel()
+        self._inactivity_timers[player_id] = self.scheduler.call_later(
+            PLAYER_TIMEOUT_S * 1000, self._check_player_timeout, player_id)
+
+    def _check_player_timeout(self, player_id):
+        """
+        Inactivity timer: remove the player if nothing arrived for PLAYER_TIMEOUT_S,
+        else sleep until PLAYER_TIMEOUT_S after its last packet.
+        """
+        self._inactivity_timers.pop(player_id, None)
+        if not self.running or player_id not in self.clients:
+            return
 
-    def _check_player_timeouts(self):
-        """Check for inactive players and remove them."""
-        if not self.running or not self.clients:
+        idle = time.time() - self.clients[player_id][1]
+        if idle < PLAYER_TIMEOUT_S:
+            self._inactivity_timers[player_id] = self.scheduler.call_later(
+                (PLAYER_TIMEOUT_S - idle) * 1000, self._check_player_timeout, player_id)
             return
-        
-        current_time = time.time()
-        players_to_remove = []
-        
-        # Check active clients
-        for player_id, (addr, last_seen) in list(self.clients.items()):
-            if current_time - last_seen > 10:  # 10 seconds timeout
-                players_to_remove.append(player_id)
-                self.gui.log_message(f"Player {player_id} timed out (no activity for 10s)", "warning")
-        
-        # Remove timed out players
-        for player_id in players_to_remove:
-            self._remove_player(player_id)
-            self.gui.log_message(f"Removed Player {player_id} due to timeout", "info")
+
+        self.observer.log_message(f"Player {player_id} timed out (no activity for {PLAYER_TIMEOUT_S}s)", "warning")
+        self._remove_player(player_id)
+        self.observer.log_message(f"Removed Player {player_id} due to timeout", "info")
 
     # ==================== Handle Messages ====================
     def _handle_message(self, data, addr):
@@ -419,18 +828,38 @@ class GameServer:
                 self.stats['dropped'] += 1
                 return
             
-            msg_type = header.get("msg_type")
-            seq = header.get("seq_num", 0)
+            msg_type = header.msg_type
+            seq = header.seq_num
+            if header.conn_id:
+                # Known connection arriving from a new address (NAT rebinding, port change)
+                conn_pid = self.conn_to_pid.get(header.conn_id)
+                if conn_pid is not None and self.addr_to_pid.get(addr) != conn_pid:
+                    self._migrate_player(conn_pid, addr)
+            if header.snapshot_id:
+                # Snapshot channel: the newest snapshot this client applied (its delta baseline)
+                snap_pid = self._addr_to_pid(addr)
+                if snap_pid in self.clients:
+                    self._on_snapshot_ack(snap_pid, header.snapshot_id)
+            if msg_type != MSG_TYPE_ACK:
+                # Every data packet is acknowledged by the next packet to this peer: data
+                # going its way carries the SACK, else a standalone ACK after ACK_DELAY_MS
+                receiver = self.peer_acks.get(addr)
+                if receiver is None or (msg_type == MSG_TYPE_JOIN_REQ and self._addr_to_pid(addr) is None):
+                    # A JOIN_REQ starts the peer's stream (a client that reconnects keeps counting)
+                    receiver = self.peer_acks[addr] = SackReceiver(seq if msg_type == MSG_TYPE_JOIN_REQ else 0)
+                duplicate = not receiver.record(seq, current_time_ms())
+                self._acks_pending = True
+                # ...and carries its own cumulative ack + SACK of our stream to that peer
+                if header.ack_num or header.sack_bits:
+                    ack_pid = self._addr_to_pid(addr)
+                    if ack_pid and self.client_windows.get(ack_pid):
+                        self._handle_ack(ack_pid, header.ack_num, header.sack_bits)
             self.stats['received'] += 1
-            self.gui.update_stats(self.stats)
+            self.observer.update_stats(self.stats)
             print(f"[RECEIVED] seq={seq}, type={msg_type}, from={addr}")
-
-            # Send ACK for reliability (ack the received seq)
-            try:
-                ack_packet = create_ack_packet(ack_num=seq)
-                print(f"[SEND ACK] seq={seq}, to={addr}")
-            except Exception as e:
-                print(f"[ERROR] sending ACK to {addr}: {e}")
+            if msg_type != MSG_TYPE_ACK and duplicate:
+                print(f"[DUPLICATE] seq={seq} from {addr} already processed, ACKed again")
+                return
 
             if msg_type == MSG_TYPE_JOIN_REQ:
                 existing_pid = self._addr_to_pid(addr)
@@ -449,12 +878,15 @@ class GameServer:
 
                 # Add to waiting room first
                 self.waiting_room_players[new_pid] = addr
+                self._register_player(new_pid, addr)
+                # Snapshot codecs the client can decode (empty payload = original nibble format)
+                self.client_codecs[new_pid] = payload[0] if len(payload) >= 1 else CODEC_MASK_DEFAULT
 
                 # Update stats
                 self.stats['client_count'] = len(self.waiting_room_players) + len(self.clients)
-                self.gui.log_message(f"Player {new_pid} joined waiting room", "success")
-                self.gui.update_players(self.waiting_room_players)
-                self.gui.update_stats(self.stats)
+                self.observer.log_message(f"Player {new_pid} joined waiting room", "success")
+                self.observer.update_players(self.waiting_room_players)
+                self.observer.update_stats(self.stats)
 
                 # Send join response via SR ARQ to that waiting client
                 payload = struct.pack("!B", new_pid)
@@ -466,42 +898,37 @@ class GameServer:
                     if len(self.clients) < 4:                      
                         # NOW add the new player to active game
                         self.clients[new_pid] = (addr, time.time())
+                        self._watch_player(new_pid)
                         del self.waiting_room_players[new_pid]
-                        self.gui.log_message(f"Player {new_pid} joined active game", "info")
-                        self.gui.update_players(self.clients)
+                        self.observer.log_message(f"Player {new_pid} joined active game", "info")
+                        self.observer.update_players(self.clients)
                         
                         # Send GAME_START immediately to this player
-                        self._sr_send(new_pid, MSG_TYPE_GAME_START, b'')
-                        # Send latest snapshot so player sees current grid
-                        self._send_snapshot()
+                        self._sr_send(new_pid, MSG_TYPE_GAME_START, self._game_start_payload())
+                        # Latest snapshot so player sees current grid (with this iteration's / tick's)
+                        self._mark_grid_changed()
                 else:
                     if len(self.waiting_room_players) >= self.min_players:
                         self._start_game()
 
             elif msg_type == MSG_TYPE_CLAIM_REQ:
                 player_id = self._addr_to_pid(addr)
-                try:
-                    self.server_socket.sendto(ack_packet, addr)
-                except:
-                    pass
                 if player_id:
                     # Payload is now returned by parse_packet
-                    pay = payload if len(payload) >= 4 else b''
-                    if len(pay) >= 4:
-                        r, c, client_ack_num = struct.unpack("!BBH", pay[:4])
-                        
-                        # Process the ACK from client
-                        self._handle_ack(player_id, client_ack_num)
+                    pay = payload if len(payload) >= CLAIM_SIZE else b''
+                    if len(pay) >= CLAIM_SIZE:
+                        r, c = struct.unpack(CLAIM_FORMAT, pay[:CLAIM_SIZE])
 
-                        if 0 <= r < 20 and 0 <= c < 20:
+                        if self.grid_state.in_bounds(r, c):
                             # Check stealing setting
-                            current_owner = self.grid_state[r][c]
+                            index = r * self.grid_state.cols + c
+                            current_owner = self.grid_state.cells[index]
                             
                             if not self.stealing_enabled:
                                 # STEALING DISABLED: Check if cell is already claimed
                                 if current_owner != 0:
                                     # Cell is already owned, reject the claim
-                                    self.gui.log_message(
+                                    self.observer.log_message(
                                         f"Player {player_id} attempted to steal cell ({r},{c}) from Player {current_owner} - REJECTED",
                                         "warning"
                                     )
@@ -511,66 +938,56 @@ class GameServer:
                                     return
                             
                             # --- TIMESTAMP FIX STARTS HERE ---
-                            claim_time = header.get("timestamp", 0)
-
-                            # If this is the first time using timestamps, initialize matrix
-                            if not hasattr(self, "grid_claim_time"):
-                                self.grid_claim_time = [[0] * 20 for _ in range(20)]
+                            claim_time = header.timestamp
 
                             # Accept only newer claims
-                            if claim_time > self.grid_claim_time[r][c]:
-                                old_owner = current_owner
-                                
-                                # Track claimed cells count for non-stealing mode
+                            if claim_time > self.grid_claim_time[index]:
+                                # Update grid (and its ownership index) & timestamp
+                                old_owner = self.grid_state.assign(index, player_id)
+                                self.scoreboard.move_cell(old_owner, player_id)
+                                self._mark_scores_changed()
                                 if old_owner == 0:
-                                    self.claimed_cells_count += 1
-                                    print(f"[GRID] Cells claimed: {self.claimed_cells_count}/{self.total_cells}")
-                                
-                                # Update grid & timestamp
-                                self.grid_state[r][c] = player_id
-                                self.grid_claim_time[r][c] = claim_time
-                                self.grid_changed = True
+                                    print(f"[GRID] Cells claimed: {self.grid_state.claimed_count()}/{self.total_cells}")
+                                self.grid_claim_time[index] = claim_time
+                                self.dirty_cells.add((r, c))
+                                self.snapshot_stats['claims'] += 1
+                                self._mark_grid_changed()
 
                                 # Logging based on stealing setting
                                 if old_owner == 0:
-                                    self.gui.log_message(
+                                    self.observer.log_message(
                                         f"Player {player_id} claimed cell ({r},{c})",
                                         "info"
                                     )
                                     # Check if all cells are claimed (for non-stealing mode)
-                                    if not self.stealing_enabled and self.claimed_cells_count >= self.total_cells:
-                                        self.gui.log_message("🎉 ALL CELLS CLAIMED! Game ending...", "success")
+                                    if not self.stealing_enabled and self.grid_state.claimed_count() >= self.total_cells:
+                                        self.observer.log_message("🎉 ALL CELLS CLAIMED! Game ending...", "success")
                                         self._end_game_with_scores()
                                 elif self.stealing_enabled:
-                                    self.gui.log_message(
+                                    self.observer.log_message(
                                         f"Player {player_id} stole cell ({r},{c}) from Player {old_owner}",
                                         "warning"
                                     )
                                 else:
                                     # This shouldn't happen with stealing disabled, but just in case
-                                    self.gui.log_message(
+                                    self.observer.log_message(
                                         f"Player {player_id} claimed cell ({r},{c}) (was Player {old_owner})",
                                         "info"
                                     )
 
                                 # Update GUI
-                                self.gui.update_grid(self.grid_state)
-
-                                # ✅ CRITICAL FIX: Send snapshot IMMEDIATELY after successful claim/steal
-                                # This ensures ALL clients see the updated grid right away
-                                print(f"[STEAL] Player {player_id} stole cell ({r},{c}) from Player {old_owner}, sending immediate snapshot")
-                                self._send_snapshot()
+                                self.observer.update_grid(self.grid_state)
 
                             else:
                                 # Late / outdated claim — ignore
-                                self.gui.log_message(
+                                self.observer.log_message(
                                     f"Outdated claim ignored at ({r},{c}) from Player {player_id} "
-                                    f"(claim ts={claim_time}, current ts={self.grid_claim_time[r][c]})",
+                                    f"(claim ts={claim_time}, current ts={self.grid_claim_time[index]})",
                                     "warning"
                                 )
 
                         else:
-                            self.gui.log_message(
+                            self.observer.log_message(
                                 f"Invalid coordinates ({r},{c}) from player {player_id}",
                                 "error"
                             )
@@ -580,14 +997,9 @@ class GameServer:
                         self.clients[player_id] = (addr, time.time())
 
                 else:
-                    self.gui.log_message(f"Claim from unknown addr {addr}", "warning")
+                    self.observer.log_message(f"Claim from unknown addr {addr}", "warning")
                         
             elif msg_type == MSG_TYPE_LEAVE:
-                # ACK the LEAVE message
-                client_seq = header['seq_num']
-                ack_packet = create_ack_packet(ack_num=client_seq)
-                self.server_socket.sendto(ack_packet, addr)
-
                 # Find the player ID for this address
                 player_id = self._addr_to_pid(addr)
                 
@@ -596,33 +1008,32 @@ class GameServer:
                     was_game_active = self.game_active
                     # Remove the player and their claimed cells
                     self._remove_player_and_cells(player_id)
-                    self.gui.log_message(f"Player {player_id} left gracefully", "info")
+                    self.observer.log_message(f"Player {player_id} left gracefully", "info")
                     
                     # Check if game should end (less than min_players during active game)
                     if was_game_active and self.game_active:
                         active_players = len(self.clients)
                         if active_players < self.min_players:
-                            self.gui.log_message(f"Less than {self.min_players} players remaining. Ending game...", "warning")
+                            self.observer.log_message(f"Less than {self.min_players} players remaining. Ending game...", "warning")
                             self._end_game_with_scores()
                 else:
-                    self.gui.log_message(f"Unknown player from {addr} left", "warning")
+                    self.observer.log_message(f"Unknown player from {addr} left", "warning")
 
             elif msg_type == MSG_TYPE_ACK:
                 player_id = self._addr_to_pid(addr)
                 if player_id:
-                    ack_val = header.get("ack_num", 0)
-                    self._handle_ack(player_id, ack_val)
+                    self._handle_ack(player_id, header.ack_num, header.sack_bits)
                     # Update last_seen for active players when they send ACK
                     if player_id in self.clients:
                         self.clients[player_id] = (addr, time.time())
 
 
             # update stats GUI periodically
-            self.gui.update_stats(self.stats)
+            self.observer.update_stats(self.stats)
 
         except Exception as e:
             print(f"[ERROR] in handle_message: {e}")
-            self.gui.log_message(f"Message handling error: {e}", "error")
+            self.observer.log_message(f"Message handling error: {e}", "error")
 
     # ==================== Helper ====================
     def _load_stealing_setting(self):
@@ -647,59 +1058,169 @@ class GameServer:
         print("[SERVER] Stealing mode ENABLED for testing")
         return True
     
+    def _load_grid_size(self):
+        """Grid size for the next game: grid_rows=/grid_cols= in game_settings.txt, else the CLI size."""
+        rows, cols = self.default_rows, self.default_cols
+        try:
+            if os.path.exists("game_settings.txt"):
+                with open("game_settings.txt", "r") as f:
+                    for line in f.read().split():
+                        key, _, value = line.partition("=")
+                        if key == "grid_rows" and value.isdigit():
+                            rows = int(value)
+                        elif key == "grid_cols" and value.isdigit():
+                            cols = int(value)
+        except Exception as e:
+            print(f"[SERVER] Error loading grid size: {e}")
+        # Coordinates travel as unsigned 16-bit values (CLAIM_FORMAT / GAME_START)
+        rows = max(1, min(rows, 0xFFFF))
+        cols = max(1, min(cols, 0xFFFF))
+        print(f"[SERVER] Grid size {rows}x{cols}")
+        return rows, cols
+
+    def _game_start_payload(self):
+        """GAME_START payload: grid rows (2 bytes) + cols (2 bytes)."""
+        return struct.pack("!HH", self.grid_state.rows, self.grid_state.cols)
+
+    def _reset_grid(self):
+        """Clear every cell and claim timestamp, keeping the current grid size."""
+        self.grid_state.reset()
+        self.grid_claim_time = new_claim_times(self.grid_state.rows, self.grid_state.cols)
+        self.scoreboard.clear()
+        self._leaderboard_top = []
+
     def _addr_to_pid(self, addr):
-        """Return pid for an address (search active clients then waiting room)."""
-        for pid, (client_addr, _) in self.clients.items():
-            if client_addr == addr:
-                return pid
-        for pid, waiting_addr in self.waiting_room_players.items():
-            if waiting_addr == addr:
-                return pid
-        return None
+        """Return pid for an address (connection table lookup)."""
+        return self.addr_to_pid.get(addr)
+
+    def _register_player(self, player_id, addr):
+        """Add a joined player to the connection table and give it a connection id."""
+        conn_id = 0
+        while conn_id == 0 or conn_id in self.conn_to_pid:
+            conn_id = random.getrandbits(32)
+        self.addr_to_pid[addr] = player_id
+        self.conn_to_pid[conn_id] = player_id
+        self.client_conn_ids[player_id] = conn_id
+        self._apply_client_weight(player_id, addr)
+
+    def set_client_weight(self, player_id, weight):
+        """
+        Give a player `weight` (> 0) times the default share of the outbound link when it
+        is contended (weighted DRR in OutboundScheduler). Applies from its next join if
+        it is not connected yet.
+        """
+        if not weight > 0:
+            raise ValueError(f"Outbound weight must be > 0, got {weight!r}")
+        self.client_weights[player_id] = weight
+        if player_id in self.clients:
+            self._apply_client_weight(player_id, self.clients[player_id][0])
+        elif player_id in self.waiting_room_players:
+            self._apply_client_weight(player_id, self.waiting_room_players[player_id])
+
+    def _apply_client_weight(self, player_id, addr):
+        weight = self.client_weights.get(player_id)
+        if weight is not None and self.outbox is not None:
+            self.outbox.set_weight(addr, weight)
+
+    def _unregister_player(self, player_id, addr):
+        if self.addr_to_pid.get(addr) == player_id:
+            del self.addr_to_pid[addr]
+            if self.outbox is not None:
+                self.outbox.clear_weight(addr)
+        conn_id = self.client_conn_ids.pop(player_id, None)
+        self.conn_to_pid.pop(conn_id, None)
+
+    def _clear_connections(self):
+        self.addr_to_pid.clear()
+        self.conn_to_pid.clear()
+        self.client_conn_ids.clear()
+
+    def _migrate_player(self, player_id, addr):
+        """Move a session (address, pending ACK state) to the client's new address."""
+        if player_id in self.clients:
+            old_addr, last_seen = self.clients[player_id]
+            self.clients[player_id] = (addr, last_seen)
+        elif player_id in self.waiting_room_players:
+            old_addr = self.waiting_room_players[player_id]
+            self.waiting_room_players[player_id] = addr
+        else:
+            return
+        if self.addr_to_pid.get(old_addr) == player_id:
+            del self.addr_to_pid[old_addr]
+            if self.outbox is not None:
+                self.outbox.clear_weight(old_addr)
+        self.addr_to_pid[addr] = player_id
+        self._apply_client_weight(player_id, addr)
+        receiver = self.peer_acks.pop(old_addr, None)
+        if receiver is not None:
+            self.peer_acks[addr] = receiver
+        print(f"[MIGRATE] Player {player_id}: {old_addr} -> {addr}")
+        self.observer.log_message(f"Player {player_id} moved to {addr[0]}:{addr[1]}", "info")
 
     def _remove_player_and_cells(self, player_id):
         """Remove a player and all their claimed cells from the grid."""
         # Check if player was in active game before removing
         was_in_active_game = player_id in self.clients
+
+        # ACK whatever the player sent last (e.g. its LEAVE) before forgetting its address
+        if was_in_active_game:
+            addr = self.clients[player_id][0]
+        else:
+            addr = self.waiting_room_players.get(player_id)
+        if addr in self.peer_acks:
+            self._send_due_acks(force_addr=addr)
+            del self.peer_acks[addr]
+        self._unregister_player(player_id, addr)
         
         # Count cells owned by this player before removal
         cells_removed = 0
         if was_in_active_game:
-            # Remove player's claimed cells from the grid
-            for r in range(20):
-                for c in range(20):
-                    if self.grid_state[r][c] == player_id:
-                        self.grid_state[r][c] = 0  # Reset to unclaimed
-                        self.grid_claim_time[r][c] = 0  # Reset timestamp
-                        cells_removed += 1
-        
-        # Update claimed cells count for non-stealing mode
-        self.claimed_cells_count = max(0, self.claimed_cells_count - cells_removed)
+            # Remove player's claimed cells from the grid (reset to unclaimed)
+            cleared = self.grid_state.clear_owner(player_id)
+            self.scoreboard.remove(player_id)
+            self._mark_scores_changed()
+            cols = self.grid_state.cols
+            for index in cleared:
+                self.grid_claim_time[index] = 0  # Reset timestamp
+            self.dirty_cells.update(divmod(index, cols) for index in cleared)
+            cells_removed = len(cleared)
         
         # Remove player from all data structures
+        self._cancel_rto_timers(player_id)
+        timer = self._inactivity_timers.pop(player_id, None)
+        if timer is not None:
+            timer.cancel()
         self.clients.pop(player_id, None)
         self.client_windows.pop(player_id, None)
         self.client_timers.pop(player_id, None)
         self.client_next_seq.pop(player_id, None)
-        self.client_rtt.pop(player_id, None)
+        self.client_cc.pop(player_id, None)
         self.client_send_ts.pop(player_id, None)
         self.client_retrans.pop(player_id, None)
         self.client_base.pop(player_id, None)
+        backlog = self.client_backlog.pop(player_id, None)
+        if backlog:
+            self.backlog_depth -= len(backlog)
+            self.stats['backlog'] = self.backlog_depth
+        self.client_snapshot_ack.pop(player_id, None)
+        self.client_snapshot_sent.pop(player_id, None)
+        self.client_snapshot_reliable.pop(player_id, None)
+        self.client_codecs.pop(player_id, None)
         self.waiting_room_players.pop(player_id, None)
         
         # Mark grid as changed if we removed any cells
         if cells_removed > 0:
-            self.grid_changed = True
-            self.gui.update_grid(self.grid_state)
-            self.gui.log_message(f"Removed {cells_removed} cells claimed by Player {player_id}", "info")
+            self._mark_grid_changed()
+            self.observer.update_grid(self.grid_state)
+            self.observer.log_message(f"Removed {cells_removed} cells claimed by Player {player_id}", "info")
         
-        self.gui.log_message(f"Player {player_id} removed from server", "info")
+        self.observer.log_message(f"Player {player_id} removed from server", "info")
         
         # Check if game should end (active game with less than min_players)
         if self.game_active and was_in_active_game:
             active_players = len(self.clients)
             if active_players < self.min_players:
-                self.gui.log_message(f"Less than {self.min_players} players remaining. Ending game...", "warning")
+                self.observer.log_message(f"Less than {self.min_players} players remaining. Ending game...", "warning")
                 self._end_game_with_scores()
         
         # If no more active players at all, stop sending snapshots AND reset grid
@@ -707,28 +1228,28 @@ class GameServer:
             self._should_send_snapshots = False
             
             # Reset grid when all players have left
-            self.grid_state = [[0] * 20 for _ in range(20)]
-            self.grid_claim_time = [[0] * 20 for _ in range(20)]
-            self.claimed_cells_count = 0
-            self.grid_changed = True  # This will trigger a snapshot if new players join
+            self._reset_grid()
+            self._invalidate_snapshot_history()
+            self._mark_grid_changed()  # This will trigger a snapshot if new players join
             
             # Update GUI to show empty grid
-            self.gui.update_grid(self.grid_state)
-            self.gui.log_message("All players left. Grid reset.", "info")
+            self.observer.update_grid(self.grid_state)
+            self.observer.log_message("All players left. Grid reset.", "info")
 
         # Update GUI & stats
         self.stats['client_count'] = len(self.clients) + len(self.waiting_room_players)
-        self.gui.update_players(self.clients if self.clients else self.waiting_room_players)
-        self.gui.update_stats(self.stats)
+        self.observer.update_players(self.clients if self.clients else self.waiting_room_players)
+        self.observer.update_stats(self.stats)
 
     def _remove_player(self, player_id):
         """Wrapper for backward compatibility - calls _remove_player_and_cells."""
         return self._remove_player_and_cells(player_id)
 
 
-    def _handle_ack(self, player_id, ack_num):
+    def _handle_ack(self, player_id, ack_num, sack_bitmap=0):
         """
-        Handle ACK from client according to SR ARQ protocol.
+        Handle a cumulative ACK plus SACK bitmap from a client in one pass (SR ARQ).
+        Every seq below ack_num and every seq flagged in the bitmap leaves the window.
         """
         if player_id not in self.client_windows:
             print(f"[ACK] Player {player_id} not found in client_windows")
@@ -738,275 +1259,538 @@ class GameServer:
         base = self.client_base.get(player_id, 0)
         next_seq = self.client_next_seq.get(player_id, 0)
 
-        print(f"[ACK] Player {player_id}: ack={ack_num}, base={base}, next={next_seq}, window={list(window.keys())}")
+        print(f"[ACK] Player {player_id}: ack={ack_num}, sack={sack_bitmap:#x}, base={base}, next={next_seq}, window={list(window.keys())}")
 
-        # SELECTIVE REPEAT: Only remove the specific packet acknowledged
-        if ack_num in window:
-            del window[ack_num]
-            if player_id in self.client_timers and ack_num in self.client_timers[player_id]:
-                del self.client_timers[player_id][ack_num]
-            
-            # --- RTT UPDATE (EWMA) ---
-            # 1. Check if valid sample (not retransmitted)
-            is_retrans = (ack_num in self.client_retrans.get(player_id, set()))
-            send_ts = self.client_send_ts.get(player_id, {}).get(ack_num)
-            
-            if send_ts and not is_retrans:
-                # Karn's Algorithm passed
-                sample_rtt = current_time_ms() - send_ts
-                stats = self.client_rtt[player_id]
-                
-                # EWMA Calculation
-                # alpha = 0.125, beta = 0.25 (RFC 6298)
-                alpha = 0.125
-                beta = 0.25
-                
-                stats['est'] = (1 - alpha) * stats['est'] + alpha * sample_rtt
-                stats['dev'] = (1 - beta) * stats['dev'] + beta * abs(sample_rtt - stats['est'])
-                stats['rto'] = stats['est'] + 4 * stats['dev']
-                
-                # Max/Min bounds (Optional but good)
-                stats['rto'] = max(200, min(stats['rto'], 5000)) # Min 200ms, Max 5s
-                
-                print(f"[RTT] PID={player_id} sample={sample_rtt}ms RTO={stats['rto']:.2f}ms")
+        acked = sack_acked(ack_num, sack_bitmap, list(window))
+        if not acked:
+            print(f"[ACK] Player {player_id}: Nothing new in ACK {ack_num} (current base={base})")
+            return
 
-            # LOGGING FOR POSTPROCESS.PY (File Output)
-            if self.metrics_writer:
-                cpu = psutil.cpu_percent() if psutil else 0.0
-                current_ts = current_time_ms()
-                
-                # Bandwidth calc
-                total_bytes = self.client_bytes_sent.get(player_id, 0)
-                start_time = self.client_join_time.get(player_id, time.time())
-                duration = max(0.001, time.time() - start_time)
-                bw_kbps = (total_bytes * 8 / 1000) / duration
-
-                # Ensure cpu is a scalar val
-                cpu_val = cpu[0] if isinstance(cpu, tuple) else cpu
-                
-                self.metrics_writer.writerow([
-                    player_id, 
-                    0, 
-                    ack_num, 
-                    send_ts, 
-                    current_ts, 
-                    cpu_val, 
-                    0.0, # perceived_position_error
-                    bw_kbps
-                ])
-                self.metrics_file.flush()
-
-
-            # Cleanup RTT tracking
-            if player_id in self.client_send_ts:
-                self.client_send_ts[player_id].pop(ack_num, None)
-            if player_id in self.client_retrans:
-                self.client_retrans[player_id].discard(ack_num)
-            # --------------------------
-            
-            print(f"[ACK] Player {player_id}: Removed seq {ack_num}")
-            
-            # Slide window base forward if the base packet has been acknowledged
-            new_base = base
-            while new_base not in window and new_base < next_seq:
-                new_base += 1
-            
-            if new_base != base:
-                self.client_base[player_id] = new_base
-                print(f"[ACK] Player {player_id}: Window slid base={base} -> {new_base}")
-        
-        elif ack_num < base:
-             print(f"[ACK] Player {player_id}: Ignoring duplicate/old ACK {ack_num} (current base={base})")
-        else:
-             print(f"[ACK] Player {player_id}: Ignoring ACK {ack_num} (not in window usually means already ACKed)")
+        timers = self.client_timers.get(player_id, {})
+        send_ts = self.client_send_ts.get(player_id, {})
+        retrans = self.client_retrans.get(player_id, set())
+        rtt_seq = None
+        for seq in acked:
+            del window[seq]
+            timers.pop(seq, None)
+
+            # Karn's Algorithm: only seqs acked on their first transmission give RTT samples
+            if seq not in retrans and seq in send_ts and (rtt_seq is None or seq > rtt_seq):
+                rtt_seq = seq
+
+        current_ts = current_time_ms()
+
+        # --- RTT UPDATE (RFC 6298) --- one sample per ACK, from the newest fresh seq
+        cc = self.client_cc.get(player_id)
+        if cc is not None:
+            if rtt_seq is not None:
+                sample_rtt = current_ts - send_ts[rtt_seq]
+                cc.on_rtt_sample(sample_rtt)
+                print(f"[RTT] PID={player_id} sample={sample_rtt}ms RTO={cc.rto:.2f}ms")
+            # AIMD: the window grows with every newly acknowledged packet
+            cc.on_ack(acked)
+
+        # LOGGING FOR POSTPROCESS.PY, one record per acknowledged seq (written out off this thread)
+        if self.metrics:
+            bw_kbps = self._bandwidth_kbps(player_id)
+            for seq in acked:
+                sent_at = send_ts.get(seq)
+                if sent_at is not None:
+                    self.metrics.record(player_id, 0, seq, sent_at, current_ts, 0.0, bw_kbps)
+
+        # Cleanup RTT tracking and RTO timers
+        for seq in acked:
+            handle = self._rto_handles.pop((player_id, seq), None)
+            if handle is not None:
+                handle.cancel()
+            send_ts.pop(seq, None)
+            retrans.discard(seq)
+
+        print(f"[ACK] Player {player_id}: Removed seqs {acked}")
+
+        # Slide window base forward to the oldest unacknowledged packet
+        new_base = min(window) if window else max(base, next_seq)
+        if new_base != base:
+            self.client_base[player_id] = new_base
+            print(f"[ACK] Player {player_id}: Window slid base={base} -> {new_base}")
+
+        # Fast retransmit: holes that DUP_THRESH newer SACKed seqs overtook go out now
+        if cc is not None:
+            for seq in cc.detect_losses(list(window), next_seq):
+                print(f"[FAST RETRANSMIT] Player {player_id}: seq={seq}")
+                handle = self._rto_handles.pop((player_id, seq), None)
+                if handle is not None:
+                    handle.cancel()
+                self._retransmit(player_id, seq, timed_out=False)
+
+        # Freed window slots go to messages waiting in the backlog
+        self._drain_backlog(player_id)
+
+        # End of game: this ACK may complete the client's GAME_OVER or LEADERBOARD
+        if player_id in self._end_pending:
+            self._advance_end_game()
+
+    def _bandwidth_kbps(self, player_id):
+        """Average send rate to a client since it joined (metrics column)."""
+        total_bytes = self.client_bytes_sent.get(player_id, 0)
+        start_time = self.client_join_time.get(player_id, time.time())
+        duration = max(0.001, time.time() - start_time)
+        return (total_bytes * 8 / 1000) / duration
 
     # ==================== Snapshot ====================
-    def _send_snapshot(self):
-        """Send snapshot to all active clients (SR ARQ)."""
+    def _invalidate_snapshot_history(self):
+        """Forget all delta baselines (grid was replaced wholesale); next snapshot is a keyframe."""
+        self.recent_snapshots = []
+        self.snapshot_sent_ms.clear()
+        self.dirty_cells.clear()
+        self.client_snapshot_ack.clear()
+        self.client_snapshot_sent.clear()
+        self.client_snapshot_reliable.clear()
+        self._snapshot_ack_floor = self.snapshot_id
+
+    def _delta_changes_since(self, baseline_id):
+        """
+        Return the (row, col, owner) changes between snapshot `baseline_id` and the
+        latest recorded snapshot, or None if the baseline is no longer in history.
+        """
+        if not self.recent_snapshots:
+            return None
+        oldest_id = self.recent_snapshots[0][0]
+        latest_id = self.recent_snapshots[-1][0]
+        # We need every snapshot after the baseline to still be in history
+        if baseline_id < oldest_id - 1 or baseline_id >= latest_id:
+            return None
+
+        cells = set()
+        for snap_id, changed in reversed(self.recent_snapshots):
+            if snap_id <= baseline_id:
+                break
+            cells.update(changed)
+        get = self.grid_state.get
+        return [(r, c, get(r, c)) for r, c in sorted(cells)]
+
+    def _snapshot_message_for(self, baseline_id, codec_mask, encodings):
+        """
+        Pick a delta against a client's last ACKed snapshot, or fall back to a keyframe
+        in the smallest codec the client supports. `encodings` caches codec output per snapshot.
+        Keyframes are only encoded when there is no usable baseline or the delta is bigger
+        than a nibble keyframe (cells / 2), so small deltas never pay for every codec.
+        """
+        delta_payload = None
+        if baseline_id is not None:
+            changes = self._delta_changes_since(baseline_id)
+            if changes is not None:
+                delta_payload = struct.pack("!II", self.snapshot_id, baseline_id) + pack_grid_delta(changes)
+                if len(delta_payload) <= (len(self.grid_state.cells) + 1) // 2:
+                    return MSG_TYPE_BOARD_DELTA, delta_payload
+        full_payload = struct.pack("!I", self.snapshot_id) + encode_grid_snapshot(self.grid_state.cells, codec_mask, encodings)
+        if delta_payload is not None and len(delta_payload) < len(full_payload):
+            return MSG_TYPE_BOARD_DELTA, delta_payload
+        return MSG_TYPE_BOARD_SNAPSHOT, full_payload
+
+    def _send_snapshot(self, player_ids=None):
+        """
+        Record a snapshot and send it to all active clients (or just `player_ids`) on the
+        delta channel, as a delta from each client's last ACKed snapshot where possible.
+        """
         # Check if we should send snapshots
         if not self._should_send_snapshots:
             print(f"[INFO] Snapshots disabled, skipping")
             return
             
+        sent_count = 0
+        delta_count = 0
         try:
-            # Pack snapshot (grid -> bytes)
-            snapshot_bytes = pack_grid_snapshot(self.grid_state)
-            # Prepend snapshot id so clients can detect which snapshot this is
-            payload = struct.pack("!I", self.snapshot_id) + snapshot_bytes
-
-            # Store snapshot history for late-joiners
-            self.recent_snapshots.append((self.snapshot_id, snapshot_bytes))
+            # Encode every board before the snapshot is committed: if that fails, the entry
+            # is taken back and its dirty cells go out with the next snapshot
+            self.recent_snapshots.append((self.snapshot_id, frozenset(self.dirty_cells)))
+            recipients = list(self.clients.keys()) if player_ids is None else player_ids
+            try:
+                prepared_for = self._prepare_snapshots(recipients)
+            except Exception:
+                self.recent_snapshots.pop()
+                raise
+            self.dirty_cells.clear()
             if len(self.recent_snapshots) > self.max_snapshot_history:
-                self.recent_snapshots.pop(0)
-
-            sent_count = 0
-            print(f"[SNAPSHOT] Sending to players: {list(self.clients.keys())}")
-            for pid in list(self.clients.keys()):
-                sent = self._sr_send(pid, MSG_TYPE_BOARD_SNAPSHOT, payload)
-                if sent:
-                    sent_count += 1
+                self.snapshot_sent_ms.pop(self.recent_snapshots.pop(0)[0], None)
 
-            if sent_count > 0:
-                # Only increment snapshot id after attempted send
+            print(f"[SNAPSHOT] Sending to players: {recipients}")
+            try:
+                for pid, prepared in prepared_for:
+                    if self._send_latest_snapshot(pid, prepared):
+                        sent_count += 1
+                        if prepared.msg_type == MSG_TYPE_BOARD_DELTA:
+                            delta_count += 1
+            finally:
+                if sent_count:
+                    self.snapshot_sent_ms[self.snapshot_id] = current_time_ms()
+                # Snapshot id always advances once recorded so history ids stay unique
                 self.snapshot_id += 1
+            if sent_count > 0:
                 self.seq_num += 1
-                self.stats['sent'] += 0  # already counted per send inside _sr_send
-                self.gui.update_snapshot(self.snapshot_id)
-                self.gui.update_stats(self.stats)
+                self.observer.update_snapshot(self.snapshot_id)
+                self.observer.update_stats(self.stats)
                 if self.snapshot_id % 10 == 0:
-                    self.gui.log_message(f"Snapshot {self.snapshot_id} sent to {sent_count} client(s)", "info")
+                    self.observer.log_message(f"Snapshot {self.snapshot_id} sent to {sent_count} client(s)", "info")
 
-            print(f"[SNAPSHOT] id={self.snapshot_id} sent_count={sent_count}")
+            print(f"[SNAPSHOT] id={self.snapshot_id} sent_count={sent_count} deltas={delta_count}")
 
         except Exception as e:
-            self.gui.log_message(f"Snapshot error: {e}", "error")
+            self.observer.log_message(f"Snapshot error: {e}", "error")
             print(f"[ERROR] snapshot: {e}")
 
+    def _prepare_snapshots(self, recipients):
+        """
+        (player id, BroadcastPacket) per recipient for the snapshot just recorded. Clients
+        sharing a baseline and codec set share one encoded + checksummed payload.
+        """
+        prepared_by_key = {}
+        encodings = {}
+        prepared_for = []
+        for pid in recipients:
+            if pid in self.client_snapshot_reliable:
+                continue  # held back until its fragmented board is ACKed (_on_snapshot_ack)
+            baseline_id = self.client_snapshot_ack.get(pid)
+            codec_mask = self.client_codecs.get(pid, CODEC_MASK_DEFAULT)
+            key = (baseline_id, codec_mask)
+            if key not in prepared_by_key:
+                msg_type, client_payload = self._snapshot_message_for(baseline_id, codec_mask, encodings)
+                prepared_by_key[key] = BroadcastPacket(msg_type, client_payload, self.snapshot_id & 0xFFFF)
+            prepared_for.append((pid, prepared_by_key[key]))
+        return prepared_for
+
+    # ==================== Snapshot Channel ====================
+    # BOARD_SNAPSHOT / BOARD_DELTA skip SR ARQ: they go out with seq 0, take no window slot
+    # and have no retransmission timer. Every board carries all changes since the client's
+    # last ACKed snapshot (redundant history), so any one that arrives brings the client
+    # fully up to date and a lost one is covered by the next. The client ACKs the newest
+    # id it applied in the snapshot_id field of everything it sends.
+    # A board too big for one datagram (a keyframe of a large grid) would only arrive if
+    # every fragment did, so it goes over SR ARQ instead, which resends just the lost
+    # fragments. Nothing newer goes to that client until it ACKs the board; then it gets
+    # a delta with everything that changed meanwhile.
+    def _send_latest_snapshot(self, player_id, prepared):
+        """Send the current board to one client (a delta from its last ACK, or a keyframe)."""
+        if not self._should_send_snapshots:
+            print(f"[INFO] Skipping snapshot for player {player_id}, snapshots disabled")
+            return False
+        if player_id not in self.clients:
+            return False
+        sent = self.client_snapshot_sent.get(player_id)
+        if sent is not None and sent[0] > self.client_snapshot_ack.get(player_id, -1):
+            self.snapshot_stats['redundant'] += 1  # repeats the changes of a board not ACKed yet
+        if needs_fragmentation(prepared.payload):
+            if self._sr_send(player_id, prepared.msg_type, prepared.payload, prepared) is None:
+                return False
+            self.client_snapshot_reliable[player_id] = self.snapshot_id
+            self.client_snapshot_sent[player_id] = (self.snapshot_id, monotonic_ms())
+            return True
+        now = monotonic_ms()
+        self.client_snapshot_sent[player_id] = (self.snapshot_id, now)
+        self._transmit_snapshot(player_id, prepared)
+        self._arm_resync(now + self._resync_delay(player_id))
+        return True
+
+    def _transmit_snapshot(self, player_id, prepared):
+        """Queue a board that fits one datagram, with the peer's ACK piggybacked."""
+        addr = self.clients[player_id][0]
+        receiver = self.peer_acks.get(addr)
+        ack_num, sack_bits = receiver.piggyback() if receiver is not None else (0, 0)
+        parts = (prepared.header_for(0, ack_num, sack_bits, self.client_conn_ids.get(player_id, 0)), prepared.payload)
+        self._send_datagram(parts, addr)
+        if player_id in self.client_bytes_sent:
+            self.client_bytes_sent[player_id] += len(parts[0]) + len(parts[1])
+        self.stats['sent'] += 1
+        self.observer.update_stats(self.stats)
+
+    def _resync_delay(self, player_id):
+        """How long a client may leave its newest board unACKed before it is sent a fresh one."""
+        cc = self.client_cc.get(player_id)
+        return cc.current_rto() if cc is not None else self.arq_config['init_rto_ms']
+
+    def _arm_resync(self, due_ms):
+        """Make sure the resync sweep runs by due_ms (one timer for all clients)."""
+        if self._resync_timer is not None:
+            if self._resync_due <= due_ms:
+                return
+            self._resync_timer.cancel()
+        self._resync_due = due_ms
+        self._resync_timer = self.scheduler.call_later(max(0, due_ms - monotonic_ms()), self._on_resync_timer)
+
+    def _on_resync_timer(self):
+        """
+        Resync sweep: a client whose newest board went unACKed for its RTO (the board was
+        lost and no newer change followed) gets a new board, again a delta from its last ACK.
+        """
+        self._resync_timer = None
+        self._resync_due = None
+        if not self._should_send_snapshots:
+            return
+        now = monotonic_ms()
+        behind, next_due = [], None
+        for pid, (snapshot_id, sent_ms) in self.client_snapshot_sent.items():
+            if self.client_snapshot_ack.get(pid, -1) >= snapshot_id or pid in self.client_snapshot_reliable:
+                continue  # up to date, or SR ARQ is delivering its board
+            due = sent_ms + self._resync_delay(pid)
+            if due <= now:
+                behind.append(pid)
+            elif next_due is None or due < next_due:
+                next_due = due
+        if behind:
+            self.snapshot_stats['resyncs'] += len(behind)
+            print(f"[SNAPSHOT RESYNC] players {behind}")
+            self._send_snapshot(behind)
+        if next_due is not None:
+            self._arm_resync(next_due)
+
+    def _on_snapshot_ack(self, player_id, field):
+        """A snapshot_id header field from a client: its newest applied snapshot (delta baseline)."""
+        acked = unwrap_snapshot_ack(field, self.snapshot_id)
+        if acked is None or acked < self._snapshot_ack_floor:
+            return  # nothing applied yet, or an id from before the history was reset
+        if acked > self.client_snapshot_ack.get(player_id, -1):
+            self.client_snapshot_ack[player_id] = acked
+            # Board delivery for postprocess.py: one record per newly ACKed snapshot (seq 0)
+            sent_at = self.snapshot_sent_ms.get(acked)
+            if self.metrics and sent_at is not None:
+                self.metrics.record(player_id, acked, 0, sent_at, current_time_ms(), 0.0,
+                                    self._bandwidth_kbps(player_id))
+            if self.client_snapshot_reliable.get(player_id, acked + 1) <= acked:
+                # Its fragmented board arrived: send what changed while it was held back
+                del self.client_snapshot_reliable[player_id]
+                if acked + 1 < self.snapshot_id:
+                    self._send_snapshot([player_id])
+
+    # ==================== Live Leaderboard ====================
+
+    def _mark_scores_changed(self):
+        """Scores moved: make sure a SCORE_UPDATE goes out, at most one per LEADERBOARD_INTERVAL_MS."""
+        if self._leaderboard_timer is not None or not self.game_active:
+            return
+        delay = 0
+        if self._leaderboard_sent_ms is not None:
+            delay = max(0, self._leaderboard_sent_ms + LEADERBOARD_INTERVAL_MS - monotonic_ms())
+        self._leaderboard_timer = self.scheduler.call_later(delay, self._send_live_leaderboard)
+
+    def _cancel_leaderboard_timer(self):
+        if self._leaderboard_timer is not None:
+            self._leaderboard_timer.cancel()
+            self._leaderboard_timer = None
+
+    def _send_live_leaderboard(self):
+        """
+        Send the top-k and every score changed since the last update, if anything did
+        (a steal and a steal back cancel out). Read from the scoreboard: no re-sort.
+        """
+        self._leaderboard_timer = None
+        if not self.game_active:
+            return
+        changes = self.scoreboard.take_changes()
+        top = self.scoreboard.top(LEADERBOARD_TOP_K)
+        if not changes and top == self._leaderboard_top:
+            return
+        self.leaderboard_id += 1
+        self._leaderboard_top = top
+        self._leaderboard_sent_ms = monotonic_ms()
+        self.observer.update_standings(top)
+        payload = pack_leaderboard_data(self.leaderboard_id, top, changes)
+        packet = BroadcastPacket(MSG_TYPE_SCORE_UPDATE, payload)
+        for pid in list(self.clients.keys()):
+            try:
+                self._sr_send(pid, MSG_TYPE_SCORE_UPDATE, payload, packet)
+            except Exception as e:
+                print(f"[ERROR] Failed to send score update to player {pid}: {e}")
+
     # ==================== Start / End Game ====================
     
-    def _game_timer_thread(self):
-        """Background thread to manage game duration (only for stealing mode)"""
-        while self.running:
-            if self.game_active and self.game_start_time:
-                if self.stealing_enabled:
-                    # Stealing mode: check timer
-                    elapsed = time.time() - self.game_start_time
-                    if elapsed >= self.game_duration:
-                        self._end_game_with_scores()
-                        self.game_start_time = None
-                    elif self.game_duration - elapsed <= 10:
-                        # Send warning when 10 seconds remaining
-                        if int(self.game_duration - elapsed) == 10:
-                            self.gui.log_message("10 seconds remaining!", "warning")
-                # For non-stealing mode, we check claimed cells in handle_claim_req
-                
-                # Also check if game should end due to insufficient players
-                active_players = len(self.clients)
-                if active_players < self.min_players:
-                    self.gui.log_message(f"Less than {self.min_players} players remaining. Ending game...", "warning")
-                    self._end_game_with_scores()
-                    self.game_start_time = None
-                    
-            time.sleep(1)
-    
+    def _on_game_deadline(self):
+        """Game-duration timer (stealing mode): end the game exactly when time is up."""
+        self._game_timers = []
+        if self.game_active:
+            self._end_game_with_scores()
+
+    def _cancel_game_timers(self):
+        for timer in self._game_timers:
+            timer.cancel()
+        self._game_timers = []
+
     def _start_game(self):
-        # Load stealing setting at game start (not server start)
+        # Load stealing setting and grid size at game start (not server start)
         self.stealing_enabled = self._load_stealing_setting()
+        rows, cols = self._load_grid_size()
+        if (rows, cols) != (self.grid_state.rows, self.grid_state.cols):
+            self.grid_state = Grid(rows, cols)
+            self._reset_grid()
+            self._invalidate_snapshot_history()
+        self.total_cells = rows * cols
         
         self.game_active = True
         self._should_send_snapshots = True
         self.game_start_time = time.time()  # Track when game started
         
-        # Reset claimed cells count
-        self.claimed_cells_count = 0
-        
         # Convert waiting_room_players (pid->addr) to clients structure (pid->(addr, last_seen))
         for pid, addr in self.waiting_room_players.items():
             self.clients[pid] = (addr, time.time())
+            self._watch_player(pid)
         self.waiting_room_players.clear()
 
+        # Stealing mode ends on time; non-stealing mode when every cell is claimed
+        self._cancel_game_timers()
+        if self.stealing_enabled:
+            duration_ms = self.game_duration * 1000
+            self._game_timers = [
+                self.scheduler.call_later(duration_ms, self._on_game_deadline),
+                self.scheduler.call_later(duration_ms - 10000, self.observer.log_message, "10 seconds remaining!", "warning"),
+            ]
+
         # Update stats & GUI
         self.stats['client_count'] = len(self.clients)
         
         # Show game mode in log
         if self.stealing_enabled:
-            self.gui.log_message(f"Game started with {len(self.clients)} players! (Stealing Mode - 60s timer)", "success")
-            self.gui.log_message("Players can steal cells from each other", "info")
+            self.observer.log_message(f"Game started with {len(self.clients)} players! (Stealing Mode - 60s timer)", "success")
+            self.observer.log_message("Players can steal cells from each other", "info")
         else:
-            self.gui.log_message(f"Game started with {len(self.clients)} players! (Non-Stealing Mode)", "success")
-            self.gui.log_message("Game ends when all 400 cells are claimed", "info")
+            self.observer.log_message(f"Game started with {len(self.clients)} players! (Non-Stealing Mode)", "success")
+            self.observer.log_message(f"Game ends when all {self.total_cells} cells are claimed", "info")
             
-        self.gui.log_message("Players: " + ", ".join([f"Player {pid}" for pid in self.clients.keys()]), "info")
-        self.gui.update_players(self.clients)
-        self.gui.update_stats(self.stats)
+        self.observer.log_message("Players: " + ", ".join([f"Player {pid}" for pid in self.clients.keys()]), "info")
+        self.observer.update_players(self.clients)
+        self.observer.update_stats(self.stats)
 
         # Send GAME_START to all active clients (use SR ARQ)
+        start_payload = self._game_start_payload()
+        start_packet = BroadcastPacket(MSG_TYPE_GAME_START, start_payload)
         for pid in list(self.clients.keys()):
             try:
-                self._sr_send(pid, MSG_TYPE_GAME_START, b'')
+                self._sr_send(pid, MSG_TYPE_GAME_START, start_payload, start_packet)
             except Exception as e:
-                self.gui.log_message(f"Failed to send start to player {pid}: {e}", "error")
+                self.observer.log_message(f"Failed to send start to player {pid}: {e}", "error")
         print("[GAME STARTED]")
 
         # Send an initial snapshot
         try:
             self._send_snapshot()
         except Exception as e:
-            self.gui.log_message(f"Failed to send initial snapshot after game start: {e}", "error")
+            self.observer.log_message(f"Failed to send initial snapshot after game start: {e}", "error")
     
     def _end_game_with_scores(self):
-        """End the game, send scores, and reset for new players"""
+        """
+        End the game and start the end-of-game sequence. Nothing here blocks: each
+        client gets GAME_OVER, then its LEADERBOARD as soon as it ACKed GAME_OVER
+        (so it never sees the scores before the game is over); once every LEADERBOARD
+        is ACKed the scores are shown and _reset_for_new_game runs POST_GAME_RESET_MS
+        later. A client that does not ACK within END_ACK_TIMEOUT_MS is moved on anyway.
+        """
         if not self.game_active:
             print("[DEBUG] Game already ended, skipping _end_game_with_scores")
             return
             
         print("[GAME END] Starting game end process...")
+        # Final scores go out as a last live update, ahead of GAME_OVER
+        self._cancel_leaderboard_timer()
+        self._send_live_leaderboard()
         self.game_active = False
+        self._cancel_game_timers()
         self._should_send_snapshots = False
-        
-        # Send game over to all clients
-        print(f"[GAME END] Sending GAME_OVER to {len(self.clients)} clients")
-        for pid in list(self.clients.keys()):
-            try:
-                self._sr_send(pid, MSG_TYPE_GAME_OVER, b'')
-            except Exception as e:
-                print(f"[ERROR] Failed to send game over to player {pid}: {e}")
-        
-        # Wait a bit for clients to process game over
-        time.sleep(0.5)
-        
-        # Calculate scores
-        self.final_scores = calculate_scores_from_grid(self.grid_state)
+
+        # Scores are already ordered (and were streamed to clients during play)
+        self.final_scores = self.scoreboard.standings()
         print(f"[GAME END] Final scores: {self.final_scores}")
-        
-        # Send leaderboard
-        leaderboard_payload = pack_leaderboard_data(self.final_scores)
-        for pid in list(self.clients.keys()):
-            try:
-                self._sr_send(pid, MSG_TYPE_LEADERBOARD, leaderboard_payload)
-            except Exception as e:
-                print(f"[ERROR] Failed to send leaderboard to player {pid}: {e}")
-        
-        # Wait for leaderboard to be sent
-        time.sleep(1)
-        
-        # Update server GUI with final scores
+        # The leaderboard is a confirmation of the last live update, no new scores
+        self._end_leaderboard = BroadcastPacket(
+            MSG_TYPE_LEADERBOARD, pack_leaderboard_data(self.leaderboard_id, self._leaderboard_top))
+
+        print(f"[GAME END] Sending GAME_OVER to {len(self.clients)} clients")
+        self.end_phase = "delivering"
+        game_over_packet = BroadcastPacket(MSG_TYPE_GAME_OVER, b'')
+        deadline = monotonic_ms() + END_ACK_TIMEOUT_MS
+        self._end_pending = {
+            pid: (MSG_TYPE_GAME_OVER, self._end_send(pid, game_over_packet), deadline)
+            for pid in list(self.clients.keys())
+        }
+        self._advance_end_game()
+
+    def _end_send(self, player_id, packet):
+        """Send one end-of-game message over SR ARQ: its OutboundMessage, or None if it was not accepted."""
+        try:
+            return self._sr_send(player_id, packet.msg_type, packet.payload, packet)
+        except Exception as e:
+            print(f"[ERROR] Failed to send msg_type={packet.msg_type} to player {player_id}: {e}")
+        return None
+
+    def _advance_end_game(self):
+        """
+        Move every client whose end-of-game message was ACKed (or timed out) to its next
+        step; finish when none is left. Runs on ACKs from those clients and on the timer.
+        """
+        if self.end_phase != "delivering":
+            return
+        now = monotonic_ms()
+        next_due = None
+        for pid, (msg_type, message, deadline) in list(self._end_pending.items()):
+            window = self.client_windows.get(pid)
+            if pid not in self.clients or window is None:
+                del self._end_pending[pid]  # left meanwhile
+                continue
+            if message is None and now < deadline:
+                message = self._end_send(pid, self._end_leaderboard if msg_type == MSG_TYPE_LEADERBOARD
+                                         else BroadcastPacket(MSG_TYPE_GAME_OVER, b''))
+                self._end_pending[pid] = (msg_type, message, deadline)
+            # Still in the backlog (seqs None) or in flight: not delivered yet
+            delivered = message is not None and message.seqs is not None and not any(
+                seq in window for seq in message.seqs)
+            if not delivered and now < deadline:
+                next_due = deadline if next_due is None else min(next_due, deadline)
+                continue
+            if not delivered:
+                print(f"[GAME END] Player {pid} did not ACK msg_type={msg_type} in {END_ACK_TIMEOUT_MS}ms, moving on")
+            if msg_type == MSG_TYPE_GAME_OVER:
+                deadline = now + END_ACK_TIMEOUT_MS
+                self._end_pending[pid] = (MSG_TYPE_LEADERBOARD, self._end_send(pid, self._end_leaderboard), deadline)
+                next_due = deadline if next_due is None else min(next_due, deadline)
+            else:
+                del self._end_pending[pid]
+
+        if self._end_timer is not None:
+            self._end_timer.cancel()
+            self._end_timer = None
+        if self._end_pending:
+            self._end_timer = self.scheduler.call_later(max(0, next_due - now), self._advance_end_game)
+        else:
+            self._finish_end_game()
+
+    def _finish_end_game(self):
+        """Every client has its leaderboard: show the scores, reset after POST_GAME_RESET_MS."""
+        self.end_phase = "scores_shown"
         score_str = ", ".join([f"Player {pid}: {score}" for pid, score in self.final_scores])
         if self.stealing_enabled:
-            self.gui.log_message(f"Game Over! Time's up! Final scores: {score_str}", "info")
+            self.observer.log_message(f"Game Over! Time's up! Final scores: {score_str}", "info")
         else:
-            self.gui.log_message(f"Game Over! All cells claimed! Final scores: {score_str}", "info")
+            self.observer.log_message(f"Game Over! All cells claimed! Final scores: {score_str}", "info")
         
         # Show leaderboard on server
         self._show_server_leaderboard()
         
-        # Schedule reset after 5 seconds (give clients time to see scores)
-        print("[GAME END] Scheduling auto-reset in 5 seconds")
-        self.gui.root.after(5000, self._reset_for_new_game)
+        # Give clients time to see scores before the reset
+        print(f"[GAME END] End-of-game messages delivered; scheduling auto-reset in {POST_GAME_RESET_MS / 1000:g} seconds")
+        self._end_timer = self.scheduler.call_later(POST_GAME_RESET_MS, self._reset_for_new_game)
 
     def _show_server_leaderboard(self):
         """Show leaderboard on server GUI"""
         try:
-            # This assumes your server GUI has access to show leaderboard
-            if hasattr(self.gui, 'root'):
-                # Import LeaderboardGUI here to avoid circular imports
-                from leaderboard import LeaderboardGUI
-                
-                # Create leaderboard on main thread
-                def show_lb():
-                    LeaderboardGUI(
-                        self.gui.root,
-                        self.final_scores,
-                        play_again_callback=self._restart_game
-                    )
-                
-                self.gui.root.after(0, show_lb)
+            self.observer.show_leaderboard(self.final_scores, play_again_callback=self._restart_game)
         except Exception as e:
             print(f"[ERROR] Could not show server leaderboard: {e}")
 
     def _reset_for_new_game(self):
         """Reset server for new game without stopping"""
         print("[SERVER] Resetting for new game...")
+        if self._end_timer is not None:
+            self._end_timer.cancel()
+            self._end_timer = None
+        self.end_phase = None
+        self._end_pending = {}
         
         # 1. Send disconnect/reset message to any remaining clients
         for pid in list(self.clients.keys()):
@@ -1020,7 +1804,7 @@ class GameServer:
         self._reset_game_state()
         
         # 3. Log that server is ready for new players
-        self.gui.log_message("Server reset complete. Ready for new players!", "success")
+        self.observer.log_message("Server reset complete. Ready for new players!", "success")
         
         # 4. Keep server socket open and listening
         print("[SERVER] Reset complete. Waiting for new players...")
@@ -1030,50 +1814,65 @@ class GameServer:
         print("[SERVER] Resetting game state...")
         
         # Reset grid
-        self.grid_state = [[0] * 20 for _ in range(20)]
-        self.grid_claim_time = [[0] * 20 for _ in range(20)]
-        self.claimed_cells_count = 0
+        self._reset_grid()
         self.grid_changed = False
+        self._dirty_since = None
         
         # Reset game state
         self.game_active = False
         self._should_send_snapshots = False
         self.game_start_time = None
+        self._cancel_game_timers()
+        self._cancel_leaderboard_timer()
         self.stealing_enabled = False  # Reset stealing setting
         
         # Clear all players
+        for timer in self._inactivity_timers.values():
+            timer.cancel()
+        self._inactivity_timers.clear()
         self.clients.clear()
         self.waiting_room_players.clear()
+        self._clear_connections()
+        self.peer_acks.clear()
         
         # Clear SR ARQ windows
+        self._cancel_rto_timers()
         self.client_windows.clear()
         self.client_timers.clear()
         self.client_next_seq.clear()
         self.client_base.clear()
-        self.client_rtt.clear()
+        self.client_cc.clear()
         self.client_send_ts.clear()
         self.client_retrans.clear()
+        self.client_backlog.clear()
+        self.backlog_depth = 0
+        self.stats['backlog'] = 0
+        self.client_snapshot_ack.clear()
+        self.client_snapshot_sent.clear()
+        self.client_snapshot_reliable.clear()
+        self.client_codecs.clear()
         
         # Reset sequence numbers (optional, you might want to keep them)
         self.snapshot_id = 0
         self.seq_num = 0
+        self._invalidate_snapshot_history()
         
         # Clear final scores
         self.final_scores = []
         
         # Update GUI
-        self.gui.update_grid(self.grid_state)
-        self.gui.update_players({})
-        self.gui.update_stats(self.stats)
-        self.gui.log_message("Game state cleared. Ready for new players!", "info")
+        self.observer.update_grid(self.grid_state)
+        self.observer.update_players({})
+        self.observer.update_stats(self.stats)
+        self.observer.log_message("Game state cleared. Ready for new players!", "info")
 
     def _restart_game(self):
         """Reset server for new game (called from leaderboard Play Again button)"""
         print("[SERVER] Manual restart requested from leaderboard")
         
-        # Instead of auto-restarting (which stops and starts), just reset
-        self.gui.log_message("Resetting for new game...", "info")
-        self._reset_for_new_game()
+        # Instead of auto-restarting (which stops and starts), just reset (on the engine loop)
+        self.observer.log_message("Resetting for new game...", "info")
+        self._call_in_loop(self._reset_for_new_game)
 
     def end_game(self):
             self.game_active = False
@@ -1084,37 +1883,26 @@ class GameServer:
                 try:
                     self._sr_send(pid, MSG_TYPE_GAME_OVER, b'')
                 except Exception as e:
-                    self.gui.log_message(f"Failed to send game over to player {pid}: {e}", "error")
+                    self.observer.log_message(f"Failed to send game over to player {pid}: {e}", "error")
             
             # Clear game state
-            self.grid_state = [[0] * 20 for _ in range(20)]
-            self.grid_claim_time = [[0] * 20 for _ in range(20)]
-            self.claimed_cells_count = 0
+            self._reset_grid()
             self.grid_changed = False
+            self._dirty_since = None
+            self._invalidate_snapshot_history()
             
             print("[GAME OVER]")
-            self.gui.log_message("Game over", "info")
+            self.observer.log_message("Game over", "info")
             
             # Update GUI to show empty grid
-            self.gui.update_grid(self.grid_state)
+            self.observer.update_grid(self.grid_state)
             self._end_game_with_scores()
 
     # ==================== GUI Integration ====================
-    def _setup_gui_callbacks(self):
-        try:
-            self.gui.connect_button.config(text="Start Server", command=self.start)
-            self.gui.disconnect_button.config(text="Stop Server", command=self.stop)
-        except Exception:
-            # Some GUI implementations may not expose those buttons; safe-guard
-            pass
-
-        # Provide references back from GUI if GUI expects these callables
-        self.gui.on_connect_click = self.start
-        self.gui.on_disconnect_click = self.stop
-
     def start_gui(self):
+        """Run the observer's GUI main loop (the observer must be a gui.ServerGUI)."""
         try:
-            self.gui.run()
+            self.observer.run()
         except Exception as e:
             print(f"[ERROR] GUI run failed: {e}")
             # fallback: try to start server headless
@@ -1129,6 +1917,7 @@ class GameServer:
 # Main execution
 if __name__ == "__main__":
     import argparse
+    import signal
     import sys
 
     parser = argparse.ArgumentParser(description="Multiplayer Game Server")
@@ -1136,17 +1925,55 @@ if __name__ == "__main__":
     parser.add_argument("--port", type=int, default=5005, help="Server Port")
     parser.add_argument("--no-gui", action="store_true", help="Run in headless mode (no GUI)")
     parser.add_argument("--metrics-file", default="server_metrics.csv", help="Path to CSV metrics file")
+    parser.add_argument("--metrics-bin", default=None, help="Also write binary metrics records here")
+    parser.add_argument("--rows", type=int, default=20, help="Grid rows (game_settings.txt grid_rows= overrides)")
+    parser.add_argument("--cols", type=int, default=20, help="Grid columns (game_settings.txt grid_cols= overrides)")
+    parser.add_argument("--rcvbuf", type=int, default=SOCKET_BUFFER_SIZE, help="SO_RCVBUF bytes (0 = OS default)")
+    parser.add_argument("--sndbuf", type=int, default=SOCKET_BUFFER_SIZE, help="SO_SNDBUF bytes (0 = OS default)")
+    parser.add_argument("--recv-budget", type=int, default=RECV_DRAIN_LIMIT, help="Datagrams drained per wakeup")
+    parser.add_argument("--tick-hz", type=float, default=0, help="Snapshot ticks per second (0 = on every change)")
+    parser.add_argument("--max-latency-ms", type=int, default=MAX_SNAPSHOT_LATENCY_MS,
+                        help="Tick mode: longest a change waits for its snapshot")
+    parser.add_argument("--egress-kbps", type=int, default=0, help="Outbound rate shared by all clients (0 = unlimited)")
+    parser.add_argument("--outbound-policy", choices=("fair", "fifo"), default="fair",
+                        help="Order of held-back datagrams: QoS classes + per-client fair share, or one FIFO")
+    parser.add_argument("--client-weight", action="append", default=[], metavar="PID=WEIGHT",
+                        help="Outbound share of a player id (default 1; repeatable)")
     
     args = parser.parse_args()
+    client_weights = {}
+    for spec in args.client_weight:
+        try:
+            pid, weight = spec.split("=")
+            client_weights[int(pid)] = float(weight)
+        except ValueError:
+            parser.error(f"--client-weight expects PID=WEIGHT, got {spec!r}")
+        if not client_weights[int(pid)] > 0:
+            parser.error(f"--client-weight {spec}: weight must be > 0")
 
     if args.no_gui:
-        server = GameServer(ip=args.ip, port=args.port, metrics_file_path=args.metrics_file)
+        server = GameServer(ip=args.ip, port=args.port, metrics_file_path=args.metrics_file,
+                            rows=args.rows, cols=args.cols, rcvbuf=args.rcvbuf, sndbuf=args.sndbuf,
+                            recv_budget=args.recv_budget, metrics_bin_path=args.metrics_bin,
+                            tick_hz=args.tick_hz, max_latency_ms=args.max_latency_ms,
+                            egress_kbps=args.egress_kbps, outbound_policy=args.outbound_policy,
+                            client_weights=client_weights)
+        # run_all_tests.sh stops the server with SIGTERM: shut down cleanly so buffered metrics are written
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
         server.start()
         try:
             while True:
                 time.sleep(1)
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, SystemExit):
             server.stop()
     else:
-        server = GameServer(ip=args.ip, port=args.port, metrics_file_path=args.metrics_file)
+        from gui import ServerGUI
+        gui = ServerGUI(title="Grid Game Server")
+        server = GameServer(ip=args.ip, port=args.port, metrics_file_path=args.metrics_file,
+                            rows=args.rows, cols=args.cols, rcvbuf=args.rcvbuf, sndbuf=args.sndbuf,
+                            recv_budget=args.recv_budget, observer=gui, metrics_bin_path=args.metrics_bin,
+                            tick_hz=args.tick_hz, max_latency_ms=args.max_latency_ms,
+                            egress_kbps=args.egress_kbps, outbound_policy=args.outbound_policy,
+                            client_weights=client_weights)
+        gui.attach(server)
         server.start_gui()
\ No newline at end of file
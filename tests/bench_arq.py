@@ -0,0 +1,217 @@
+# bench_arq.py
+# SR ARQ sender under the run_all_tests.sh scenarios, emulated by a UDP proxy
+# (no root/netem needed): baseline, loss_2, loss_5, delay_100ms, plus a 1 s
+# outage. Compares the old fixed window (N=6, unclamped EWMA RTO, no backoff)
+# against CongestionControl (AIMD window, SACK fast retransmit, clamped RTO with
+# backoff, retransmit budget). Reports delivered messages/sec, retransmissions and the largest
+# retransmission burst in any 100 ms.
+import os
+import sys
+import time
+import heapq
+import random
+import select
+import socket
+import argparse
+import threading
+from collections import deque
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from protocol import (
+    create_packet, create_ack_packet, parse_packet, sack_acked, SackReceiver,
+    MSG_TYPE_CLAIM_REQ, RECV_BUFFER_SIZE
+)
+from congestion import CongestionControl, ARQ_DEFAULTS
+from scheduler import Scheduler, monotonic_ms
+
+SCENARIOS = {
+    'baseline': dict(loss=0.0, delay_ms=0),
+    'loss_2': dict(loss=0.02, delay_ms=0),
+    'loss_5': dict(loss=0.05, delay_ms=0),
+    'delay_100ms': dict(loss=0.0, delay_ms=100),
+    'outage_1s': dict(loss=0.0, delay_ms=20, outage=(0.5, 1.5)),
+}
+
+
+class LossyProxy:
+    """Forwards datagrams between a sender and a receiver with loss, delay and an optional outage."""
+
+    def __init__(self, receiver_addr, loss, delay_ms, outage=None):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.addr = self.sock.getsockname()
+        self.receiver_addr = receiver_addr
+        self.sender_addr = None
+        self.loss = loss
+        self.delay_ms = delay_ms
+        self.outage = outage
+        self.start = time.monotonic()
+        self.queue = []  # (due, n, data, addr)
+        self.count = 0
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _dropped(self):
+        if self.outage:
+            t = time.monotonic() - self.start
+            if self.outage[0] <= t < self.outage[1]:
+                return True
+        return random.random() < self.loss
+
+    def _run(self):
+        while self.running:
+            timeout = 0.01
+            if self.queue:
+                timeout = max(0, min(timeout, self.queue[0][0] - time.monotonic()))
+            if select.select([self.sock], [], [], timeout)[0]:
+                data, addr = self.sock.recvfrom(RECV_BUFFER_SIZE)
+                if addr != self.receiver_addr:
+                    self.sender_addr = addr
+                    dest = self.receiver_addr
+                else:
+                    dest = self.sender_addr
+                if not self._dropped():
+                    self.count += 1
+                    heapq.heappush(self.queue, (time.monotonic() + self.delay_ms / 1000, self.count, data, dest))
+            now = time.monotonic()
+            while self.queue and self.queue[0][0] <= now:
+                _, _, data, dest = heapq.heappop(self.queue)
+                self.sock.sendto(data, dest)
+
+
+def receiver(sock, stop):
+    sack = SackReceiver()
+    while not stop.is_set():
+        if not select.select([sock], [], [], 0.05)[0]:
+            continue
+        data, addr = sock.recvfrom(RECV_BUFFER_SIZE)
+        header, _, valid = parse_packet(data)
+        if valid:
+            sack.record(header.seq_num, 0)
+            ack_num, bits = sack.ack_fields()
+            sock.sendto(create_ack_packet(ack_num, sack_bits=bits), addr)
+
+
+class FixedWindow:
+    """The sender before congestion control: N=6, EWMA RTO without clamp or backoff."""
+
+    def __init__(self):
+        self.window, self.est, self.dev = 6, 100, 50
+
+    def current_rto(self):
+        return self.est + 4 * self.dev
+
+    def on_rtt_sample(self, sample):
+        self.est = 0.875 * self.est + 0.125 * sample
+        self.dev = 0.75 * self.dev + 0.25 * abs(sample - self.est)
+
+    def can_send(self, in_flight, next_seq, base):
+        return next_seq < base + self.window
+
+    def on_ack(self, acked):
+        pass
+
+    def detect_losses(self, outstanding, next_seq):
+        return []
+
+    def on_timeout(self, seq, next_seq, now):
+        pass
+
+    def retransmit_delay(self, now):
+        return 0
+
+
+def run_sender(cc, proxy_addr, duration):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    scheduler = Scheduler()
+    window, sent_at, retransmitted, timers = {}, {}, set(), {}
+    state = {'next': 0, 'base': 0, 'delivered': 0, 'retx': 0}
+    retx_times = deque()
+
+    def retransmit(seq, deferred=False):
+        if seq not in window:
+            return
+        now = monotonic_ms()
+        if not deferred:
+            cc.on_timeout(seq, state['next'], now)
+        wait = cc.retransmit_delay(now)
+        if wait:
+            timers[seq] = scheduler.call_later(wait, retransmit, seq, True)
+            return
+        sock.sendto(window[seq], proxy_addr)
+        retransmitted.add(seq)
+        state['retx'] += 1
+        retx_times.append(now)
+        timers[seq] = scheduler.call_later(cc.current_rto(), retransmit, seq)
+
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        while cc.can_send(len(window), state['next'], state['base']):
+            seq = state['next']
+            window[seq] = create_packet(MSG_TYPE_CLAIM_REQ, seq, b'\x00\x01\x00\x02')
+            sent_at[seq] = monotonic_ms()
+            sock.sendto(window[seq], proxy_addr)
+            timers[seq] = scheduler.call_later(cc.current_rto(), retransmit, seq)
+            state['next'] += 1
+        deadline = scheduler.next_deadline()
+        timeout = 0.01 if deadline is None else max(0, min(0.01, (deadline - monotonic_ms()) / 1000))
+        if select.select([sock], [], [], timeout)[0]:
+            header, _, valid = parse_packet(sock.recv(RECV_BUFFER_SIZE))
+            if valid:
+                acked = sack_acked(header.ack_num, header.sack_bits, list(window))
+                fresh = [s for s in acked if s not in retransmitted]
+                if fresh:
+                    cc.on_rtt_sample(monotonic_ms() - sent_at[max(fresh)])
+                if acked:
+                    cc.on_ack(acked)
+                for s in acked:
+                    del window[s]
+                    timers.pop(s).cancel()
+                    retransmitted.discard(s)
+                state['delivered'] += len(acked)
+                state['base'] = min(window) if window else state['next']
+                for s in cc.detect_losses(list(window), state['next']):
+                    sock.sendto(window[s], proxy_addr)
+                    retransmitted.add(s)
+                    state['retx'] += 1
+                    retx_times.append(monotonic_ms())
+                    timers.pop(s).cancel()
+                    timers[s] = scheduler.call_later(cc.current_rto(), retransmit, s)
+        scheduler.run_due()
+    sock.close()
+    scheduler.clear()
+
+    burst, times, j = 0, list(retx_times), 0
+    for i in range(len(times)):
+        while times[i] - times[j] > 100:
+            j += 1
+        burst = max(burst, i - j + 1)
+    return state['delivered'], state['retx'], burst
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--duration", type=float, default=3.0)
+    p.add_argument("--scenarios", default=",".join(SCENARIOS))
+    args = p.parse_args()
+
+    print(f"{args.duration:.0f}s per run; defaults {ARQ_DEFAULTS}")
+    print(f"{'scenario':<13}{'sender':<8}{'msgs/sec':>10}{'retx':>8}{'retx/msg':>10}{'burst/100ms':>13}")
+    for name in args.scenarios.split(","):
+        for label, make in (("fixed", FixedWindow), ("aimd", CongestionControl)):
+            rsock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            rsock.bind(("127.0.0.1", 0))
+            stop = threading.Event()
+            threading.Thread(target=receiver, args=(rsock, stop), daemon=True).start()
+            proxy = LossyProxy(rsock.getsockname(), **SCENARIOS[name])
+            delivered, retx, burst = run_sender(make(), proxy.addr, args.duration)
+            proxy.running = False
+            stop.set()
+            print(f"{name:<13}{label:<8}{delivered / args.duration:>10,.0f}{retx:>8,}"
+                  f"{retx / max(1, delivered):>10.3f}{burst:>13}")
+
+
+if __name__ == "__main__":
+    main()
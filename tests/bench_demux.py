@@ -0,0 +1,79 @@
+# bench_demux.py
+# Demux path microbenchmark: parse a CLAIM packet and find its player, at hundreds of
+# connections. Compares the original linear scan of clients/waiting room against the
+# server's connection table (by source address, and by header conn_id).
+import os
+import sys
+import time
+import random
+import struct
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from protocol import create_packet, parse_packet, CLAIM_FORMAT, MSG_TYPE_CLAIM_REQ
+
+
+def legacy_addr_to_pid(clients, waiting_room_players, addr):
+    """Original GameServer._addr_to_pid: active clients, then the waiting room."""
+    for pid, (client_addr, _) in clients.items():
+        if client_addr == addr:
+            return pid
+    for pid, waiting_addr in waiting_room_players.items():
+        if waiting_addr == addr:
+            return pid
+    return None
+
+
+def rate(fn, items, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(items[i % len(items)])
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--iterations", type=int, default=50000)
+    p.add_argument("--connections", default="10,100,250,500,1000")
+    args = p.parse_args()
+
+    print(f"{'conns':>6}{'linear scan':>15}{'addr table':>15}{'conn_id':>15}   (packets/sec, parse + demux)")
+    for n in [int(x) for x in args.connections.split(",")]:
+        clients, waiting, addr_to_pid, conn_to_pid = {}, {}, {}, {}
+        traffic = []
+        for pid in range(1, n + 1):
+            addr = ("10.0.%d.%d" % (pid // 250, pid % 250), 40000 + pid)
+            conn_id = random.getrandbits(32) or 1
+            # Most players are in the game, the rest wait in the waiting room
+            if pid % 5:
+                clients[pid] = (addr, time.time())
+            else:
+                waiting[pid] = addr
+            addr_to_pid[addr] = pid
+            conn_to_pid[conn_id] = pid
+            packet = create_packet(MSG_TYPE_CLAIM_REQ, pid, struct.pack(CLAIM_FORMAT, 1, 2), conn_id=conn_id)
+            traffic.append((packet, addr))
+        random.shuffle(traffic)
+
+        def linear(item):
+            header, _, _ = parse_packet(item[0])
+            return legacy_addr_to_pid(clients, waiting, item[1])
+
+        def by_addr(item):
+            header, _, _ = parse_packet(item[0])
+            return addr_to_pid.get(item[1])
+
+        def by_conn(item):
+            header, _, _ = parse_packet(item[0])
+            return conn_to_pid.get(header.conn_id)
+
+        assert all(linear(t) == by_addr(t) == by_conn(t) for t in traffic)
+        print(f"{n:>6}{rate(linear, traffic, args.iterations):>15,.0f}"
+              f"{rate(by_addr, traffic, args.iterations):>15,.0f}"
+              f"{rate(by_conn, traffic, args.iterations):>15,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# bench_grid_index.py
+# Cost of the server's per-game board queries (scores, "all cells claimed",
+# removing a leaving player, and the client's active players / own cells) with
+# the grid's ownership index, against the same queries as C-level board scans
+# (bytearray count/find/translate, as Grid did before the index).
+# 4 players share 90% of the board; the one who leaves owns `--player-cells`.
+import os
+import sys
+import time
+import random
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from grid import Grid
+
+
+def scan_owners(cells):
+    owners = set(cells)
+    owners.discard(0)
+    return owners
+
+
+def scan_indices(cells, owner):
+    indices = []
+    find = cells.find
+    i = find(owner)
+    while i != -1:
+        indices.append(i)
+        i = find(owner, i + 1)
+    return indices
+
+
+def scan_scores(cells):
+    scores = {owner: cells.count(owner) for owner in scan_owners(cells)}
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
+
+def scan_clear(cells, owner):
+    indices = scan_indices(cells, owner)
+    table = bytearray(range(256))
+    table[owner] = 0
+    return bytearray(cells.translate(table)), indices
+
+
+def build(rows, cols, player_cells):
+    grid = Grid(rows, cols)
+    n = rows * cols
+    order = list(range(n))
+    random.shuffle(order)
+    for i in order[:player_cells]:
+        grid.assign(i, 1)
+    for k, i in enumerate(order[player_cells:n - n // 10]):
+        grid.assign(i, 2 + k % 3)
+    return grid
+
+
+def timed(fn, repeat, setup=None):
+    total = 0.0
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        fn(arg)
+        total += time.perf_counter() - start
+    return total / repeat * 1e6
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--sizes", default="20x20,100x100,1000x1000")
+    p.add_argument("--player-cells", type=int, default=50, help="cells owned by the player who leaves")
+    p.add_argument("--repeat", type=int, default=20)
+    args = p.parse_args()
+
+    print(f"{'board':<11}{'query':<22}{'scan us':>12}{'index us':>12}{'speedup':>10}")
+    for size in args.sizes.split(","):
+        rows, cols = map(int, size.split("x"))
+        grid = build(rows, cols, args.player_cells)
+        cells = grid.cells
+
+        def indexed_copy():
+            copy = grid.copy()
+            copy.owners()  # build its index outside the timed call
+            return copy
+
+        cases = [
+            ("scores", lambda _: scan_scores(cells), lambda _: grid.scores(), None),
+            ("claimed count", lambda _: len(cells) - cells.count(0), lambda _: grid.claimed_count(), None),
+            ("owners + own cells", lambda _: (scan_owners(cells), scan_indices(cells, 1)),
+             lambda _: (grid.owners(), grid.owner_indices(1)), None),
+            ("remove player", lambda g: scan_clear(g.cells, 1), lambda g: g.clear_owner(1), indexed_copy),
+        ]
+        for name, scan, index, setup in cases:
+            scan_us = timed(scan, args.repeat, setup)
+            index_us = timed(index, args.repeat, setup)
+            print(f"{size:<11}{name:<22}{scan_us:>12,.1f}{index_us:>12,.1f}{scan_us / max(index_us, 0.1):>9,.0f}x")
+        claim_us = timed(lambda _: grid.assign(random.randrange(len(grid)), random.randint(1, 4)), args.repeat * 100)
+        print(f"{size:<11}{'claim (index upkeep)':<22}{'':>12}{claim_us:>12,.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# bench_gui_bridge.py
+# Server -> GUI bridge under claim load, without Tk. Each claim produces what the
+# server reports (grid, log line, stats). A consumer thread stands in for the Tk
+# loop: every 100 ms it drains and "draws", paying --render-ms per grid redraw.
+# Compares the old unbounded per-event queue with the coalescing bridge.
+import os
+import sys
+import time
+import queue
+import argparse
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from grid import Grid
+from observer import CoalescingObserver
+
+
+class QueueObserver:
+    """The old GameGUI bridge: one queue item per call, grid copied as rows."""
+
+    def __init__(self):
+        self.message_queue = queue.Queue()
+
+    def log_message(self, message, level="info"):
+        self.message_queue.put(("log", message, level))
+
+    def update_stats(self, stats):
+        self.message_queue.put(("stats", stats))
+
+    def update_grid(self, grid):
+        self.message_queue.put(("grid", grid.to_rows()))
+
+    def drain(self):
+        items = []
+        try:
+            while True:
+                items.append(self.message_queue.get_nowait())
+        except queue.Empty:
+            pass
+        return items
+
+
+def run(observer, drain, args):
+    grid = Grid(args.rows, args.rows)
+    stats = {'sent': 0, 'received': 0}
+    depth = {'max': 0}
+    stop = threading.Event()
+
+    def consumer():
+        while not stop.is_set():
+            time.sleep(0.1)
+            depth['max'] = max(depth['max'], drain(observer))
+
+    thread = threading.Thread(target=consumer, daemon=True)
+    thread.start()
+    interval = 1.0 / args.rate
+    cpu = 0.0
+    start = time.perf_counter()
+    for i in range(int(args.rate * args.duration)):
+        target = start + i * interval
+        now = time.perf_counter()
+        if target > now:
+            time.sleep(target - now)
+        t0 = time.thread_time()
+        grid.assign(i % len(grid), 1 + i % 4)
+        observer.update_grid(grid)
+        observer.log_message(f"Player {1 + i % 4} claimed cell {i}", "claim")
+        stats['received'] += 1
+        observer.update_stats(stats)
+        cpu += time.thread_time() - t0
+    stop.set()
+    thread.join()
+    return cpu, depth['max']
+
+
+def drain_queue(observer, render_ms):
+    items = observer.drain()
+    for item in items:
+        if item[0] == "grid":
+            time.sleep(render_ms / 1000)
+    return len(items)
+
+
+def drain_bridge(observer, render_ms):
+    slots, lines = observer.drain()
+    if "grid" in slots:
+        slots["grid"][0].to_rows()
+        time.sleep(render_ms / 1000)
+    return len(slots) + len(lines)
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--rate", type=int, default=5000, help="claims/sec")
+    p.add_argument("--duration", type=float, default=3.0)
+    p.add_argument("--rows", type=int, default=100)
+    p.add_argument("--render-ms", type=float, default=2.0, help="cost of one grid redraw")
+    args = p.parse_args()
+
+    n = int(args.rate * args.duration)
+    print(f"{n:,} claims at {args.rate:,}/s on a {args.rows}x{args.rows} board, {args.render_ms} ms per redraw")
+    print(f"{'bridge':<12}{'server us/claim':>17}{'max depth':>12}")
+    cpu, depth = run(QueueObserver(), lambda o: drain_queue(o, args.render_ms), args)
+    print(f"{'queue':<12}{cpu / n * 1e6:>17.1f}{depth:>12,}")
+    bridge = CoalescingObserver()
+    cpu, depth = run(bridge, lambda o: drain_bridge(o, args.render_ms), args)
+    print(f"{'coalescing':<12}{cpu / n * 1e6:>17.1f}{depth:>12,}"
+          f"   ({bridge.bridge_metrics['coalesced']:,} coalesced, {bridge.bridge_metrics['log_dropped']:,} logs dropped)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# bench_large_board.py
+# Boards larger than 64 KiB, end to end. A `server.py --no-gui --rows R --cols C` process
+# serves a driver client on a clean link and a watcher behind the bench_arq.py UDP proxy.
+# Both advertise no codecs, so every keyframe is nibble-packed: R*C/2 bytes, more than
+# the 16-bit header length can describe, and only deliverable as FRAGMENTs. The driver
+# claims a few cells; reports, per scenario, how long after joining the watcher held its
+# first board, and how long after the last claim it held the driver's final board.
+import os
+import sys
+import time
+import random
+import signal
+import struct
+import argparse
+import tempfile
+import subprocess
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from protocol import CLAIM_FORMAT, MSG_TYPE_JOIN_REQ, MSG_TYPE_CLAIM_REQ, MAX_FRAGMENT_DATA
+from bench_arq import LossyProxy, SCENARIOS
+from bench_snapshot_channel import BoardClient
+
+
+def run(args, scenario):
+    metrics = tempfile.NamedTemporaryFile(suffix=".csv", delete=False)
+    metrics.close()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(parent_dir, "server.py"), "--no-gui", "--port", str(args.port),
+         "--metrics-file", metrics.name, "--rows", str(args.rows), "--cols", str(args.cols)],
+        cwd=parent_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        time.sleep(1.0)
+        proxy = LossyProxy(("127.0.0.1", args.port), **SCENARIOS[scenario])
+        driver = BoardClient(("127.0.0.1", args.port))
+        watcher = BoardClient(proxy.addr)
+        joined = time.monotonic()
+        for client in (driver, watcher):
+            client.send(MSG_TYPE_JOIN_REQ)
+        for client in (driver, watcher):
+            if not client.wait_for(lambda: client.started, 30):
+                return None
+        if (driver.rows, driver.cols) != (args.rows, args.cols):
+            return None  # game_settings.txt overrides the grid size
+
+        for _ in range(args.claims):
+            r, c = random.randrange(driver.rows), random.randrange(driver.cols)
+            last_claim = time.monotonic()
+            driver.send(MSG_TYPE_CLAIM_REQ, struct.pack(CLAIM_FORMAT, r, c))
+            time.sleep(0.05)
+        driver.wait_for(lambda: not driver.unacked, 5)
+        time.sleep(0.2)
+        final_id = driver.last_snapshot_id
+
+        first_ms = final_ms = float("inf")
+        if watcher.wait_for(lambda: watcher.held, args.timeout):
+            first_ms = (watcher.held[0][1] - joined) * 1000
+        if final_id is not None and watcher.wait_for(
+                lambda: watcher.last_snapshot_id is not None and watcher.last_snapshot_id >= final_id, args.timeout):
+            final_ms = (watcher.held[-1][1] - last_claim) * 1000
+        driver.close()
+        watcher.close()
+        proxy.running = False
+        return first_ms, final_ms, final_id
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait()
+        os.unlink(metrics.name)
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--port", type=int, default=5097)
+    p.add_argument("--rows", type=int, default=400)
+    p.add_argument("--cols", type=int, default=400)
+    p.add_argument("--claims", type=int, default=20, help="cells the driver claims, 20 per second")
+    p.add_argument("--timeout", type=float, default=30, help="seconds to wait for the watcher's boards")
+    p.add_argument("--scenarios", default="baseline,loss_5,delay_100ms")
+    args = p.parse_args()
+
+    keyframe = 5 + (args.rows * args.cols + 1) // 2  # snapshot id + codec byte + nibbles
+    fragments = (keyframe + MAX_FRAGMENT_DATA - 1) // MAX_FRAGMENT_DATA
+    print(f"{args.rows}x{args.cols} grid: nibble keyframe {keyframe:,} B = {fragments} fragments, {args.claims} claims")
+    print(f"{'scenario':<13}{'first board':>13}{'final board':>13}{'final id':>10}   (ms)")
+    for name in args.scenarios.split(","):
+        result = run(args, name)
+        if result is None:
+            print(f"{name:<13}game did not start")
+            continue
+        first_ms, final_ms, final_id = result
+        print(f"{name:<13}{first_ms:>13.1f}{final_ms:>13.1f}{final_id if final_id is not None else '-':>10}")
+
+
+if __name__ == "__main__":
+    main()
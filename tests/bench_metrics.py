@@ -0,0 +1,69 @@
+# bench_metrics.py
+# Cost of logging one ACK on the server's network thread: the old inline CSV
+# writerow + flush (+ psutil.cpu_percent() when installed) vs MetricsRecorder.record.
+import os
+import sys
+import csv
+import time
+import argparse
+import tempfile
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from metrics import MetricsRecorder, CSV_HEADER, psutil
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def report(name, samples):
+    mean = sum(samples) / len(samples)
+    print(f"{name:<14}{mean * 1e6:>10.2f}{percentile(samples, 0.99) * 1e6:>10.2f}{max(samples) * 1e6:>12.1f}")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--acks", type=int, default=50000)
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run(tmp, args.acks)
+
+
+def run(tmp, acks):
+    print(f"{acks:,} ACKs, psutil {'installed' if psutil else 'not installed'}")
+    print(f"{'':<14}{'mean us':>10}{'p99 us':>10}{'max us':>12}")
+
+    # Old path: everything inline, flushed per ACK
+    f = open(os.path.join(tmp, "inline.csv"), "w", newline="")
+    writer = csv.writer(f, delimiter=" ")
+    writer.writerow(CSV_HEADER)
+    samples = []
+    for seq in range(acks):
+        t0 = time.perf_counter()
+        cpu = psutil.cpu_percent() if psutil else 0.0
+        now = int(time.time() * 1000)
+        writer.writerow([1, 0, seq, now - 3, now, cpu, 0.0, 123.4])
+        f.flush()
+        samples.append(time.perf_counter() - t0)
+    f.close()
+    report("inline csv", samples)
+
+    recorder = MetricsRecorder(os.path.join(tmp, "ring.csv"), os.path.join(tmp, "ring.bin"))
+    recorder.start()
+    samples = []
+    for seq in range(acks):
+        t0 = time.perf_counter()
+        now = int(time.time() * 1000)
+        recorder.record(1, 0, seq, now - 3, now, 0.0, 123.4)
+        samples.append(time.perf_counter() - t0)
+    recorder.close()
+    report("ring record", samples)
+    print(f"records written {recorder.recorded - recorder.dropped:,}, dropped {recorder.dropped:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# bench_outbound_scheduler.py
+# Control-message latency under a mixed workload on a shared egress link. A `server.py
+# --no-gui --egress-kbps N` process serves a driver claiming cells and a watcher, both on
+# clean links, plus a slow client behind the bench_arq.py UDP proxy (loss + delay). The
+# slow client's board ACKs arrive late or not at all, so it keeps falling behind the
+# snapshot history and is sent keyframes: bulk datagrams on the shared link (200x200
+# keyframes need fragments, so they go over SR ARQ, paced by its congestion window).
+# Meanwhile probe clients join every --join-interval ms (JOIN_RESPONSE latency).
+# Reports, per --outbound-policy (fair = QoS classes + per-client DRR, fifo = one queue):
+# JOIN_RESPONSE latency, and the one-way delay (server header timestamp to arrival) of
+# control packets (ACKs, GAME_START, ...), live score updates and boards at the clean clients.
+import os
+import sys
+import time
+import signal
+import random
+import struct
+import argparse
+import tempfile
+import threading
+import subprocess
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from protocol import parse_packet, CLAIM_FORMAT, MSG_TYPE_JOIN_REQ, MSG_TYPE_CLAIM_REQ
+from outbound import packet_qos, QOS_CONTROL, QOS_STATE, QOS_BULK
+from bench_arq import LossyProxy
+from bench_snapshot_channel import BoardClient
+
+
+class TimedClient(BoardClient):
+    """BoardClient that records the one-way delay of every packet it receives, per QoS class."""
+
+    def __init__(self, addr):
+        self.delays = ([], [], [])  # ms, indexed by QoS class
+        super().__init__(addr)
+
+    def _handle(self, packet):
+        header, _, valid = parse_packet(packet)
+        if valid:
+            delay = time.time() * 1000 - header.timestamp
+            self.delays[packet_qos((bytes(packet),))].append(delay)
+        super()._handle(packet)
+
+
+def join_probes(addr, interval, stop, latencies, timeout=5.0):
+    """A new client joins every `interval` seconds; records ms until its JOIN_RESPONSE."""
+    probes = []
+    while not stop.is_set():
+        probe = BoardClient(addr)
+        probes.append(probe)
+        start = time.monotonic()
+        probe.send(MSG_TYPE_JOIN_REQ)
+
+        def wait(probe=probe, start=start):
+            if probe.wait_for(lambda: probe.player_id is not None, timeout):
+                latencies.append((time.monotonic() - start) * 1000)
+            else:
+                latencies.append(float("inf"))
+        threading.Thread(target=wait, daemon=True).start()
+        stop.wait(interval)
+    time.sleep(timeout)
+    for probe in probes:
+        probe.close()
+
+
+def run(args, policy):
+    metrics = tempfile.NamedTemporaryFile(suffix=".csv", delete=False)
+    metrics.close()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(parent_dir, "server.py"), "--no-gui", "--port", str(args.port),
+         "--metrics-file", metrics.name, "--rows", str(args.rows), "--cols", str(args.cols),
+         "--egress-kbps", str(args.egress_kbps), "--outbound-policy", policy],
+        cwd=parent_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        time.sleep(1.0)
+        server_addr = ("127.0.0.1", args.port)
+        proxy = LossyProxy(server_addr, loss=args.slow_loss, delay_ms=args.slow_delay_ms)
+        driver = TimedClient(server_addr)
+        watcher = TimedClient(server_addr)
+        slow = TimedClient(proxy.addr)
+        players = (driver, watcher, slow)
+        for client in players:
+            client.send(MSG_TYPE_JOIN_REQ)
+        for client in players:
+            # The slow client's GAME_START may need a few backed-off retransmissions
+            if not client.wait_for(lambda: client.started, 30):
+                return None
+
+        join_ms = []
+        stop = threading.Event()
+        prober = threading.Thread(target=join_probes, args=(server_addr, args.join_interval / 1000, stop, join_ms))
+        prober.start()
+        interval = 1.0 / args.claim_rate
+        stop_at = time.monotonic() + args.duration
+        while time.monotonic() < stop_at:
+            r, c = random.randrange(driver.rows), random.randrange(driver.cols)
+            driver.send(MSG_TYPE_CLAIM_REQ, struct.pack(CLAIM_FORMAT, r, c))
+            time.sleep(interval)
+        stop.set()
+        prober.join()
+
+        delays = tuple(sorted(driver.delays[qos] + watcher.delays[qos]) for qos in (QOS_CONTROL, QOS_STATE, QOS_BULK))
+        for client in players:
+            client.close()
+        proxy.running = False
+        return sorted(join_ms), delays, sorted(slow.delays[QOS_BULK])
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait()
+        os.unlink(metrics.name)
+
+
+def pct(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float("nan")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--port", type=int, default=5099)
+    p.add_argument("--duration", type=float, default=8.0)
+    p.add_argument("--claim-rate", type=float, default=100, help="driver claims/sec")
+    p.add_argument("--rows", type=int, default=200)
+    p.add_argument("--cols", type=int, default=200)
+    p.add_argument("--egress-kbps", type=int, default=2000, help="server outbound rate shared by all clients")
+    p.add_argument("--slow-loss", type=float, default=0.3, help="slow client: loss each way")
+    p.add_argument("--slow-delay-ms", type=float, default=150, help="slow client: delay each way")
+    p.add_argument("--join-interval", type=float, default=250, help="ms between probe joins")
+    p.add_argument("--policies", default="fair,fifo")
+    args = p.parse_args()
+
+    print(f"{args.duration:.0f}s per run, {args.claim_rate:.0f} claims/s, {args.rows}x{args.cols} grid, "
+          f"egress {args.egress_kbps} kbit/s, slow client loss={args.slow_loss} delay={args.slow_delay_ms:.0f}ms")
+    print(f"{'policy':<8}{'join p50':>10}{'join p99':>10}{'ctrl p50':>10}{'ctrl p99':>10}"
+          f"{'score p99':>11}{'board p50':>11}{'board p99':>11}{'slow board p50':>16}   (ms)")
+    for policy in args.policies.split(","):
+        result = run(args, policy)
+        if result is None:
+            print(f"{policy:<8}game did not start")
+            continue
+        join_ms, (control, state, bulk), slow_bulk = result
+        print(f"{policy:<8}{pct(join_ms, 0.5):>10.1f}{pct(join_ms, 0.99):>10.1f}"
+              f"{pct(control, 0.5):>10.1f}{pct(control, 0.99):>10.1f}{pct(state, 0.99):>11.1f}"
+              f"{pct(bulk, 0.5):>11.1f}{pct(bulk, 0.99):>11.1f}{pct(slow_bulk, 0.5):>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# bench_protocol.py
+# Microbenchmark for the GSSP packet codec: packets/sec for create + parse,
+# comparing the original dict/format-string codec against protocol.py.
+import os
+import sys
+import time
+import struct
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from protocol import (
+    create_packet, parse_packet, compute_checksum,
+    HEADER_FORMAT, HEADER_SIZE, PROTOCOL_ID, VERSION, CLAIM_FORMAT,
+    MSG_TYPE_ACK, MSG_TYPE_BOARD_SNAPSHOT, MSG_TYPE_CLAIM_REQ
+)
+
+
+# ==================== Original codec (for comparison) ====================
+def legacy_compute_checksum(data):
+    if len(data) % 2 == 1:
+        data += b'\x00'
+    s = sum(struct.unpack('!%dH' % (len(data) // 2), data))
+    s = (s >> 16) + (s & 0xffff)
+    s += s >> 16
+    return ~s & 0xffff
+
+
+def legacy_create_packet(msg_type, seq_num, payload, snapshot_id=0, ack_num=0, sack_bits=0, conn_id=0):
+    length = len(payload)
+    timestamp = int(time.time() * 1000)
+    header_no_checksum = struct.pack(HEADER_FORMAT, PROTOCOL_ID, VERSION, msg_type, length,
+                                     snapshot_id, seq_num, ack_num, sack_bits, conn_id, timestamp, 0)
+    checksum = legacy_compute_checksum(header_no_checksum + payload)
+    header_final = struct.pack(HEADER_FORMAT, PROTOCOL_ID, VERSION, msg_type, length,
+                               snapshot_id, seq_num, ack_num, sack_bits, conn_id, timestamp, checksum)
+    return header_final + payload
+
+
+def legacy_parse_packet(data):
+    if len(data) < HEADER_SIZE:
+        return None, None, False
+    protocol_id, version, msg_type, length, snapshot_id, seq_num, ack_num, sack_bits, conn_id, timestamp, received_checksum = \
+        struct.unpack(HEADER_FORMAT, data[:HEADER_SIZE])
+    header_no_checksum = struct.pack(HEADER_FORMAT, protocol_id, version, msg_type, length,
+                                     snapshot_id, seq_num, ack_num, sack_bits, conn_id, timestamp, 0)
+    payload = data[HEADER_SIZE:]
+    valid = received_checksum == legacy_compute_checksum(header_no_checksum + payload)
+    header = {
+        'protocol_id': protocol_id.decode(), 'version': version, 'msg_type': msg_type,
+        'length': length, 'snapshot_id': snapshot_id, 'seq_num': seq_num, 'ack_num': ack_num,
+        'sack_bits': sack_bits, 'conn_id': conn_id,
+        'timestamp': timestamp, 'received_checksum': received_checksum
+    }
+    return header, payload, valid
+
+
+# ==================== Benchmark ====================
+def rate(fn, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--iterations", type=int, default=50000)
+    args = p.parse_args()
+    n = args.iterations
+
+    workloads = [
+        ("ACK (0 B)", MSG_TYPE_ACK, b''),
+        ("CLAIM (4 B)", MSG_TYPE_CLAIM_REQ, struct.pack(CLAIM_FORMAT, 3, 4)),
+        ("SNAPSHOT (204 B)", MSG_TYPE_BOARD_SNAPSHOT, bytes(range(204))),
+        ("SNAPSHOT (1200 B)", MSG_TYPE_BOARD_SNAPSHOT, bytes(i % 251 for i in range(1200))),
+    ]
+
+    # Sanity: both codecs agree on checksums
+    for _, msg_type, payload in workloads:
+        pkt = create_packet(msg_type, 7, payload)
+        assert legacy_parse_packet(pkt)[2] and parse_packet(pkt)[2]
+        assert legacy_compute_checksum(pkt) == compute_checksum(pkt)
+
+    print(f"{'workload':<20}{'op':<10}{'legacy pkt/s':>15}{'current pkt/s':>15}{'speedup':>10}")
+    for name, msg_type, payload in workloads:
+        pkt = create_packet(msg_type, 7, payload)
+        rows = [
+            ("create",
+             rate(lambda i: legacy_create_packet(msg_type, i, payload), n),
+             rate(lambda i: create_packet(msg_type, i, payload), n)),
+            ("parse",
+             rate(lambda i: legacy_parse_packet(pkt), n),
+             rate(lambda i: parse_packet(pkt), n)),
+        ]
+        for op, old, new in rows:
+            print(f"{name:<20}{op:<10}{old:>15,.0f}{new:>15,.0f}{new / old:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# bench_server_claims.py
+# End-to-end server throughput: headless clients flood CLAIM_REQUESTs at a
+# `server.py --no-gui` process and count the claims the server ACKs.
+# Reports claims/sec (wall clock), claims per server CPU-second (per core) and, on
+# Linux, datagrams the kernel dropped because the server's receive buffer was full.
+# Also counts the board snapshots/deltas each client receives and the claim -> board
+# latency: from sending a claim to the first board message sent after the server
+# applied it (the first one whose piggybacked ACK covers the claim).
+import os
+import sys
+import time
+import random
+import signal
+import socket
+import struct
+import argparse
+import tempfile
+import threading
+import subprocess
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from protocol import (
+    create_packet, create_ack_packet, parse_packet, split_datagram, sack_acked, SackReceiver,
+    CLAIM_FORMAT, RECV_BUFFER_SIZE, MSG_TYPE_JOIN_REQ, MSG_TYPE_JOIN_RESP, MSG_TYPE_GAME_START,
+    MSG_TYPE_CLAIM_REQ, MSG_TYPE_ACK, MSG_TYPE_BOARD_SNAPSHOT, MSG_TYPE_BOARD_DELTA,
+    on_snapshot_channel, snapshot_ack_field, CODEC_MASK_ALL
+)
+
+
+def current_time_ms():
+    return int(time.time() * 1000)
+
+
+def server_udp_drops(port):
+    """Datagrams the kernel dropped on the server's socket, from /proc/net/udp (None if unavailable)."""
+    try:
+        with open("/proc/net/udp") as f:
+            for line in f.readlines()[1:]:
+                fields = line.split()
+                if int(fields[1].split(":")[1], 16) == port:
+                    return int(fields[-1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class FloodClient:
+    """Keeps up to `outstanding` claims unacknowledged and ACKs everything the server sends."""
+
+    def __init__(self, server, outstanding):
+        self.server = server
+        self.outstanding = outstanding
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.settimeout(0.05)
+        self.sack = SackReceiver()
+        self.next_seq = 0
+        self.unacked = {}  # seq -> packet
+        self.acked = 0
+        self.boards = 0
+        self.last_snapshot_id = None  # ACKed in the snapshot_id field (snapshot channel)
+        self.snapshot_ack_due = False
+        self.claim_sent = {}  # claim seq -> monotonic send time, until a board covers it
+        self.latencies = []   # claim -> board, ms
+        self.player_id = None
+        self.started = False
+        self.rows, self.cols = 20, 20
+
+    def _send(self, msg_type, payload):
+        packet = create_packet(msg_type, self.next_seq, payload, snapshot_ack_field(self.last_snapshot_id))
+        self.unacked[self.next_seq] = packet
+        self.next_seq += 1
+        self.sock.sendto(packet, self.server)
+
+    def _receive(self, counting):
+        data, addr = self.sock.recvfrom(RECV_BUFFER_SIZE)
+        now = time.monotonic()
+        for packet in split_datagram(data)[0]:
+            header, payload, valid = parse_packet(packet)
+            if not valid:
+                continue
+            if counting and header.msg_type in (MSG_TYPE_BOARD_SNAPSHOT, MSG_TYPE_BOARD_DELTA):
+                self.boards += 1
+                for seq in sack_acked(header.ack_num, header.sack_bits, list(self.claim_sent)):
+                    self.latencies.append((now - self.claim_sent.pop(seq)) * 1000)
+            for seq in sack_acked(header.ack_num, header.sack_bits, list(self.unacked)):
+                del self.unacked[seq]
+                if counting:
+                    self.acked += 1
+            if header.msg_type == MSG_TYPE_ACK:
+                continue
+            if on_snapshot_channel(header.msg_type, payload):
+                snapshot_id = struct.unpack("!I", payload[:4])[0]
+                self.last_snapshot_id = max(snapshot_id, self.last_snapshot_id or 0)
+                self.snapshot_ack_due = True
+                continue
+            self.sack.record(header.seq_num, current_time_ms())
+            if header.msg_type == MSG_TYPE_JOIN_RESP:
+                self.player_id = payload[0]
+            elif header.msg_type == MSG_TYPE_GAME_START:
+                self.rows, self.cols = struct.unpack("!HH", payload[:4])
+                self.started = True
+        if self.sack.ack_due_ms is not None or self.snapshot_ack_due:
+            self.sack.ack_due_ms = None
+            self.snapshot_ack_due = False
+            ack_num, bitmap = self.sack.ack_fields()
+            self.sock.sendto(create_ack_packet(ack_num, snapshot_id=snapshot_ack_field(self.last_snapshot_id),
+                                               sack_bits=bitmap), addr)
+
+    def join(self):
+        # Advertise every codec, as client.py does
+        self._send(MSG_TYPE_JOIN_REQ, struct.pack("!B", CODEC_MASK_ALL))
+
+    def wait_for(self, condition, timeout):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            try:
+                self._receive(False)
+            except socket.timeout:
+                pass
+        return condition()
+
+    def flood(self, stop_at):
+        self.unacked.clear()  # join traffic is not counted
+        while time.time() < stop_at:
+            while len(self.unacked) < self.outstanding:
+                r, c = random.randrange(self.rows), random.randrange(self.cols)
+                self.claim_sent[self.next_seq] = time.monotonic()
+                self._send(MSG_TYPE_CLAIM_REQ, struct.pack(CLAIM_FORMAT, r, c))
+            try:
+                self._receive(True)
+            except socket.timeout:
+                # Nothing came back: resend what is outstanding
+                for packet in list(self.unacked.values()):
+                    self.sock.sendto(packet, self.server)
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--port", type=int, default=5099)
+    p.add_argument("--clients", type=int, default=2)
+    p.add_argument("--outstanding", type=int, default=16, help="unacked claims per client")
+    p.add_argument("--duration", type=float, default=5.0)
+    p.add_argument("--server", default=os.path.join(parent_dir, "server.py"), help="server script to run")
+    p.add_argument("--rcvbuf", type=int, help="server SO_RCVBUF (server default if omitted)")
+    p.add_argument("--sndbuf", type=int, help="server SO_SNDBUF (server default if omitted)")
+    p.add_argument("--recv-budget", type=int, help="server datagrams drained per wakeup")
+    p.add_argument("--tick-hz", type=float, help="server snapshot ticks per second (0 = on every change)")
+    p.add_argument("--max-latency-ms", type=int, help="server tick mode latency bound")
+    args = p.parse_args()
+
+    server_args = []
+    for option in ("rcvbuf", "sndbuf", "recv_budget", "tick_hz", "max_latency_ms"):
+        if getattr(args, option) is not None:
+            server_args += ["--" + option.replace("_", "-"), str(getattr(args, option))]
+
+    metrics = tempfile.NamedTemporaryFile(suffix=".csv", delete=False)
+    metrics.close()
+    server = subprocess.Popen(
+        [sys.executable, args.server, "--no-gui",
+         "--port", str(args.port), "--metrics-file", metrics.name] + server_args,
+        cwd=parent_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    drops_before = drops_after = None
+    try:
+        time.sleep(1.0)
+        clients = [FloodClient(("127.0.0.1", args.port), args.outstanding) for _ in range(args.clients)]
+        for client in clients:
+            client.join()
+            client.wait_for(lambda: client.player_id is not None, 5)
+        for client in clients:
+            if not client.wait_for(lambda: client.started, 5):
+                print("game did not start")
+                return
+
+        drops_before = server_udp_drops(args.port)
+        stop_at = time.time() + args.duration
+        threads = [threading.Thread(target=c.flood, args=(stop_at,)) for c in clients]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        drops_after = server_udp_drops(args.port)
+    finally:
+        server.send_signal(signal.SIGINT)
+        try:
+            _, _, usage = os.wait4(server.pid, 0)
+        except ChildProcessError:
+            usage = None
+        os.unlink(metrics.name)
+
+    claims = sum(c.acked for c in clients)
+    print(f"{args.clients} clients, {args.outstanding} outstanding each, {args.duration:.0f}s")
+    print(f"claims acked      {claims:>10,}")
+    print(f"claims/sec        {claims / args.duration:>10,.0f}")
+    if usage is not None:
+        cpu = usage.ru_utime + usage.ru_stime
+        print(f"server CPU sec    {cpu:>10.2f}")
+        print(f"claims/CPU-sec    {claims / cpu:>10,.0f}")
+    if drops_before is not None and drops_after is not None:
+        print(f"kernel rcv drops  {drops_after - drops_before:>10,}")
+    boards = sum(c.boards for c in clients)
+    print(f"boards/sec/client {boards / args.clients / args.duration:>10,.0f}")
+    print(f"boards per claim  {boards / args.clients / max(1, claims):>10.3f}")
+    latencies = sorted(ms for c in clients for ms in c.latencies)
+    if latencies:
+        print(f"claim->board p50  {latencies[len(latencies) // 2]:>10.1f} ms")
+        print(f"claim->board p99  {latencies[int(len(latencies) * 0.99)]:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
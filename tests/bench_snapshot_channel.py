@@ -0,0 +1,204 @@
+# bench_snapshot_channel.py
+# Board convergence under loss/delay: a `server.py --no-gui` process, one driver client
+# claiming cells on a clean link and one watcher client behind the bench_arq.py UDP
+# proxy (loss_2, loss_5, delay_100ms, ...). Reports the board bytes/sec the watcher
+# received, and its board lag (time to convergence): for every snapshot id the driver
+# saw, how long until the watcher held that id or a newer one (p50/p99/max), including
+# the final board once claims stop. Run with --server <old checkout>/server.py to compare.
+import os
+import sys
+import time
+import bisect
+import random
+import signal
+import socket
+import struct
+import argparse
+import tempfile
+import threading
+import subprocess
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from protocol import (
+    create_packet, create_ack_packet, parse_packet, split_datagram, sack_acked, SackReceiver,
+    FragmentReassembler, on_snapshot_channel, snapshot_ack_field, CLAIM_FORMAT, RECV_BUFFER_SIZE,
+    MSG_TYPE_JOIN_REQ, MSG_TYPE_JOIN_RESP, MSG_TYPE_GAME_START, MSG_TYPE_CLAIM_REQ, MSG_TYPE_ACK,
+    MSG_TYPE_FRAGMENT, MSG_TYPE_BOARD_SNAPSHOT, MSG_TYPE_BOARD_DELTA
+)
+from bench_arq import LossyProxy, SCENARIOS
+
+
+class BoardClient:
+    """Joins, ACKs everything, and records when it first held each snapshot id."""
+
+    def __init__(self, addr):
+        self.addr = addr
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.settimeout(0.05)
+        self.sack = SackReceiver()
+        self.reassembler = FragmentReassembler()
+        self.next_seq = 0
+        self.unacked = {}  # seq -> (packet, last sent)
+        self.lock = threading.Lock()
+        self.last_snapshot_id = None
+        self.snapshot_ack_due = False
+        self.held = []  # (snapshot id, monotonic time) each time a newer board arrived
+        self.board_bytes = 0
+        self.player_id = None
+        self.started = False
+        self.rows, self.cols = 20, 20
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def send(self, msg_type, payload=b''):
+        with self.lock:
+            packet = create_packet(msg_type, self.next_seq, payload, snapshot_ack_field(self.last_snapshot_id))
+            self.unacked[self.next_seq] = [packet, time.monotonic()]
+            self.next_seq += 1
+        self.sock.sendto(packet, self.addr)
+
+    def _run(self):
+        while self.running:
+            try:
+                data, addr = self.sock.recvfrom(RECV_BUFFER_SIZE)
+            except socket.timeout:
+                data = None
+            except OSError:
+                break
+            if data:
+                for packet in split_datagram(data)[0]:
+                    self._handle(packet)
+            now = time.monotonic()
+            with self.lock:
+                for entry in self.unacked.values():
+                    if now - entry[1] > 0.5:
+                        self.sock.sendto(entry[0], self.addr)
+                        entry[1] = now
+            if self.sack.ack_due_ms is not None or self.snapshot_ack_due:
+                self.sack.ack_due_ms = None
+                self.snapshot_ack_due = False
+                ack_num, bitmap = self.sack.ack_fields()
+                self.sock.sendto(create_ack_packet(ack_num or 0, snapshot_id=snapshot_ack_field(self.last_snapshot_id),
+                                                   sack_bits=bitmap), self.addr)
+
+    def _handle(self, packet):
+        header, payload, valid = parse_packet(packet)
+        if not valid:
+            return
+        with self.lock:
+            for seq in sack_acked(header.ack_num, header.sack_bits, list(self.unacked)):
+                del self.unacked[seq]
+        if header.msg_type == MSG_TYPE_ACK:
+            return
+        msg_type = header.msg_type
+        # Boards have no seq; a server without that channel sends them over SR
+        if on_snapshot_channel(msg_type, payload) and header.seq_num == 0:
+            self.snapshot_ack_due = True
+        else:
+            self.sack.record(header.seq_num, 0)
+        if msg_type == MSG_TYPE_FRAGMENT:
+            message = self.reassembler.add(payload)
+            if not message:
+                return
+            msg_type, payload = message
+        if msg_type == MSG_TYPE_JOIN_RESP:
+            self.player_id = payload[0]
+        elif msg_type == MSG_TYPE_GAME_START:
+            self.rows, self.cols = struct.unpack("!HH", payload[:4])
+            self.started = True
+        elif msg_type in (MSG_TYPE_BOARD_SNAPSHOT, MSG_TYPE_BOARD_DELTA):
+            self.board_bytes += len(packet)
+            snapshot_id = struct.unpack("!I", payload[:4])[0]
+            if self.last_snapshot_id is None or snapshot_id > self.last_snapshot_id:
+                self.last_snapshot_id = snapshot_id
+                self.held.append((snapshot_id, time.monotonic()))
+
+    def wait_for(self, condition, timeout):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    def close(self):
+        self.running = False
+        self.sock.close()
+
+
+def board_lags(driver, watcher):
+    """ms from the driver first holding each id to the watcher holding it (or newer)."""
+    ids = [snapshot_id for snapshot_id, _ in watcher.held]
+    lags = []
+    for snapshot_id, seen in driver.held:
+        i = bisect.bisect_left(ids, snapshot_id)
+        if i < len(ids):
+            lags.append(max(0.0, (watcher.held[i][1] - seen) * 1000))
+    return sorted(lags)
+
+
+def run(server_script, port, scenario, claim_rate, duration):
+    metrics = tempfile.NamedTemporaryFile(suffix=".csv", delete=False)
+    metrics.close()
+    server = subprocess.Popen(
+        [sys.executable, server_script, "--no-gui", "--port", str(port), "--metrics-file", metrics.name],
+        cwd=parent_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        time.sleep(1.0)
+        proxy = LossyProxy(("127.0.0.1", port), **SCENARIOS[scenario])
+        driver = BoardClient(("127.0.0.1", port))
+        watcher = BoardClient(proxy.addr)
+        for client in (driver, watcher):
+            client.send(MSG_TYPE_JOIN_REQ)
+        for client in (driver, watcher):
+            if not client.wait_for(lambda: client.started, 10):
+                return None
+
+        interval = 1.0 / claim_rate
+        stop_at = time.monotonic() + duration
+        while time.monotonic() < stop_at:
+            r, c = random.randrange(driver.rows), random.randrange(driver.cols)
+            driver.send(MSG_TYPE_CLAIM_REQ, struct.pack(CLAIM_FORMAT, r, c))
+            time.sleep(interval)
+
+        # Let the watcher catch up with the driver's final board
+        driver.wait_for(lambda: not driver.unacked, 5)
+        time.sleep(0.2)
+        final_id = driver.last_snapshot_id
+        watcher.wait_for(lambda: watcher.last_snapshot_id is not None and watcher.last_snapshot_id >= final_id, 15)
+
+        lags = board_lags(driver, watcher)
+        driver.close()
+        watcher.close()
+        proxy.running = False
+        return watcher.board_bytes / duration, lags
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait()
+        os.unlink(metrics.name)
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--port", type=int, default=5098)
+    p.add_argument("--duration", type=float, default=5.0)
+    p.add_argument("--claim-rate", type=float, default=100, help="driver claims/sec")
+    p.add_argument("--scenarios", default="baseline,loss_2,loss_5,delay_100ms")
+    p.add_argument("--server", default=os.path.join(parent_dir, "server.py"), help="server script to run")
+    args = p.parse_args()
+
+    print(f"{args.duration:.0f}s per run, {args.claim_rate:.0f} claims/s; {args.server}")
+    print(f"{'scenario':<13}{'board B/s':>11}{'lag p50':>10}{'lag p99':>10}{'lag max':>10}   (ms)")
+    for name in args.scenarios.split(","):
+        result = run(args.server, args.port, name, args.claim_rate, args.duration)
+        if result is None:
+            print(f"{name:<13}game did not start")
+            continue
+        rate, lags = result
+        pct = lambda q: lags[min(len(lags) - 1, int(len(lags) * q))] if lags else float("nan")
+        print(f"{name:<13}{rate:>11,.0f}{pct(0.5):>10.1f}{pct(0.99):>10.1f}{pct(1.0):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
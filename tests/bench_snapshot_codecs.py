@@ -0,0 +1,105 @@
+# bench_snapshot_codecs.py
+# Compares BOARD_SNAPSHOT codecs (size, encode and decode time) on boards recorded
+# in the netem runs (results/*/server.pcap), falling back to simulated games.
+import os
+import sys
+import glob
+import time
+import random
+import struct
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from protocol import (
+    ones_complement_sum, unpack_grid_snapshot, SNAPSHOT_CODECS, CODEC_MASK_ALL,
+    encode_grid_snapshot, decode_grid_snapshot, MSG_TYPE_BOARD_SNAPSHOT
+)
+from grid import Grid
+
+PCAP_HEADER = struct.Struct("<IHHiIII")
+PCAP_RECORD = struct.Struct("<IIII")
+ETH_IP_UDP = 14 + 20 + 8  # loopback capture: Ethernet + IPv4 (no options) + UDP
+RECORDED_HEADER_SIZE = 28  # version 1 GSSP header (no SACK field); msg_type at offset 5
+
+
+def load_recorded_boards(pattern):
+    """Extract unique nibble-format boards from BOARD_SNAPSHOT packets in pcap files."""
+    boards = {}
+    for path in glob.glob(pattern):
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < PCAP_HEADER.size:
+            continue
+        offset = PCAP_HEADER.size
+        while offset + PCAP_RECORD.size <= len(data):
+            _, _, incl_len, _ = PCAP_RECORD.unpack_from(data, offset)
+            offset += PCAP_RECORD.size
+            frame = data[offset:offset + incl_len]
+            offset += incl_len
+
+            packet = frame[ETH_IP_UDP:]
+            # Recorded runs predate the codec byte: payload is snapshot_id + 200 nibble bytes
+            if (len(packet) != RECORDED_HEADER_SIZE + 204 or packet[5] != MSG_TYPE_BOARD_SNAPSHOT
+                    or ones_complement_sum(packet) != 0xffff):
+                continue
+            boards[bytes(packet[RECORDED_HEADER_SIZE + 4:])] = True
+    return [unpack_grid_snapshot(b) for b in boards]
+
+
+def simulate_boards(count, players=4, rows=20, cols=20):
+    """Boards along a random game: early (mostly empty) through late (mostly claimed)."""
+    grid = Grid(rows, cols)
+    boards = []
+    for i in range(count):
+        for _ in range(rows * cols // count + 1):
+            grid.set(random.randrange(rows), random.randrange(cols), random.randint(1, players))
+        boards.append(bytes(grid.cells))
+    return boards
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--pcap", default=os.path.join(parent_dir, "results", "*", "server.pcap"))
+    p.add_argument("--limit", type=int, default=2000, help="max boards to benchmark")
+    p.add_argument("--rows", type=int, default=20, help="simulated board rows")
+    p.add_argument("--cols", type=int, default=20, help="simulated board columns")
+    args = p.parse_args()
+
+    rows, cols = 20, 20
+    boards = load_recorded_boards(args.pcap) if (args.rows, args.cols) == (20, 20) else []
+    source = "recorded"
+    if not boards:
+        rows, cols = args.rows, args.cols
+        boards = simulate_boards(200, rows=rows, cols=cols)
+        source = "simulated"
+    boards = boards[:args.limit]
+    print(f"{len(boards)} {source} {rows}x{cols} boards")
+
+    print(f"{'codec':<10}{'avg bytes':>10}{'min':>6}{'max':>6}{'encode us':>11}{'decode us':>11}")
+    for codec_id, (name, _, _) in SNAPSHOT_CODECS.items():
+        mask = 1 << codec_id
+        sizes = []
+        start = time.perf_counter()
+        encoded = [encode_grid_snapshot(b, mask) for b in boards]
+        enc_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for e in encoded:
+            decode_grid_snapshot(e, rows, cols)
+        dec_time = time.perf_counter() - start
+        sizes = [len(e) for e in encoded]
+        print(f"{name:<10}{sum(sizes) / len(sizes):>10.1f}{min(sizes):>6}{max(sizes):>6}"
+              f"{enc_time / len(boards) * 1e6:>11.1f}{dec_time / len(boards) * 1e6:>11.1f}")
+
+    # What the server actually sends: smallest of all codecs per board
+    best = [encode_grid_snapshot(b, CODEC_MASK_ALL) for b in boards]
+    chosen = {}
+    for e in best:
+        name = SNAPSHOT_CODECS[e[0]][0]
+        chosen[name] = chosen.get(name, 0) + 1
+    print(f"{'smallest':<10}{sum(len(e) for e in best) / len(best):>10.1f}  chosen: {chosen}")
+
+
+if __name__ == "__main__":
+    main()
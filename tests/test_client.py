@@ -15,8 +15,9 @@ sys.path.append(parent_dir)
 from protocol import (
     parse_packet, create_packet, create_ack_packet,
     MSG_TYPE_JOIN_REQ, MSG_TYPE_JOIN_RESP, MSG_TYPE_CLAIM_REQ,
-    MSG_TYPE_BOARD_SNAPSHOT, MSG_TYPE_ACK, MSG_TYPE_GAME_START, MSG_TYPE_GAME_OVER,
-    HEADER_SIZE
+    MSG_TYPE_BOARD_SNAPSHOT, MSG_TYPE_BOARD_DELTA, MSG_TYPE_ACK, MSG_TYPE_GAME_START, MSG_TYPE_GAME_OVER,
+    HEADER_SIZE, CLAIM_FORMAT, MSG_TYPE_FRAGMENT, FragmentReassembler, RECV_BUFFER_SIZE, split_datagram,
+    SackReceiver, sack_acked, on_snapshot_channel, snapshot_ack_field
 )
 
 def current_time_ms():
@@ -36,6 +37,8 @@ class HeadlessClient:
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.settimeout(1.0)
         self.running = False
+        self.rows, self.cols = 20, 20  # updated from GAME_START
+        self.reassembler = FragmentReassembler()
 
         # SR-ish tracking
         self.next_seq = 0
@@ -51,7 +54,11 @@ class HeadlessClient:
         self.snapshots_received = 0
 
         self.player_id = None
-        self.last_ack_received_from_server = 0
+        self.last_ack_received_from_server = 0  # cumulative: every server seq below it received
+        self.sack = SackReceiver()
+        self.last_snapshot_id = None  # newest board received, ACKed in the snapshot_id field
+        self.snapshot_ack_due = False
+        self.conn_id = 0  # assigned by the server, echoed on everything we send
 
         self.start_time = time.time()
         # thread sync
@@ -93,7 +100,8 @@ class HeadlessClient:
     def _sr_send(self, msg_type, payload=b''):
         seq = self.next_seq
         try:
-            packet = create_packet(msg_type, seq, payload, ack_num=self.last_ack_received_from_server)
+            packet = create_packet(msg_type, seq, payload, snapshot_ack_field(self.last_snapshot_id),
+                                   ack_num=self.last_ack_received_from_server, conn_id=self.conn_id)
             self.sock.sendto(packet, (self.server_ip, self.server_port))
         except Exception as e:
             self.dropped += 1
@@ -133,61 +141,91 @@ class HeadlessClient:
         while self.running and time.time() - self.start_time < self.duration - 1:
             if self.player_id is not None:
                 # random row/col
-                r = random.randint(0, 19)
-                c = random.randint(0, 19)
-                # ack_num (optional) 0 for headless clients
-                payload = struct.pack("!BBH", r, c, self.last_ack_received_from_server)
+                r = random.randrange(self.rows)
+                c = random.randrange(self.cols)
+                payload = struct.pack(CLAIM_FORMAT, r, c)
                 self._sr_send(MSG_TYPE_CLAIM_REQ, payload)
             time.sleep(interval)
 
     def _receive_loop(self):
         while self.running:
             try:
-                data, addr = self.sock.recvfrom(4096)
+                data, addr = self.sock.recvfrom(RECV_BUFFER_SIZE)
             except socket.timeout:
                 continue
             except Exception:
                 break
 
-            # 1 Parse Packet
-            header, payload, valid = parse_packet(data)
-            if not valid or not header:
-                continue
-
-            msg_type = header['msg_type']
-            seq = header['seq_num']
-            ack_n = header.get('ack_num', 0)  # <--- DEFINE THIS EARLY
-
-            # 2 Update Piggyback Tracker
-            self.last_ack_received_from_server = seq
-
-            # 3 Send Immediate ACK
-            try:
-                ack_packet = create_ack_packet(ack_num=seq)
-                self.sock.sendto(ack_packet, addr)
-            except:
-                pass
+            # A datagram is either one GSSP packet or a batch of them
+            packets, _ = split_datagram(data)
+            for packet in packets:
+                self._handle_packet(packet, addr)
+
+            # One SACK covers every data packet (and board) in the datagram
+            if self.sack.ack_due_ms is not None or self.snapshot_ack_due:
+                self.sack.ack_due_ms = None
+                self.snapshot_ack_due = False
+                ack_num, bitmap = self.sack.ack_fields()
+                self.last_ack_received_from_server = ack_num
+                try:
+                    self.sock.sendto(create_ack_packet(ack_num, snapshot_id=snapshot_ack_field(self.last_snapshot_id),
+                                                       sack_bits=bitmap, conn_id=self.conn_id), addr)
+                except:
+                    pass
+
+    def _handle_packet(self, packet, addr):
+        # 1 Parse Packet
+        header, payload, valid = parse_packet(packet)
+        if not valid or not header:
+            return
+
+        msg_type = header.msg_type
+        seq = header.seq_num
+        if header.conn_id:
+            self.conn_id = header.conn_id
 
-            with self.lock:
-                self.received += 1
+        with self.lock:
+            self.received += 1
 
-            # 4 Process the ACK we received
-            with self.lock:
-                if ack_n in self.window:
-                    ts = self.send_timestamp.pop(ack_n, None)
-                    if ts:
-                        rtt = current_time_ms() - ts
-                        self.sample_rtts.append(rtt)
-                    del self.window[ack_n]    
-
-            # 5 Handle Game Logic (Join/Snapshot)
-            if msg_type == MSG_TYPE_JOIN_RESP:
-                if len(payload) >= 1:
-                    pid = struct.unpack("!B", payload[:1])[0]
-                    self.player_id = pid
-           
-            elif msg_type == MSG_TYPE_BOARD_SNAPSHOT:
-                self.snapshots_received += 1
+        # 2 Process the ACK we received (standalone or piggybacked on data):
+        # cumulative ack_num + SACK bitmap
+        with self.lock:
+            for acked in sack_acked(header.ack_num, header.sack_bits, list(self.window)):
+                ts = self.send_timestamp.pop(acked, None)
+                if ts:
+                    rtt = current_time_ms() - ts
+                    self.sample_rtts.append(rtt)
+                del self.window[acked]
+        if msg_type == MSG_TYPE_ACK:
+            return
+
+        # 3 Record for the SACK sent after this datagram; boards have no seq (snapshot channel)
+        if on_snapshot_channel(msg_type, payload):
+            self.snapshot_ack_due = True
+        else:
+            self.sack.record(seq, current_time_ms())
+
+        # 5 Handle Game Logic (Join/Snapshot); large messages arrive as fragments
+        if msg_type == MSG_TYPE_FRAGMENT:
+            message = self.reassembler.add(payload)
+            if not message:
+                return
+            msg_type, payload = message
+
+        if msg_type == MSG_TYPE_JOIN_RESP:
+            if len(payload) >= 1:
+                pid = struct.unpack("!B", payload[:1])[0]
+                self.player_id = pid
+       
+        elif msg_type == MSG_TYPE_GAME_START:
+            if len(payload) >= 4:
+                self.rows, self.cols = struct.unpack("!HH", payload[:4])
+
+        elif msg_type in (MSG_TYPE_BOARD_SNAPSHOT, MSG_TYPE_BOARD_DELTA):
+            self.snapshots_received += 1
+            snapshot_id = struct.unpack("!I", payload[:4])[0]
+            if self.last_snapshot_id is None or snapshot_id > self.last_snapshot_id:
+                self.last_snapshot_id = snapshot_id
 
 
 if __name__ == "__main__":